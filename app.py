@@ -1,67 +1,289 @@
-from flask import Flask, request, jsonify, redirect
+from flask import Flask, Response, g, request, jsonify, redirect
 from flask_cors import CORS
-from flasgger import Swagger
+from compression import CompressedCache, Compressor
+from docs import init_docs
+from feed import ChangeFeed, parse_last_event_id, stream as stream_changes
+from idempotency import IdempotencyCache, IdempotencyKeyInFlight, IdempotencyKeyReused, StoredResponse, fingerprint
+from interning import member_names
+from limits import ConcurrencyLimiter, RateLimiter, parse_rate, parse_routes, retry_after
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Metrics
+from models import MemberConflict, Team, parse_fields, team_serializer
+from seeders import SAMPLE_TEAMS
+from serialization import (JSON_MIMETYPE, JSONProvider, create_api_response, decode_cursor, encode, encode_cursor,
+                           json_response, negotiate, negotiated_response, render)
+from storage import SORT_FIELDS, TeamExists, TeamNotFound, VersionConflict, create_store
 from datetime import datetime
-import uuid
+import json
 import os
+import time
+import uuid
 
 app = Flask(__name__)
 
+# ✅ JSON 編碼：安裝 orjson 時 jsonify 與 get_json 改用 orjson，安裝 msgpack 時依 Accept 回應 application/msgpack
+app.json = JSONProvider(app)
+
 # ✅ 正確配置 Swagger
 app.config['SWAGGER'] = {
     'title': 'Team Management API',
     'uiversion': 3
 }
-swagger = Swagger(app)
+# 預設 lazy：第一次開啟文件時才載入 flasgger；SWAGGER_SPEC 可指向預先產生的規格檔
+swagger = init_docs(app, os.environ.get('SWAGGER_MODE', 'lazy'), os.environ.get('SWAGGER_SPEC'))
 
 # ✅ 啟用跨域 - 允許所有域名訪問
 CORS(app, 
      origins='*',
-     methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
-     allow_headers=['Content-Type', 'Authorization'])
-
-# ✅ 模擬資料庫
-teams_db = {}
-
-class Team:
-    def __init__(self, name, members):
-        self.id = str(uuid.uuid4())
-        self.name = name
-        self.members = members
-        self.createdAt = datetime.utcnow().isoformat()
-        self.updatedAt = datetime.utcnow().isoformat()
-
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'members': self.members,
-            'createdAt': self.createdAt,
-            'updatedAt': self.updatedAt
-        }
+     methods=['GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'],
+     allow_headers=['Content-Type', 'Authorization', 'If-Match', 'If-None-Match', 'If-Modified-Since', 'Last-Event-ID',
+                    'Idempotency-Key'],
+     expose_headers=['ETag', 'Last-Modified', 'Idempotent-Replayed'])
+
+# ✅ 儲存後端：memory（預設）或 sqlite，可由環境變數切換
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'memory')
+if STORAGE_BACKEND == 'sqlite':
+    store = create_store('sqlite', path=os.environ.get('SQLITE_PATH', 'teams.db'))
+elif os.environ.get('DATA_DIR'):
+    # 設定 DATA_DIR 時記憶體儲存會寫入 WAL 與快照，重啟後自動還原
+    recover_started = time.perf_counter()
+    store = create_store(STORAGE_BACKEND,
+                         data_dir=os.environ['DATA_DIR'],
+                         fsync_interval=float(os.environ.get('WAL_FSYNC_INTERVAL', 0.05)),
+                         snapshot_interval=float(os.environ.get('SNAPSHOT_INTERVAL', 300)),
+                         lock_timeout=float(os.environ.get('DATA_LOCK_TIMEOUT', 30)))
+    print(f"✅ 從快照與日誌還原 {store.count()} 筆資料（{time.perf_counter() - recover_started:.2f} 秒）")
+else:
+    store = create_store(STORAGE_BACKEND)
+
+# ✅ 分頁、批次與匯入匯出設定
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_BATCH_SIZE = 5000
+STREAM_CHUNK_SIZE = 1000
+MAX_IMPORT_ERRORS = 100
+
+# ✅ 分片模式：作為 router 後方的分片時，新團隊的 id 由 router 以此標頭指定（router 依 id 決定分片）；
+#    分片不應自動填入範例資料，否則範例團隊會落在不屬於它的分片
+TEAM_ID_HEADER = os.environ.get('TEAM_ID_HEADER')
+AUTO_SEED = os.environ.get('AUTO_SEED', '1') != '0'
+
+# ✅ 新增團隊的 Idempotency-Key：保存最近 IDEMPOTENCY_CACHE_SIZE 個鍵的 201 回應 IDEMPOTENCY_TTL 秒，
+#    同一個鍵進行中的請求最多等待 IDEMPOTENCY_WAIT 秒；多個 worker 行程時每個行程各自一份
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+idempotency_cache = IdempotencyCache(int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', 10000)),
+                                     float(os.environ.get('IDEMPOTENCY_TTL', 86400)),
+                                     float(os.environ.get('IDEMPOTENCY_WAIT', 10)))
+
+# ✅ 搜尋結果筆數
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+# ✅ 變動事件串流：保留最近 CHANGE_FEED_SIZE 筆事件供續傳，閒置時每 SSE_HEARTBEAT 秒送一次 keep-alive
+CHANGE_FEED_SIZE = int(os.environ.get('CHANGE_FEED_SIZE', 10000))
+SSE_HEARTBEAT = float(os.environ.get('SSE_HEARTBEAT', 15))
+change_feed = ChangeFeed(CHANGE_FEED_SIZE)
+# WSGI 模式下每個訂閱者佔用一個 worker 執行緒，同時訂閱數上限預設為 THREADS 的四分之一，保留其餘執行緒處理一般請求
+# （ASGI 模式的串流在事件迴圈上處理，不經過這個路由也不受此限制）
+MAX_SSE_SUBSCRIBERS = int(os.environ.get('MAX_SSE_SUBSCRIBERS', max(int(os.environ.get('THREADS', 8)) // 4, 1)))
+sse_subscribers = ConcurrencyLimiter(MAX_SSE_SUBSCRIBERS)
+
+def publish_change(event, team_id, team):
+    # 新增與更新送出完整團隊（沿用快取的 JSON），刪除只送出 id
+    change_feed.publish(event, team.to_json() if team is not None else encode({'id': team_id}))
+
+store.add_listener(publish_change)
+
+# ✅ 請求計時與計數，由 /metrics 輸出
+request_metrics = Metrics()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        # 以路由規則（例如 /api/teams/<team_id>）作為 endpoint，避免每個 id 各自一組指標
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_metrics.observe(endpoint, request.method, response.status_code, time.perf_counter() - started,
+                                response.content_length, g.get('error_code'))
+    return response
+
+# ✅ 准入控制：/api/ 路由依客戶端與路由限流（RATE_LIMIT、RATE_LIMIT_ROUTES），進行中請求超過 MAX_IN_FLIGHT 時直接回 503
+rate_limiter = RateLimiter(parse_rate(os.environ['RATE_LIMIT']) if os.environ.get('RATE_LIMIT') else None,
+                           parse_routes(os.environ.get('RATE_LIMIT_ROUTES', '')))
+# 服務在反向代理之後時設為 X-Forwarded-For 等標頭，否則以連線的位址區分客戶端
+RATE_LIMIT_CLIENT_HEADER = os.environ.get('RATE_LIMIT_CLIENT_HEADER')
+# 信任的代理層數（同 ProxyFix 的 x_for）：每層代理都會在標頭右邊附加它看到的連線位址
+RATE_LIMIT_TRUSTED_PROXIES = int(os.environ.get('RATE_LIMIT_TRUSTED_PROXIES', 1))
+load_shedder = ConcurrencyLimiter(int(os.environ.get('MAX_IN_FLIGHT', 0)))
+
+def client_id():
+    if RATE_LIMIT_CLIENT_HEADER:
+        # 最左邊的位址由客戶端自己填寫、可以任意偽造，只採用信任的代理附加的位址：從右邊數第 N 個
+        addresses = [address.strip() for value in request.headers.getlist(RATE_LIMIT_CLIENT_HEADER)
+                     for address in value.split(',')]
+        if 1 <= RATE_LIMIT_TRUSTED_PROXIES <= len(addresses) and addresses[-RATE_LIMIT_TRUSTED_PROXIES]:
+            return addresses[-RATE_LIMIT_TRUSTED_PROXIES]
+    return request.remote_addr
+
+@app.before_request
+def admit_request():
+    rule = request.url_rule
+    if rule is None or not rule.rule.startswith('/api/') or request.method == 'OPTIONS':
+        return None
+    if rate_limiter.enabled:
+        wait = rate_limiter.acquire(client_id(), request.method, rule.rule)
+        if wait:
+            response = jsonify(create_api_response(result=False, error_code="RATE_LIMITED", message="Too many requests, please retry later"))
+            response.headers['Retry-After'] = retry_after(wait)
+            return response, 429
+    if not load_shedder.try_acquire():
+        response = jsonify(create_api_response(result=False, error_code="SERVER_OVERLOADED", message="Server is overloaded, please retry later"))
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    g.admitted = True
+
+@app.teardown_request
+def release_request(error):
+    if g.pop('admitted', False):
+        load_shedder.release()
+
+# ✅ 回應壓縮：依 Accept-Encoding 選擇 br / zstd / gzip，小於門檻的回應不壓縮
+COMPRESSION_LEVEL_ENV = {'gzip': 'GZIP_LEVEL', 'br': 'BROTLI_QUALITY', 'zstd': 'ZSTD_LEVEL'}
+compressor = Compressor(
+    min_size=int(os.environ.get('COMPRESS_MIN_SIZE', 1024)),
+    levels={encoding: int(os.environ[name]) for encoding, name in COMPRESSION_LEVEL_ENV.items() if name in os.environ})
+# 壓縮過的列表回應以儲存版本快取，資料未變動時輪詢不必重新查詢與壓縮
+list_cache = CompressedCache(int(os.environ.get('COMPRESS_CACHE_ENTRIES', 256)))
+
+# after_request 以註冊的相反順序執行：先壓縮，計時中介層才記錄到壓縮後的大小
+@app.after_request
+def compress_response(response):
+    return compressor.compress_response(response, request.accept_encodings)
+
+def is_valid_text(value):
+    """字串需能以 UTF-8 編碼：JSON 中單獨的 surrogate（例如 "\\ud800"）會被解析成無法輸出的字串"""
+    if not isinstance(value, str):
+        return False
+    try:
+        value.encode('utf-8')
+    except UnicodeEncodeError:
+        return False
+    return True
+
+def is_valid_members(members):
+    return isinstance(members, list) and all(map(is_valid_text, members))
+
+def validate_team_data(data, partial=False):
+    """
+    驗證新增 / 更新的團隊資料，回傳 (name, members, error)
+
+    partial 為 True 時（更新）欄位皆可省略，回傳 None 表示不變；error 為 (errorCode, message)
+    """
+    if not isinstance(data, dict):
+        return None, None, ("INVALID_REQUEST_FORMAT", "Request must be a JSON object")
+
+    name = data.get("name", "")
+    if not isinstance(name, str):
+        return None, None, ("INVALID_TEAM_NAME", "Team name must be a string")
+    if not is_valid_text(name):
+        return None, None, ("INVALID_TEAM_NAME", "Team name must be valid Unicode text")
+    name = name.strip()
+    if not name and not partial:
+        return None, None, ("INVALID_TEAM_NAME", "Team name cannot be empty")
+
+    members = data.get("members", None if partial else [])
+    if partial and not isinstance(members, list):
+        members = None
+    elif not is_valid_members(members):
+        return None, None, ("INVALID_MEMBERS_FORMAT", "Members must be a list of valid Unicode strings")
+
+    return name or None, members, None
+
+def team_from_import(data):
+    """匯入的一行：有 id 時保留原本的 id 與時間（還原匯出檔），否則建立新團隊"""
+    name, members, error = validate_team_data(data)
+    if error:
+        return None, error
+    if data.get('id') is None:
+        return Team(name, members), None
+
+    try:
+        team_id = str(uuid.UUID(data['id']))
+    except (TypeError, ValueError, AttributeError):
+        return None, ("INVALID_TEAM_ID", "id must be a UUID")
+    now = datetime.utcnow().isoformat()
+    timestamps = []
+    for field in ('createdAt', 'updatedAt'):
+        value = data.get(field, now)
+        try:
+            datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            return None, ("INVALID_TIMESTAMP", f"{field} must be an ISO 8601 timestamp")
+        timestamps.append(value)
+    return Team.restore(team_id, name, members, *timestamps), None
+
+def representation_etag(etag, fields=(), variant=None):
+    """
+    資源版本的 ETag 加上表示方式：MessagePack、?fields= 欄位與其他變體（例如 delta）各自使用不同的強 ETag
+
+    壓縮編碼由 Compressor 在壓縮時再附加；If-Match 只比較「+」之前的資源版本
+    """
+    parts = [etag]
+    mimetype = negotiate()
+    if mimetype != JSON_MIMETYPE:
+        parts.append(mimetype.rsplit('/', 1)[-1])
+    if fields:
+        parts.append('fields=' + '.'.join(fields))
+    if variant:
+        parts.append(variant)
+    return '+'.join(parts)
+
+def is_not_modified(etag, last_modified):
+    """
+    條件式 GET：有 If-None-Match 時以 ETag 判斷，否則比較 If-Modified-Since
+
+    相符時回傳 304 應帶的 ETag（未壓縮或依 Accept-Encoding 壓縮的版本），否則為 None
+    """
+    if request.if_none_match:
+        if request.if_none_match.contains(etag):
+            return etag
+        encoding = compressor.negotiate(request.accept_encodings)
+        if encoding and request.if_none_match.contains(compressor.tagged(etag, encoding)):
+            return compressor.tagged(etag, encoding)
+        return None
+    if request.if_modified_since and last_modified:
+        if last_modified.replace(microsecond=0) <= request.if_modified_since:
+            return etag
+    return None
+
+def if_match_failed(etag):
+    """If-Match 以資源版本比較：同一版本任何表示（格式、欄位、壓縮）的 ETag 都視為相符"""
+    if request.if_match.star_tag:
+        return False
+    return not any(tag.split('+', 1)[0] == etag for tag in request.if_match)
+
+def with_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    return response
+
+def not_modified(etag, last_modified):
+    return with_validators(app.response_class(status=304), etag, last_modified)
+
+def precondition_failed():
+    return jsonify(create_api_response(result=False, error_code="PRECONDITION_FAILED", message="Team has been modified by another request")), 412
 
 def auto_seed_data():
-    if len(teams_db) == 0:
+    if AUTO_SEED and store.count() == 0:
         print("🌱 自動填充初始資料")
-        sample_teams = [
-            {"name": "前端開發團隊", "members": ["張三", "李四", "王五"]},
-            {"name": "後端開發團隊", "members": ["趙六", "錢七", "孫八"]},
-            {"name": "UI/UX 設計團隊", "members": ["周九", "吳十"]},
-            {"name": "DevOps 團隊", "members": ["鄭十一", "王十二", "馮十三"]},
-            {"name": "產品管理團隊", "members": ["陳十四", "褚十五"]}
-        ]
-        for team_data in sample_teams:
+        for team_data in SAMPLE_TEAMS:
             team = Team(team_data["name"], team_data["members"])
-            teams_db[team.id] = team
-        print(f"✅ 建立 {len(sample_teams)} 筆資料")
-
-def create_api_response(result=True, error_code="", message="", data=None):
-    return {
-        'result': result,
-        'errorCode': error_code,
-        'message': message,
-        'data': data
-    }
+            store.add(team)
+        print(f"✅ 建立 {len(SAMPLE_TEAMS)} 筆資料")
 
 @app.route('/')
 def redirect_to_docs():
@@ -97,6 +319,30 @@ def health_check():
     """
     return jsonify(create_api_response(message="Service is healthy"))
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    服務指標
+    ---
+    tags:
+      - System
+    summary: Prometheus 格式的服務指標
+    description: 各路由的延遲與回應大小直方圖、依狀態碼的請求數、依 errorCode 的錯誤數與目前的團隊數量；多個 worker 行程時為處理此請求的 worker 的指標
+    produces:
+      - text/plain
+    responses:
+      200:
+        description: Prometheus 文字格式
+    """
+    gauges = [('teams_api_store_teams', 'Number of teams in the store', store.count()),
+              ('teams_api_in_flight_requests', 'API requests currently being handled', load_shedder.in_flight),
+              ('teams_api_rate_limit_buckets', 'Active rate limit buckets', len(rate_limiter)),
+              ('teams_api_idempotency_keys', 'Idempotency keys held for replay', len(idempotency_cache))]
+    names = member_names.report()
+    gauges += [('teams_api_member_names', 'Distinct member names in the shared name table', names['names']),
+               ('teams_api_member_name_references', 'Team references to shared member names', names['references'])]
+    return Response(request_metrics.render(gauges), content_type=METRICS_CONTENT_TYPE)
+
 @app.route('/api/teams', methods=['GET'])
 def get_teams():
     """
@@ -105,7 +351,64 @@ def get_teams():
     tags:
       - Teams
     summary: 取得所有團隊
-    description: 獲取系統中所有團隊的列表，包含每個團隊的詳細資訊
+    description: 以游標分頁取得團隊列表，可依名稱、建立或更新時間排序，並以名稱、名稱字首或成員篩選
+    parameters:
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        default: 100
+        minimum: 1
+        maximum: 1000
+        description: 每頁筆數
+      - name: cursor
+        in: query
+        type: string
+        required: false
+        description: 上一頁回傳的 nextCursor，需搭配相同的 sort 與 order
+      - name: sort
+        in: query
+        type: string
+        required: false
+        enum: ["createdAt", "updatedAt", "name"]
+        default: "createdAt"
+        description: 排序欄位
+      - name: order
+        in: query
+        type: string
+        required: false
+        enum: ["asc", "desc"]
+        default: "asc"
+        description: 排序方向
+      - name: namePrefix
+        in: query
+        type: string
+        required: false
+        description: 只回傳名稱以此字串開頭的團隊
+        example: "前端"
+      - name: name
+        in: query
+        type: string
+        required: false
+        description: 只回傳名稱相符的團隊（不分大小寫與全形/半形）
+        example: "前端開發團隊"
+      - name: member
+        in: query
+        type: string
+        required: false
+        description: 只回傳包含此成員的團隊
+        example: "張三"
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: 以逗號分隔要回傳的團隊欄位（id、name、members、createdAt、updatedAt），未指定時回傳全部
+        example: "id,name"
+      - name: If-None-Match
+        in: header
+        type: string
+        required: false
+        description: 上次回應的 ETag，內容未變動時回傳 304
     responses:
       200:
         description: 成功取得團隊列表
@@ -150,7 +453,32 @@ def get_teams():
                         example: "2023-12-01T10:30:00.000000"
                 total:
                   type: integer
+                  description: 符合條件的團隊總數
                   example: 5
+                nextCursor:
+                  type: string
+                  description: 下一頁游標，沒有下一頁時為 null
+                  example: null
+      304:
+        description: 內容未變動（If-None-Match / If-Modified-Since 符合）
+      400:
+        description: 查詢參數錯誤
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            errorCode:
+              type: string
+              enum: ["INVALID_LIMIT", "INVALID_SORT_FIELD", "INVALID_CURSOR", "INVALID_FIELDS"]
+              example: "INVALID_LIMIT"
+            message:
+              type: string
+              example: "limit must be an integer between 1 and 1000"
+            data:
+              type: "null"
+              example: null
       500:
         description: 伺服器內部錯誤
         schema:
@@ -170,34 +498,1317 @@ def get_teams():
               example: null
     """
     try:
-        teams_list = [team.to_dict() for team in teams_db.values()]
+        limit = request.args.get('limit', DEFAULT_PAGE_SIZE)
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            return jsonify(create_api_response(result=False, error_code="INVALID_LIMIT", message=f"limit must be an integer between 1 and {MAX_PAGE_SIZE}")), 400
+
+        sort = request.args.get('sort', 'createdAt')
+        order = request.args.get('order', 'asc')
+        if sort not in SORT_FIELDS or order not in ('asc', 'desc'):
+            return jsonify(create_api_response(result=False, error_code="INVALID_SORT_FIELD", message=f"sort must be one of {', '.join(SORT_FIELDS)} and order must be asc or desc")), 400
+        reverse = order == 'desc'
+
+        try:
+            fields = parse_fields(request.args.get('fields', ''))
+        except ValueError as e:
+            return jsonify(create_api_response(result=False, error_code="INVALID_FIELDS", message=str(e))), 400
+        serialize = team_serializer(fields)
+
+        after = None
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                after = decode_cursor(cursor, sort)
+            except ValueError as e:
+                return jsonify(create_api_response(result=False, error_code="INVALID_CURSOR", message=str(e))), 400
+
+        # 先取得版本再查詢，確保回應內容不會比 ETag 代表的版本舊
+        version = store.version()
+        etag = representation_etag(f"teams.{version}", fields)
+        last_modified = store.last_modified()
+        matched = is_not_modified(etag, last_modified)
+        if matched:
+            return not_modified(matched, last_modified)
+
+        mimetype = negotiate()
+        encoding = compressor.negotiate(request.accept_encodings)
+        # 以正規化後的參數為鍵：欄位順序、空白或參數順序不同的相同查詢共用快取
+        name_prefix, name, member = request.args.get('namePrefix', ''), request.args.get('name'), request.args.get('member')
+        cache_key = (sort, reverse, limit, cursor, name_prefix, name, member, fields, mimetype, encoding)
+        cached = list_cache.get(version, cache_key) if encoding else None
+        if cached is not None:
+            response = with_validators(negotiated_response(cached, mimetype), etag, last_modified)
+            return compressor.encoded(response, encoding)
+
+        try:
+            teams, total = store.query(
+                sort=sort,
+                reverse=reverse,
+                after=after,
+                limit=limit + 1,
+                name_prefix=name_prefix,
+                name=name,
+                member=member
+            )
+        except ValueError as e:
+            return jsonify(create_api_response(result=False, error_code="INVALID_CURSOR", message=str(e))), 400
+        next_cursor = None
+        if len(teams) > limit:
+            next_cursor = encode_cursor(sort, store.cursor_key(teams[limit - 1], sort))
+        teams_list = [serialize(team) for team in teams[:limit]]
         data = {
             'teams': teams_list,
-            'total': len(teams_list)
+            'total': total,
+            'nextCursor': next_cursor
         }
-        return jsonify(create_api_response(message="Teams retrieved successfully", data=data))
+        response = negotiated_response(render(create_api_response(message="Teams retrieved successfully", data=data), mimetype), mimetype)
+        with_validators(response, etag, last_modified)
+        if encoding and response.content_length >= compressor.min_size:
+            compressor.apply(response, encoding)
+            list_cache.put(version, cache_key, response.get_data())
+        return response
     except Exception as e:
         return jsonify(create_api_response(result=False, error_code="GET_TEAMS_ERROR", message=str(e))), 500
 
-@app.route('/api/teams/<team_id>', methods=['GET'])
-def get_team(team_id):
+@app.route('/api/teams/export', methods=['GET'])
+def export_teams():
     """
-    取得特定團隊詳細資訊
+    匯出所有團隊（NDJSON 串流）
+    ---
+    tags:
+      - Teams
+    summary: 以 NDJSON 串流匯出所有團隊
+    description: 每行一個團隊 JSON，依建立時間排序並以游標逐批讀取，伺服器記憶體用量與資料量無關
+    produces:
+      - application/x-ndjson
+    responses:
+      200:
+        description: 每行一個團隊物件（id、name、members、createdAt、updatedAt）
+        schema:
+          type: string
+          example: '{"id":"550e8400-e29b-41d4-a716-446655440000","name":"前端開發團隊","members":["張三"],"createdAt":"2023-12-01T10:30:00.000000","updatedAt":"2023-12-01T10:30:00.000000"}'
+    """
+    def generate():
+        for teams in store.iter_batches(STREAM_CHUNK_SIZE):
+            yield b''.join(team.to_json() + b'\n' for team in teams)
+
+    return Response(generate(), mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': 'attachment; filename="teams.ndjson"'})
+
+@app.route('/api/teams/search', methods=['GET'])
+def search_teams():
+    """
+    搜尋團隊
+    ---
+    tags:
+      - Teams
+    summary: 依團隊名稱與成員名稱搜尋（子字串與容錯）
+    description: |
+      回傳名稱或成員名稱包含 q 的團隊（不分大小寫與全形/半形），例如 q=開發 可找到「前端開發團隊」；
+      三個字以上的查詢也會找到有錯字的名稱。結果依分數由高到低排序，每個團隊只出現一次：
+      包含 q 的分數為 0.5–1（名稱越短、從開頭符合者越高），容錯符合的分數低於 0.5，成員符合的分數乘以 0.9。
+      查詢非常籠統、候選過多時只檢查部分候選，truncated 為 true。
+      SQLite 後端只支援子字串搜尋。
+    parameters:
+      - name: q
+        in: query
+        type: string
+        required: true
+        description: 搜尋字串
+        example: "開發"
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        default: 20
+        minimum: 1
+        maximum: 100
+        description: 最多回傳筆數
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: 以逗號分隔要回傳的團隊欄位（id、name、members、createdAt、updatedAt），未指定時回傳全部
+        example: "id,name"
+    responses:
+      200:
+        description: 搜尋結果
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: true
+            errorCode:
+              type: string
+              example: ""
+            message:
+              type: string
+              example: "Teams searched successfully"
+            data:
+              type: object
+              properties:
+                results:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      score:
+                        type: number
+                        example: 0.82
+                      matchedField:
+                        type: string
+                        enum: ["name", "members"]
+                        example: "name"
+                      matched:
+                        type: string
+                        description: 符合的團隊名稱或成員名稱
+                        example: "前端開發團隊"
+                      team:
+                        type: object
+                        example: {"id": "550e8400-e29b-41d4-a716-446655440000", "name": "前端開發團隊", "members": ["張三", "李四"], "createdAt": "2023-12-01T10:30:00.000000", "updatedAt": "2023-12-01T10:30:00.000000"}
+                total:
+                  type: integer
+                  description: 回傳的結果數
+                  example: 1
+                truncated:
+                  type: boolean
+                  description: 是否只檢查了部分候選
+                  example: false
+      400:
+        description: 查詢參數錯誤
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            errorCode:
+              type: string
+              enum: ["INVALID_QUERY", "INVALID_LIMIT", "INVALID_FIELDS"]
+              example: "INVALID_QUERY"
+            message:
+              type: string
+              example: "q must be a non-empty string"
+            data:
+              type: "null"
+              example: null
+      500:
+        description: 伺服器內部錯誤
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            errorCode:
+              type: string
+              example: "SEARCH_TEAMS_ERROR"
+            message:
+              type: string
+              example: "Internal server error"
+            data:
+              type: "null"
+              example: null
+    """
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify(create_api_response(result=False, error_code="INVALID_QUERY", message="q must be a non-empty string")), 400
+
+        limit = request.args.get('limit', DEFAULT_SEARCH_LIMIT)
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= MAX_SEARCH_LIMIT:
+            return jsonify(create_api_response(result=False, error_code="INVALID_LIMIT", message=f"limit must be an integer between 1 and {MAX_SEARCH_LIMIT}")), 400
+
+        try:
+            serialize = team_serializer(parse_fields(request.args.get('fields', '')))
+        except ValueError as e:
+            return jsonify(create_api_response(result=False, error_code="INVALID_FIELDS", message=str(e))), 400
+
+        hits, truncated = store.search(query, limit)
+        data = {
+            'results': [{
+                'score': round(hit.score, 4),
+                'matchedField': hit.field,
+                'matched': hit.matched,
+                'team': serialize(hit.team)
+            } for hit in hits],
+            'total': len(hits),
+            'truncated': truncated
+        }
+        return json_response(create_api_response(message="Teams searched successfully", data=data))
+    except Exception as e:
+        return jsonify(create_api_response(result=False, error_code="SEARCH_TEAMS_ERROR", message=str(e))), 500
+
+@app.route('/api/teams/stats', methods=['GET'])
+def get_team_stats():
+    """
+    團隊統計
+    ---
+    tags:
+      - Teams
+    summary: 團隊數、成員數與團隊人數直方圖
+    description: |
+      記憶體儲存的統計隨新增、更新、刪除逐筆調整，回應為 O(1)，不需要取得整個團隊列表；SQLite 後端以聚合查詢計算。
+      members 為各團隊成員數的總和，distinctMembers 為不重複的成員名稱數，同一團隊中重複的成員只算一次。
+      支援以 ETag / Last-Modified 做條件式請求，資料未變動時回應 304。
+    responses:
+      200:
+        description: 統計結果
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: true
+            errorCode:
+              type: string
+              example: ""
+            message:
+              type: string
+              example: "Team statistics retrieved successfully"
+            data:
+              type: object
+              properties:
+                teams:
+                  type: integer
+                  example: 5
+                members:
+                  type: integer
+                  example: 18
+                distinctMembers:
+                  type: integer
+                  example: 12
+                averageTeamSize:
+                  type: number
+                  example: 3.6
+                teamSizes:
+                  type: array
+                  description: 團隊人數直方圖，max 為 null 表示沒有上限
+                  items:
+                    type: object
+                    properties:
+                      min:
+                        type: integer
+                        example: 3
+                      max:
+                        type: integer
+                        example: 5
+                      teams:
+                        type: integer
+                        example: 4
+      304:
+        description: 資料未變動
+      500:
+        description: 伺服器內部錯誤
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            errorCode:
+              type: string
+              example: "GET_TEAM_STATS_ERROR"
+            message:
+              type: string
+              example: "Internal server error"
+            data:
+              type: "null"
+              example: null
+    """
+    try:
+        # 先取得版本再讀取統計，確保回應內容不會比 ETag 代表的版本舊
+        version = store.version()
+        etag = representation_etag(f"stats.{version}")
+        last_modified = store.last_modified()
+        matched = is_not_modified(etag, last_modified)
+        if matched:
+            return not_modified(matched, last_modified)
+
+        stats = store.stats()
+        data = {
+            'teams': stats.teams,
+            'members': stats.members,
+            'distinctMembers': stats.distinct_members,
+            'averageTeamSize': round(stats.members / stats.teams, 2) if stats.teams else 0,
+            'teamSizes': [{'min': lower, 'max': upper, 'teams': count} for lower, upper, count in stats.team_sizes]
+        }
+        response = json_response(create_api_response(message="Team statistics retrieved successfully", data=data))
+        return with_validators(response, etag, last_modified)
+    except Exception as e:
+        return jsonify(create_api_response(result=False, error_code="GET_TEAM_STATS_ERROR", message=str(e))), 500
+
+@app.route('/api/teams/changes', methods=['GET'])
+def team_changes():
+    """
+    訂閱團隊變動（Server-Sent Events）
+    ---
+    tags:
+      - Teams
+    summary: 以 SSE 串流推送團隊的新增、更新與刪除
+    description: |
+      每個事件的 id 為單調遞增的序號，event 為 created、updated 或 deleted；
+      created 與 updated 的 data 為完整團隊，deleted 的 data 只有 id。
+      斷線重連時瀏覽器的 EventSource 會自動帶上 Last-Event-ID，從下一筆事件續傳；
+      該序號已不在伺服器保留的最近事件內（或服務重啟過）時先送出 reset 事件，客戶端應重新取得列表。
+      未提供 Last-Event-ID 時從目前最新的事件之後開始；閒置時定期送出 keep-alive 註解。
+      每個行程各自維護事件序號，多個 worker 行程時請使用記憶體儲存（單一 worker）。
+    produces:
+      - text/event-stream
+    parameters:
+      - name: Last-Event-ID
+        in: header
+        type: integer
+        required: false
+        description: 最後收到的事件序號
+      - name: lastEventId
+        in: query
+        type: integer
+        required: false
+        description: 同 Last-Event-ID，供無法設定標頭的客戶端使用
+    responses:
+      200:
+        description: 事件串流
+        schema:
+          type: string
+          example: 'id: 42\nevent: updated\ndata: {"id":"550e8400-e29b-41d4-a716-446655440000","name":"前端開發團隊","members":["張三"],"createdAt":"2023-12-01T10:30:00.000000","updatedAt":"2023-12-01T11:00:00.000000"}\n\n'
+      400:
+        description: Last-Event-ID 格式錯誤
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            errorCode:
+              type: string
+              example: "INVALID_LAST_EVENT_ID"
+            message:
+              type: string
+              example: "Last-Event-ID must be a non-negative integer"
+            data:
+              type: object
+              example: null
+      503:
+        description: 同時訂閱數已達 MAX_SSE_SUBSCRIBERS（WSGI 模式），附 Retry-After
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            errorCode:
+              type: string
+              example: "TOO_MANY_SUBSCRIBERS"
+            message:
+              type: string
+              example: "Too many change subscribers, please retry later"
+            data:
+              type: object
+              example: null
+    """
+    try:
+        after = parse_last_event_id(request.headers.get('Last-Event-ID', request.args.get('lastEventId')))
+    except ValueError:
+        return jsonify(create_api_response(result=False, error_code="INVALID_LAST_EVENT_ID", message="Last-Event-ID must be a non-negative integer")), 400
+
+    if not sse_subscribers.try_acquire():
+        response = jsonify(create_api_response(result=False, error_code="TOO_MANY_SUBSCRIBERS", message="Too many change subscribers, please retry later"))
+        response.headers['Retry-After'] = retry_after(SSE_HEARTBEAT)
+        return response, 503
+
+    response = Response(stream_changes(change_feed, after, SSE_HEARTBEAT), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # 客戶端斷線、伺服器關閉串流時才釋放名額
+    response.call_on_close(sse_subscribers.release)
+    return response
+
+@app.route('/api/teams/import', methods=['POST'])
+def import_teams():
+    """
+    匯入團隊（NDJSON）
+    ---
+    tags:
+      - Teams
+    summary: 以 NDJSON 匯入團隊
+    description: |
+      請求內容每行一個團隊 JSON，伺服器逐行解析並每 1000 筆寫入一次，不會一次載入整個檔案。
+      帶有 id 的行（例如匯出檔）會保留原本的 id 與時間；id 已存在或驗證失敗的行會略過並列在 errors 中（最多 100 筆）。
+    consumes:
+      - application/x-ndjson
+    parameters:
+      - name: body
+        in: body
+        required: true
+        description: NDJSON，每行一個團隊
+        schema:
+          type: string
+          example: '{"name": "資料團隊", "members": ["小明"]}'
+    responses:
+      200:
+        description: 匯入完成
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: true
+            errorCode:
+              type: string
+              example: ""
+            message:
+              type: string
+              example: "Teams imported successfully"
+            data:
+              type: object
+              properties:
+                imported:
+                  type: integer
+                  example: 1000
+                failed:
+                  type: integer
+                  example: 0
+                errors:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      line:
+                        type: integer
+                        example: 3
+                      errorCode:
+                        type: string
+                        example: "INVALID_TEAM_NAME"
+                      message:
+                        type: string
+                        example: "Team name cannot be empty"
+      500:
+        description: 伺服器內部錯誤（已寫入的批次不會還原）
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            errorCode:
+              type: string
+              example: "IMPORT_TEAMS_ERROR"
+            message:
+              type: string
+              example: "Internal server error"
+            data:
+              type: "null"
+              example: null
+    """
+    imported, failed, errors = 0, 0, []
+    try:
+        chunk, chunk_ids = [], set()
+
+        def flush():
+            nonlocal imported
+            # 逐行讀取時的檢查只是為了盡早略過；其他請求可能同時建立相同 id 的團隊，以儲存在鎖內的檢查為準，
+            # 衝突的行移出這一批並記錄錯誤後重試
+            while True:
+                try:
+                    store.add_many([team for _, team in chunk])
+                    break
+                except TeamExists as e:
+                    index = next(i for i, (_, team) in enumerate(chunk) if team.id == str(e))
+                    reject(chunk.pop(index)[0], ("TEAM_ALREADY_EXISTS", "A team with this id already exists"))
+            imported += len(chunk)
+            chunk.clear()
+            chunk_ids.clear()
+
+        def reject(line_number, error):
+            nonlocal failed
+            failed += 1
+            if len(errors) < MAX_IMPORT_ERRORS:
+                errors.append({'line': line_number, 'errorCode': error[0], 'message': error[1]})
+
+        for line_number, line in enumerate(request.stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                team, error = team_from_import(json.loads(line))
+            except ValueError:
+                team, error = None, ("INVALID_JSON", "Line is not valid JSON")
+            if team is not None and (team.id in chunk_ids or store.get(team.id) is not None):
+                team, error = None, ("TEAM_ALREADY_EXISTS", "A team with this id already exists")
+            if error:
+                reject(line_number, error)
+                continue
+            chunk.append((line_number, team))
+            chunk_ids.add(team.id)
+            if len(chunk) >= STREAM_CHUNK_SIZE:
+                flush()
+        if chunk:
+            flush()
+
+        message = "Teams imported successfully" if not failed else f"Teams imported with {failed} invalid lines skipped"
+        return jsonify(create_api_response(message=message, data={'imported': imported, 'failed': failed, 'errors': errors}))
+    except Exception as e:
+        return jsonify(create_api_response(result=False, error_code="IMPORT_TEAMS_ERROR", message=f"{e} ({imported} teams imported before the error)")), 500
+
+@app.route('/api/teams/<team_id>', methods=['GET'])
+def get_team(team_id):
+    """
+    取得特定團隊詳細資訊
+    ---
+    tags:
+      - Teams
+    summary: 根據 ID 取得團隊
+    description: 使用團隊 ID 獲取特定團隊的詳細資訊
+    parameters:
+      - name: team_id
+        in: path
+        type: string
+        required: true
+        description: 團隊的唯一識別碼
+        example: "550e8400-e29b-41d4-a716-446655440000"
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: 以逗號分隔要回傳的團隊欄位（id、name、members、createdAt、updatedAt），未指定時回傳全部
+        example: "id,name"
+      - name: If-None-Match
+        in: header
+        type: string
+        required: false
+        description: 上次回應的 ETag，內容未變動時回傳 304
+    responses:
+      200:
+        description: 成功取得團隊資訊
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: true
+            errorCode:
+              type: string
+              example: ""
+            message:
+              type: string
+              example: "Team retrieved successfully"
+            data:
+              type: object
+              properties:
+                team:
+                  type: object
+                  properties:
+                    id:
+                      type: string
+                      example: "550e8400-e29b-41d4-a716-446655440000"
+                    name:
+                      type: string
+                      example: "前端開發團隊"
+                    members:
+                      type: array
+                      items:
+                        type: string
+                      example: ["張三", "李四", "王五"]
+                    createdAt:
+                      type: string
+                      format: date-time
+                      example: "2023-12-01T10:30:00.000000"
+                    updatedAt:
+                      type: string
+                      format: date-time
+                      example: "2023-12-01T10:30:00.000000"
+      304:
+        description: 內容未變動（If-None-Match / If-Modified-Since 符合）
+      400:
+        description: fields 包含未知的欄位
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            errorCode:
+              type: string
+              example: "INVALID_FIELDS"
+            message:
+              type: string
+              example: "Unknown fields: email. Allowed: id, name, members, createdAt, updatedAt"
+            data:
+              type: "null"
+              example: null
+      404:
+        description: 找不到指定的團隊
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            errorCode:
+              type: string
+              example: "TEAM_NOT_FOUND"
+            message:
+              type: string
+              example: "Team not found"
+            data:
+              type: "null"
+              example: null
+      500:
+        description: 伺服器內部錯誤
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            errorCode:
+              type: string
+              example: "GET_TEAM_ERROR"
+            message:
+              type: string
+              example: "Internal server error"
+            data:
+              type: "null"
+              example: null
+    """
+    try:
+        try:
+            fields = parse_fields(request.args.get('fields', ''))
+        except ValueError as e:
+            return jsonify(create_api_response(result=False, error_code="INVALID_FIELDS", message=str(e))), 400
+        team = store.get(team_id)
+        if team is None:
+            return jsonify(create_api_response(result=False, error_code="TEAM_NOT_FOUND", message="Team not found")), 404
+        etag = representation_etag(team.etag, fields)
+        matched = is_not_modified(etag, team.last_modified)
+        if matched:
+            return not_modified(matched, team.last_modified)
+        response = json_response(create_api_response(message="Team retrieved successfully", data={'team': team_serializer(fields)(team)}))
+        return with_validators(response, etag, team.last_modified)
+    except Exception as e:
+        return jsonify(create_api_response(result=False, error_code="GET_TEAM_ERROR", message=str(e))), 500
+
+@app.route('/api/teams', methods=['POST'])
+def create_team():
+    """
+    新增團隊
+    ---
+    tags:
+      - Teams
+    summary: 建立新團隊
+    description: 建立一個新的團隊，需要提供團隊名稱和成員列表；帶 Idempotency-Key 時，相同鍵與相同本文的重試會重播第一次的 201 回應（附 Idempotent-Replayed 標頭），不會重複建立
+    parameters:
+      - name: Idempotency-Key
+        in: header
+        type: string
+        required: false
+        description: 客戶端產生的唯一鍵（建議使用 UUID），最長 255 字元
+        example: "6f1c2e1a-8a4b-4c55-9d2f-3b9e1c7d0a42"
+      - name: body
+        in: body
+        required: true
+        description: 團隊資料
+        schema:
+          type: object
+          required:
+            - name
+          properties:
+            name:
+              type: string
+              description: 團隊名稱
+              example: "新產品開發團隊"
+              minLength: 1
+            members:
+              type: array
+              description: 團隊成員列表
+              items:
+                type: string
+              example: ["小明", "小華", "小美", "小強"]
+          example:
+            name: "新產品開發團隊"
+            members: ["小明", "小華", "小美", "小強"]
+    responses:
+      201:
+        description: 團隊建立成功
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: true
+            errorCode:
+              type: string
+              example: ""
+            message:
+              type: string
+              example: "Team created successfully"
+            data:
+              type: object
+              properties:
+                team:
+                  type: object
+                  properties:
+                    id:
+                      type: string
+                      example: "550e8400-e29b-41d4-a716-446655440001"
+                    name:
+                      type: string
+                      example: "新產品開發團隊"
+                    members:
+                      type: array
+                      items:
+                        type: string
+                      example: ["小明", "小華", "小美", "小強"]
+                    createdAt:
+                      type: string
+                      format: date-time
+                      example: "2023-12-01T15:30:00.000000"
+                    updatedAt:
+                      type: string
+                      format: date-time
+                      example: "2023-12-01T15:30:00.000000"
+      400:
+        description: 請求格式錯誤或必要欄位缺失
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            errorCode:
+              type: string
+              enum: ["INVALID_REQUEST_FORMAT", "INVALID_TEAM_NAME", "INVALID_MEMBERS_FORMAT", "INVALID_TEAM_ID", "INVALID_IDEMPOTENCY_KEY"]
+              example: "INVALID_TEAM_NAME"
+            message:
+              type: string
+              example: "Team name cannot be empty"
+            data:
+              type: "null"
+              example: null
+      409:
+        description: 分片模式下 router 指定的 id 已存在，或同一個 Idempotency-Key 的請求仍在處理中（附 Retry-After）
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            errorCode:
+              type: string
+              enum: ["TEAM_ALREADY_EXISTS", "IDEMPOTENCY_KEY_IN_USE"]
+              example: "TEAM_ALREADY_EXISTS"
+            message:
+              type: string
+              example: "A team with this id already exists"
+            data:
+              type: "null"
+              example: null
+      422:
+        description: Idempotency-Key 已搭配不同的請求本文使用過，或重試的 Accept 協商出與第一次不同的格式
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            errorCode:
+              type: string
+              example: "IDEMPOTENCY_KEY_REUSED"
+            message:
+              type: string
+              example: "Idempotency-Key was already used with a different request body"
+            data:
+              type: "null"
+              example: null
+      500:
+        description: 伺服器內部錯誤
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            errorCode:
+              type: string
+              example: "CREATE_TEAM_ERROR"
+            message:
+              type: string
+              example: "Internal server error"
+            data:
+              type: "null"
+              example: null
+    """
+    key = request.headers.get('Idempotency-Key')
+    if key is None:
+        return insert_team()
+    if not key or len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        return jsonify(create_api_response(result=False, error_code="INVALID_IDEMPOTENCY_KEY", message=f"Idempotency-Key must be 1 to {MAX_IDEMPOTENCY_KEY_LENGTH} characters")), 400
+
+    try:
+        stored, replayed = idempotency_cache.run(key, fingerprint(request.get_data()),
+                                                 lambda: store_response(insert_team()),
+                                                 lambda stored: stored.status == 201)
+    except IdempotencyKeyReused:
+        return jsonify(create_api_response(result=False, error_code="IDEMPOTENCY_KEY_REUSED", message="Idempotency-Key was already used with a different request body")), 422
+    except IdempotencyKeyInFlight:
+        response = jsonify(create_api_response(result=False, error_code="IDEMPOTENCY_KEY_IN_USE", message="A request with this Idempotency-Key is still in progress"))
+        response.headers['Retry-After'] = '1'
+        return response, 409
+    response = app.response_class(stored.body, status=stored.status, headers=stored.headers)
+    if replayed:
+        # 只保存第一次協商的格式：重試要求其他格式時不能把原本的 bytes 當成它要的格式回傳
+        if response.mimetype != negotiate():
+            return jsonify(create_api_response(result=False, error_code="IDEMPOTENCY_KEY_REUSED", message=f"Idempotency-Key was already used with a request that accepted {response.mimetype}")), 422
+        response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def store_response(rv):
+    """把路由的回傳值轉成可以保存、之後重播的回應"""
+    response = app.make_response(rv)
+    return StoredResponse(response.status_code, response.get_data(), list(response.headers))
+
+def insert_team():
+    try:
+        if not request.is_json:
+            return jsonify(create_api_response(result=False, error_code="INVALID_REQUEST_FORMAT", message="Request must be JSON")), 400
+
+        name, members, error = validate_team_data(request.get_json())
+        if error:
+            return jsonify(create_api_response(result=False, error_code=error[0], message=error[1])), 400
+
+        team_id = request.headers.get(TEAM_ID_HEADER) if TEAM_ID_HEADER else None
+        if team_id:
+            try:
+                team_id = str(uuid.UUID(team_id))
+            except ValueError:
+                return jsonify(create_api_response(result=False, error_code="INVALID_TEAM_ID", message="id must be a UUID")), 400
+
+        new_team = Team(name, members, team_id)
+        # 先編碼再寫入儲存：編碼失敗時不會留下無法輸出的團隊
+        new_team.to_json()
+        try:
+            store.add(new_team)
+        except TeamExists:
+            return jsonify(create_api_response(result=False, error_code="TEAM_ALREADY_EXISTS", message="A team with this id already exists")), 409
+
+        response = json_response(create_api_response(message="Team created successfully", data={'team': new_team.to_raw_json()}), 201)
+        return with_validators(response, representation_etag(new_team.etag), new_team.last_modified)
+    except Exception as e:
+        return jsonify(create_api_response(result=False, error_code="CREATE_TEAM_ERROR", message=str(e))), 500
+
+@app.route('/api/teams/<team_id>', methods=['PUT'])
+def update_team(team_id):
+    """
+    更新團隊資訊
+    ---
+    tags:
+      - Teams
+    summary: 更新現有團隊
+    description: 更新指定團隊的名稱和成員列表，可以只更新部分欄位
+    parameters:
+      - name: team_id
+        in: path
+        type: string
+        required: true
+        description: 要更新的團隊 ID
+        example: "550e8400-e29b-41d4-a716-446655440000"
+      - name: If-Match
+        in: header
+        type: string
+        required: false
+        description: 團隊目前的 ETag，版本不符時回傳 412（樂觀並行控制）
+      - name: body
+        in: body
+        required: true
+        description: 要更新的團隊資料
+        schema:
+          type: object
+          properties:
+            name:
+              type: string
+              description: 新的團隊名稱（選填）
+              example: "更新後的團隊名稱"
+            members:
+              type: array
+              description: 新的團隊成員列表（選填）
+              items:
+                type: string
+              example: ["新成員A", "新成員B", "新成員C"]
+          example:
+            name: "更新後的前端開發團隊"
+            members: ["張三", "李四", "王五", "新成員趙六"]
+    responses:
+      200:
+        description: 團隊更新成功
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: true
+            errorCode:
+              type: string
+              example: ""
+            message:
+              type: string
+              example: "Team updated successfully"
+            data:
+              type: object
+              properties:
+                team:
+                  type: object
+                  properties:
+                    id:
+                      type: string
+                      example: "550e8400-e29b-41d4-a716-446655440000"
+                    name:
+                      type: string
+                      example: "更新後的前端開發團隊"
+                    members:
+                      type: array
+                      items:
+                        type: string
+                      example: ["張三", "李四", "王五", "新成員趙六"]
+                    createdAt:
+                      type: string
+                      format: date-time
+                      example: "2023-12-01T10:30:00.000000"
+                    updatedAt:
+                      type: string
+                      format: date-time
+                      example: "2023-12-01T16:45:00.000000"
+      400:
+        description: 請求格式錯誤
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            errorCode:
+              type: string
+              enum: ["INVALID_REQUEST_FORMAT", "INVALID_TEAM_NAME", "INVALID_MEMBERS_FORMAT"]
+              example: "INVALID_REQUEST_FORMAT"
+            message:
+              type: string
+              example: "Request must be JSON"
+            data:
+              type: "null"
+              example: null
+      404:
+        description: 找不到指定的團隊
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            errorCode:
+              type: string
+              example: "TEAM_NOT_FOUND"
+            message:
+              type: string
+              example: "Team not found"
+            data:
+              type: "null"
+              example: null
+      412:
+        description: If-Match 的 ETag 與團隊目前版本不符
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            errorCode:
+              type: string
+              example: "PRECONDITION_FAILED"
+            message:
+              type: string
+              example: "Team has been modified by another request"
+            data:
+              type: "null"
+              example: null
+      500:
+        description: 伺服器內部錯誤
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            errorCode:
+              type: string
+              example: "UPDATE_TEAM_ERROR"
+            message:
+              type: string
+              example: "Internal server error"
+            data:
+              type: "null"
+              example: null
+    """
+    try:
+        current = store.get(team_id)
+        if current is None:
+            return jsonify(create_api_response(result=False, error_code="TEAM_NOT_FOUND", message="Team not found")), 404
+
+        # If-Match：樂觀並行控制，版本不符時拒絕更新
+        expected_version = None
+        if request.if_match:
+            if if_match_failed(current.etag):
+                return precondition_failed()
+            expected_version = current.version
+
+        if not request.is_json:
+            return jsonify(create_api_response(result=False, error_code="INVALID_REQUEST_FORMAT", message="Request must be JSON")), 400
+
+        name, members, error = validate_team_data(request.get_json(), partial=True)
+        if error:
+            return jsonify(create_api_response(result=False, error_code=error[0], message=error[1])), 400
+
+        try:
+            team = store.update(team_id, name=name, members=members, expected_version=expected_version)
+        except VersionConflict:
+            return precondition_failed()
+        if team is None:
+            return jsonify(create_api_response(result=False, error_code="TEAM_NOT_FOUND", message="Team not found")), 404
+
+        response = json_response(create_api_response(message="Team updated successfully", data={'team': team.to_raw_json()}))
+        return with_validators(response, representation_etag(team.etag), team.last_modified)
+    except Exception as e:
+        return jsonify(create_api_response(result=False, error_code="UPDATE_TEAM_ERROR", message=str(e))), 500
+
+@app.route('/api/teams/<team_id>/members', methods=['PATCH'])
+def patch_team_members(team_id):
+    """
+    新增或移除團隊成員
+    ---
+    tags:
+      - Teams
+    summary: 以 add / remove 操作調整團隊成員
+    description: 只需送出要變動的成員，先移除再新增；新增已存在或移除不存在的成員時整個操作不生效
+    parameters:
+      - name: team_id
+        in: path
+        type: string
+        required: true
+        description: 要更新的團隊 ID
+        example: "550e8400-e29b-41d4-a716-446655440000"
+      - name: delta
+        in: query
+        type: boolean
+        required: false
+        description: 為 true 時只回傳這次的變動，不回傳完整團隊
+        example: true
+      - name: If-Match
+        in: header
+        type: string
+        required: false
+        description: 團隊目前的 ETag，版本不符時回傳 412（樂觀並行控制）
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            add:
+              type: array
+              description: 要新增的成員，會接在成員列表最後
+              items:
+                type: string
+              example: ["新成員趙六"]
+            remove:
+              type: array
+              description: 要移除的成員
+              items:
+                type: string
+              example: ["王五"]
+    responses:
+      200:
+        description: 成員更新成功；delta=true 時 data 為 id、added、removed、memberCount、updatedAt
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: true
+            errorCode:
+              type: string
+              example: ""
+            message:
+              type: string
+              example: "Team members updated successfully"
+            data:
+              type: object
+              example:
+                id: "550e8400-e29b-41d4-a716-446655440000"
+                added: ["新成員趙六"]
+                removed: ["王五"]
+                memberCount: 3
+                updatedAt: "2023-12-01T16:45:00.000000"
+      400:
+        description: 請求格式錯誤，或 add、remove 內有重複的成員
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            errorCode:
+              type: string
+              enum: ["INVALID_REQUEST_FORMAT", "INVALID_MEMBERS_FORMAT", "VALIDATION_ERROR"]
+              example: "INVALID_MEMBERS_FORMAT"
+            message:
+              type: string
+              example: "add and remove must be lists of strings"
+            data:
+              type: "null"
+              example: null
+      404:
+        description: 找不到指定的團隊，或要移除的成員不在團隊中
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            errorCode:
+              type: string
+              enum: ["TEAM_NOT_FOUND", "MEMBER_NOT_FOUND"]
+              example: "MEMBER_NOT_FOUND"
+            message:
+              type: string
+              example: "Member is not in the team: 王五"
+            data:
+              type: "null"
+              example: null
+      409:
+        description: 要新增的成員已在團隊中
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            errorCode:
+              type: string
+              example: "MEMBER_ALREADY_EXISTS"
+            message:
+              type: string
+              example: "Member is already in the team: 張三"
+            data:
+              type: "null"
+              example: null
+      412:
+        description: If-Match 的 ETag 與團隊目前版本不符
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            errorCode:
+              type: string
+              example: "PRECONDITION_FAILED"
+            message:
+              type: string
+              example: "Team has been modified by another request"
+            data:
+              type: "null"
+              example: null
+      500:
+        description: 伺服器內部錯誤
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            errorCode:
+              type: string
+              example: "PATCH_TEAM_MEMBERS_ERROR"
+            message:
+              type: string
+              example: "Internal server error"
+            data:
+              type: "null"
+              example: null
+    """
+    try:
+        current = store.get(team_id)
+        if current is None:
+            return jsonify(create_api_response(result=False, error_code="TEAM_NOT_FOUND", message="Team not found")), 404
+
+        expected_version = None
+        if request.if_match:
+            if if_match_failed(current.etag):
+                return precondition_failed()
+            expected_version = current.version
+
+        if not request.is_json:
+            return jsonify(create_api_response(result=False, error_code="INVALID_REQUEST_FORMAT", message="Request must be JSON")), 400
+        data = request.get_json()
+        if not isinstance(data, dict):
+            return jsonify(create_api_response(result=False, error_code="INVALID_REQUEST_FORMAT", message="Request must be a JSON object")), 400
+        add, remove = data.get('add', []), data.get('remove', [])
+        if not is_valid_members(add) or not is_valid_members(remove) or not (add or remove):
+            return jsonify(create_api_response(result=False, error_code="INVALID_MEMBERS_FORMAT", message="add and remove must be lists of strings, and at least one must be non-empty")), 400
+        if len(set(add)) != len(add) or len(set(remove)) != len(remove):
+            return jsonify(create_api_response(result=False, error_code="VALIDATION_ERROR", message="add and remove must not contain duplicate members")), 400
+
+        try:
+            team = store.update_members(team_id, add=add, remove=remove, expected_version=expected_version)
+        except VersionConflict:
+            return precondition_failed()
+        except MemberConflict as e:
+            if e.error_code == 'MEMBER_NOT_FOUND':
+                return jsonify(create_api_response(result=False, error_code=e.error_code, message=f"Member is not in the team: {e.member}")), 404
+            return jsonify(create_api_response(result=False, error_code=e.error_code, message=f"Member is already in the team: {e.member}")), 409
+        if team is None:
+            return jsonify(create_api_response(result=False, error_code="TEAM_NOT_FOUND", message="Team not found")), 404
+
+        delta = request.args.get('delta', '').lower() in ('1', 'true')
+        if delta:
+            data = {'id': team.id, 'added': add, 'removed': remove, 'memberCount': len(team.members), 'updatedAt': team.updatedAt}
+        else:
+            data = {'team': team.to_raw_json()}
+        response = json_response(create_api_response(message="Team members updated successfully", data=data))
+        return with_validators(response, representation_etag(team.etag, variant='delta' if delta else None), team.last_modified)
+    except Exception as e:
+        return jsonify(create_api_response(result=False, error_code="PATCH_TEAM_MEMBERS_ERROR", message=str(e))), 500
+
+@app.route('/api/teams/<team_id>', methods=['DELETE'])
+def delete_team(team_id):
+    """
+    刪除團隊
     ---
     tags:
       - Teams
-    summary: 根據 ID 取得團隊
-    description: 使用團隊 ID 獲取特定團隊的詳細資訊
+    summary: 刪除指定團隊
+    description: 永久刪除指定的團隊，此操作無法復原
     parameters:
       - name: team_id
         in: path
         type: string
         required: true
-        description: 團隊的唯一識別碼
+        description: 要刪除的團隊 ID
         example: "550e8400-e29b-41d4-a716-446655440000"
+      - name: If-Match
+        in: header
+        type: string
+        required: false
+        description: 團隊目前的 ETag，版本不符時回傳 412（樂觀並行控制）
     responses:
       200:
-        description: 成功取得團隊資訊
+        description: 團隊刪除成功
         schema:
           type: object
           properties:
@@ -209,32 +1820,13 @@ def get_team(team_id):
               example: ""
             message:
               type: string
-              example: "Team retrieved successfully"
+              example: "Team deleted successfully"
             data:
               type: object
               properties:
-                team:
-                  type: object
-                  properties:
-                    id:
-                      type: string
-                      example: "550e8400-e29b-41d4-a716-446655440000"
-                    name:
-                      type: string
-                      example: "前端開發團隊"
-                    members:
-                      type: array
-                      items:
-                        type: string
-                      example: ["張三", "李四", "王五"]
-                    createdAt:
-                      type: string
-                      format: date-time
-                      example: "2023-12-01T10:30:00.000000"
-                    updatedAt:
-                      type: string
-                      format: date-time
-                      example: "2023-12-01T10:30:00.000000"
+                deletedTeamId:
+                  type: string
+                  example: "550e8400-e29b-41d4-a716-446655440000"
       404:
         description: 找不到指定的團隊
         schema:
@@ -252,6 +1844,23 @@ def get_team(team_id):
             data:
               type: "null"
               example: null
+      412:
+        description: If-Match 的 ETag 與團隊目前版本不符
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            errorCode:
+              type: string
+              example: "PRECONDITION_FAILED"
+            message:
+              type: string
+              example: "Team has been modified by another request"
+            data:
+              type: "null"
+              example: null
       500:
         description: 伺服器內部錯誤
         schema:
@@ -262,7 +1871,7 @@ def get_team(team_id):
               example: false
             errorCode:
               type: string
-              example: "GET_TEAM_ERROR"
+              example: "DELETE_TEAM_ERROR"
             message:
               type: string
               example: "Internal server error"
@@ -271,49 +1880,84 @@ def get_team(team_id):
               example: null
     """
     try:
-        if team_id not in teams_db:
+        expected_version = None
+        if request.if_match:
+            current = store.get(team_id)
+            if current is None:
+                return jsonify(create_api_response(result=False, error_code="TEAM_NOT_FOUND", message="Team not found")), 404
+            if if_match_failed(current.etag):
+                return precondition_failed()
+            expected_version = current.version
+
+        try:
+            deleted = store.delete(team_id, expected_version=expected_version)
+        except VersionConflict:
+            return precondition_failed()
+        if not deleted:
             return jsonify(create_api_response(result=False, error_code="TEAM_NOT_FOUND", message="Team not found")), 404
-        team = teams_db[team_id]
-        return jsonify(create_api_response(message="Team retrieved successfully", data={'team': team.to_dict()}))
+
+        return jsonify(create_api_response(message="Team deleted successfully", data={'deletedTeamId': team_id}))
     except Exception as e:
-        return jsonify(create_api_response(result=False, error_code="GET_TEAM_ERROR", message=str(e))), 500
+        return jsonify(create_api_response(result=False, error_code="DELETE_TEAM_ERROR", message=str(e))), 500
 
-@app.route('/api/teams', methods=['POST'])
-def create_team():
+def parse_batch(key):
+    """取得批次請求中的陣列，格式錯誤時回傳 (None, 錯誤回應)"""
+    if not request.is_json:
+        return None, (jsonify(create_api_response(result=False, error_code="INVALID_REQUEST_FORMAT", message="Request must be JSON")), 400)
+    data = request.get_json()
+    items = data.get(key) if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return None, (jsonify(create_api_response(result=False, error_code="INVALID_BATCH_FORMAT", message=f"'{key}' must be a non-empty list")), 400)
+    if len(items) > MAX_BATCH_SIZE:
+        return None, (jsonify(create_api_response(result=False, error_code="BATCH_TOO_LARGE", message=f"A batch may contain at most {MAX_BATCH_SIZE} items")), 400)
+    return items, None
+
+def batch_item_error(index, error_code, message):
+    return {'index': index, 'result': False, 'errorCode': error_code, 'message': message}
+
+def batch_validation_failed(results):
+    data = {'results': [item for item in results if not item['result']]}
+    return jsonify(create_api_response(result=False, error_code="BATCH_VALIDATION_FAILED", message="No changes were applied because some items are invalid", data=data)), 400
+
+@app.route('/api/teams:batch', methods=['POST'])
+def create_teams_batch():
     """
-    新增團隊
+    批次新增團隊
     ---
     tags:
       - Teams
-    summary: 建立新團隊
-    description: 建立一個新的團隊，需要提供團隊名稱和成員列表
+    summary: 一次新增多個團隊
+    description: 以與單筆新增相同的規則一次驗證所有團隊，全部通過才會寫入（整批生效或整批不生效）
     parameters:
       - name: body
         in: body
         required: true
-        description: 團隊資料
         schema:
           type: object
           required:
-            - name
+            - teams
           properties:
-            name:
-              type: string
-              description: 團隊名稱
-              example: "新產品開發團隊"
-              minLength: 1
-            members:
+            teams:
               type: array
-              description: 團隊成員列表
+              maxItems: 5000
               items:
-                type: string
-              example: ["小明", "小華", "小美", "小強"]
+                type: object
+                properties:
+                  name:
+                    type: string
+                  members:
+                    type: array
+                    items:
+                      type: string
           example:
-            name: "新產品開發團隊"
-            members: ["小明", "小華", "小美", "小強"]
+            teams:
+              - name: "資料團隊"
+                members: ["小明", "小華"]
+              - name: "測試團隊"
+                members: ["小美"]
     responses:
       201:
-        description: 團隊建立成功
+        description: 全部團隊建立成功，results 依請求順序列出每筆結果
         schema:
           type: object
           properties:
@@ -325,34 +1969,28 @@ def create_team():
               example: ""
             message:
               type: string
-              example: "Team created successfully"
+              example: "Teams created successfully"
             data:
               type: object
               properties:
-                team:
-                  type: object
-                  properties:
-                    id:
-                      type: string
-                      example: "550e8400-e29b-41d4-a716-446655440001"
-                    name:
-                      type: string
-                      example: "新產品開發團隊"
-                    members:
-                      type: array
-                      items:
-                        type: string
-                      example: ["小明", "小華", "小美", "小強"]
-                    createdAt:
-                      type: string
-                      format: date-time
-                      example: "2023-12-01T15:30:00.000000"
-                    updatedAt:
-                      type: string
-                      format: date-time
-                      example: "2023-12-01T15:30:00.000000"
+                results:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      index:
+                        type: integer
+                        example: 0
+                      result:
+                        type: boolean
+                        example: true
+                      team:
+                        type: object
+                total:
+                  type: integer
+                  example: 2
       400:
-        description: 請求格式錯誤或必要欄位缺失
+        description: 請求格式錯誤，或有項目驗證失敗（data.results 只列出失敗的項目，整批不會寫入）
         schema:
           type: object
           properties:
@@ -361,14 +1999,13 @@ def create_team():
               example: false
             errorCode:
               type: string
-              enum: ["INVALID_REQUEST_FORMAT", "INVALID_TEAM_NAME", "INVALID_MEMBERS_FORMAT"]
-              example: "INVALID_TEAM_NAME"
+              enum: ["INVALID_REQUEST_FORMAT", "INVALID_BATCH_FORMAT", "BATCH_TOO_LARGE", "BATCH_VALIDATION_FAILED"]
+              example: "BATCH_VALIDATION_FAILED"
             message:
               type: string
-              example: "Team name cannot be empty"
+              example: "No changes were applied because some items are invalid"
             data:
-              type: "null"
-              example: null
+              type: object
       500:
         description: 伺服器內部錯誤
         schema:
@@ -379,7 +2016,7 @@ def create_team():
               example: false
             errorCode:
               type: string
-              example: "CREATE_TEAM_ERROR"
+              example: "BATCH_CREATE_TEAMS_ERROR"
             message:
               type: string
               example: "Internal server error"
@@ -388,65 +2025,73 @@ def create_team():
               example: null
     """
     try:
-        if not request.is_json:
-            return jsonify(create_api_response(result=False, error_code="INVALID_REQUEST_FORMAT", message="Request must be JSON")), 400
-
-        data = request.get_json()
-        name = data.get("name", "").strip()
-        members = data.get("members", [])
+        items, error_response = parse_batch('teams')
+        if error_response:
+            return error_response
 
-        if not name:
-            return jsonify(create_api_response(result=False, error_code="INVALID_TEAM_NAME", message="Team name cannot be empty")), 400
+        new_teams, results = [], []
+        for index, item in enumerate(items):
+            name, members, error = validate_team_data(item)
+            if error:
+                results.append(batch_item_error(index, *error))
+                continue
+            team = Team(name, members)
+            team.to_json()
+            new_teams.append(team)
+            results.append({'index': index, 'result': True})
+        if len(new_teams) < len(items):
+            return batch_validation_failed(results)
 
-        if not isinstance(members, list):
-            return jsonify(create_api_response(result=False, error_code="INVALID_MEMBERS_FORMAT", message="Members must be a list")), 400
-
-        new_team = Team(name, members)
-        teams_db[new_team.id] = new_team
-
-        return jsonify(create_api_response(message="Team created successfully", data={'team': new_team.to_dict()})), 201
+        store.add_many(new_teams)
+        for item, team in zip(results, new_teams):
+            item['team'] = team.to_raw_json()
+        return json_response(create_api_response(message="Teams created successfully", data={'results': results, 'total': len(results)}), 201)
     except Exception as e:
-        return jsonify(create_api_response(result=False, error_code="CREATE_TEAM_ERROR", message=str(e))), 500
+        return jsonify(create_api_response(result=False, error_code="BATCH_CREATE_TEAMS_ERROR", message=str(e))), 500
 
-@app.route('/api/teams/<team_id>', methods=['PUT'])
-def update_team(team_id):
+@app.route('/api/teams:batch', methods=['PUT'])
+def update_teams_batch():
     """
-    更新團隊資訊
+    批次更新團隊
     ---
     tags:
       - Teams
-    summary: 更新現有團隊
-    description: 更新指定團隊的名稱和成員列表，可以只更新部分欄位
+    summary: 一次更新多個團隊
+    description: 每個項目以 id 指定團隊，name、members 規則與單筆更新相同；全部驗證通過且團隊都存在才會套用
     parameters:
-      - name: team_id
-        in: path
-        type: string
-        required: true
-        description: 要更新的團隊 ID
-        example: "550e8400-e29b-41d4-a716-446655440000"
       - name: body
         in: body
         required: true
-        description: 要更新的團隊資料
         schema:
           type: object
+          required:
+            - teams
           properties:
-            name:
-              type: string
-              description: 新的團隊名稱（選填）
-              example: "更新後的團隊名稱"
-            members:
+            teams:
               type: array
-              description: 新的團隊成員列表（選填）
+              maxItems: 5000
               items:
-                type: string
-              example: ["新成員A", "新成員B", "新成員C"]
+                type: object
+                required:
+                  - id
+                properties:
+                  id:
+                    type: string
+                  name:
+                    type: string
+                  members:
+                    type: array
+                    items:
+                      type: string
           example:
-            name: "更新後的前端開發團隊"
-            members: ["張三", "李四", "王五", "新成員趙六"]
+            teams:
+              - id: "550e8400-e29b-41d4-a716-446655440000"
+                name: "更新後的團隊名稱"
+              - id: "550e8400-e29b-41d4-a716-446655440001"
+                members: ["小明", "小華", "小美"]
     responses:
       200:
-        description: 團隊更新成功
+        description: 全部團隊更新成功，results 依請求順序列出每筆結果
         schema:
           type: object
           properties:
@@ -458,51 +2103,28 @@ def update_team(team_id):
               example: ""
             message:
               type: string
-              example: "Team updated successfully"
+              example: "Teams updated successfully"
             data:
               type: object
               properties:
-                team:
-                  type: object
-                  properties:
-                    id:
-                      type: string
-                      example: "550e8400-e29b-41d4-a716-446655440000"
-                    name:
-                      type: string
-                      example: "更新後的前端開發團隊"
-                    members:
-                      type: array
-                      items:
-                        type: string
-                      example: ["張三", "李四", "王五", "新成員趙六"]
-                    createdAt:
-                      type: string
-                      format: date-time
-                      example: "2023-12-01T10:30:00.000000"
-                    updatedAt:
-                      type: string
-                      format: date-time
-                      example: "2023-12-01T16:45:00.000000"
+                results:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      index:
+                        type: integer
+                        example: 0
+                      result:
+                        type: boolean
+                        example: true
+                      team:
+                        type: object
+                total:
+                  type: integer
+                  example: 2
       400:
-        description: 請求格式錯誤
-        schema:
-          type: object
-          properties:
-            result:
-              type: boolean
-              example: false
-            errorCode:
-              type: string
-              example: "INVALID_REQUEST_FORMAT"
-            message:
-              type: string
-              example: "Request must be JSON"
-            data:
-              type: "null"
-              example: null
-      404:
-        description: 找不到指定的團隊
+        description: 請求格式錯誤，或有項目驗證失敗 / 團隊不存在 / id 重複（data.results 只列出失敗的項目，整批不會套用）
         schema:
           type: object
           properties:
@@ -511,13 +2133,13 @@ def update_team(team_id):
               example: false
             errorCode:
               type: string
-              example: "TEAM_NOT_FOUND"
+              enum: ["INVALID_REQUEST_FORMAT", "INVALID_BATCH_FORMAT", "BATCH_TOO_LARGE", "BATCH_VALIDATION_FAILED"]
+              example: "BATCH_VALIDATION_FAILED"
             message:
               type: string
-              example: "Team not found"
+              example: "No changes were applied because some items are invalid"
             data:
-              type: "null"
-              example: null
+              type: object
       500:
         description: 伺服器內部錯誤
         schema:
@@ -528,7 +2150,7 @@ def update_team(team_id):
               example: false
             errorCode:
               type: string
-              example: "UPDATE_TEAM_ERROR"
+              example: "BATCH_UPDATE_TEAMS_ERROR"
             message:
               type: string
               example: "Internal server error"
@@ -537,48 +2159,70 @@ def update_team(team_id):
               example: null
     """
     try:
-        if team_id not in teams_db:
-            return jsonify(create_api_response(result=False, error_code="TEAM_NOT_FOUND", message="Team not found")), 404
-
-        if not request.is_json:
-            return jsonify(create_api_response(result=False, error_code="INVALID_REQUEST_FORMAT", message="Request must be JSON")), 400
-
-        data = request.get_json()
-        team = teams_db[team_id]
-
-        name = data.get("name", "").strip()
-        if name:
-            team.name = name
+        items, error_response = parse_batch('teams')
+        if error_response:
+            return error_response
 
-        members = data.get("members")
-        if isinstance(members, list):
-            team.members = members
+        changes, results, seen = [], [], set()
+        for index, item in enumerate(items):
+            team_id = item.get('id') if isinstance(item, dict) else None
+            if not isinstance(team_id, str) or not team_id:
+                results.append(batch_item_error(index, "INVALID_TEAM_ID", "Each item must have a team id"))
+                continue
+            if team_id in seen:
+                results.append(batch_item_error(index, "DUPLICATE_TEAM_ID", "Team id appears more than once in the batch"))
+                continue
+            seen.add(team_id)
+            name, members, error = validate_team_data(item, partial=True)
+            if error:
+                results.append(batch_item_error(index, *error))
+                continue
+            if store.get(team_id) is None:
+                results.append(batch_item_error(index, "TEAM_NOT_FOUND", "Team not found"))
+                continue
+            changes.append((team_id, name, members))
+            results.append({'index': index, 'result': True})
+        if len(changes) < len(items):
+            return batch_validation_failed(results)
 
-        team.updatedAt = datetime.utcnow().isoformat()
-
-        return jsonify(create_api_response(message="Team updated successfully", data={'team': team.to_dict()}))
+        try:
+            teams = store.update_many(changes)
+        except TeamNotFound as e:
+            return jsonify(create_api_response(result=False, error_code="TEAM_NOT_FOUND", message=f"Team not found: {e}")), 404
+        for item, team in zip(results, teams):
+            item['team'] = team.to_raw_json()
+        return json_response(create_api_response(message="Teams updated successfully", data={'results': results, 'total': len(results)}))
     except Exception as e:
-        return jsonify(create_api_response(result=False, error_code="UPDATE_TEAM_ERROR", message=str(e))), 500
+        return jsonify(create_api_response(result=False, error_code="BATCH_UPDATE_TEAMS_ERROR", message=str(e))), 500
 
-@app.route('/api/teams/<team_id>', methods=['DELETE'])
-def delete_team(team_id):
+@app.route('/api/teams:batch', methods=['DELETE'])
+def delete_teams_batch():
     """
-    刪除團隊
+    批次刪除團隊
     ---
     tags:
       - Teams
-    summary: 刪除指定團隊
-    description: 永久刪除指定的團隊，此操作無法復原
+    summary: 一次刪除多個團隊
+    description: 所有 id 都存在才會刪除（整批生效或整批不生效）
     parameters:
-      - name: team_id
-        in: path
-        type: string
+      - name: body
+        in: body
         required: true
-        description: 要刪除的團隊 ID
-        example: "550e8400-e29b-41d4-a716-446655440000"
+        schema:
+          type: object
+          required:
+            - ids
+          properties:
+            ids:
+              type: array
+              maxItems: 5000
+              items:
+                type: string
+          example:
+            ids: ["550e8400-e29b-41d4-a716-446655440000", "550e8400-e29b-41d4-a716-446655440001"]
     responses:
       200:
-        description: 團隊刪除成功
+        description: 全部團隊刪除成功
         schema:
           type: object
           properties:
@@ -590,15 +2234,29 @@ def delete_team(team_id):
               example: ""
             message:
               type: string
-              example: "Team deleted successfully"
+              example: "Teams deleted successfully"
             data:
               type: object
               properties:
-                deletedTeamId:
-                  type: string
-                  example: "550e8400-e29b-41d4-a716-446655440000"
-      404:
-        description: 找不到指定的團隊
+                results:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      index:
+                        type: integer
+                        example: 0
+                      result:
+                        type: boolean
+                        example: true
+                      deletedTeamId:
+                        type: string
+                        example: "550e8400-e29b-41d4-a716-446655440000"
+                total:
+                  type: integer
+                  example: 2
+      400:
+        description: 請求格式錯誤，或有 id 不存在 / 重複（data.results 只列出失敗的項目，整批不會刪除）
         schema:
           type: object
           properties:
@@ -607,13 +2265,13 @@ def delete_team(team_id):
               example: false
             errorCode:
               type: string
-              example: "TEAM_NOT_FOUND"
+              enum: ["INVALID_REQUEST_FORMAT", "INVALID_BATCH_FORMAT", "BATCH_TOO_LARGE", "BATCH_VALIDATION_FAILED"]
+              example: "BATCH_VALIDATION_FAILED"
             message:
               type: string
-              example: "Team not found"
+              example: "No changes were applied because some items are invalid"
             data:
-              type: "null"
-              example: null
+              type: object
       500:
         description: 伺服器內部錯誤
         schema:
@@ -624,7 +2282,7 @@ def delete_team(team_id):
               example: false
             errorCode:
               type: string
-              example: "DELETE_TEAM_ERROR"
+              example: "BATCH_DELETE_TEAMS_ERROR"
             message:
               type: string
               example: "Internal server error"
@@ -633,13 +2291,33 @@ def delete_team(team_id):
               example: null
     """
     try:
-        if team_id not in teams_db:
-            return jsonify(create_api_response(result=False, error_code="TEAM_NOT_FOUND", message="Team not found")), 404
+        team_ids, error_response = parse_batch('ids')
+        if error_response:
+            return error_response
 
-        del teams_db[team_id]
-        return jsonify(create_api_response(message="Team deleted successfully", data={'deletedTeamId': team_id}))
+        results, seen = [], set()
+        for index, team_id in enumerate(team_ids):
+            if not isinstance(team_id, str) or not team_id:
+                results.append(batch_item_error(index, "INVALID_TEAM_ID", "Each item must be a team id"))
+                continue
+            if team_id in seen:
+                results.append(batch_item_error(index, "DUPLICATE_TEAM_ID", "Team id appears more than once in the batch"))
+                continue
+            seen.add(team_id)
+            if store.get(team_id) is None:
+                results.append(batch_item_error(index, "TEAM_NOT_FOUND", "Team not found"))
+            else:
+                results.append({'index': index, 'result': True, 'deletedTeamId': team_id})
+        if not all(item['result'] for item in results):
+            return batch_validation_failed(results)
+
+        try:
+            store.delete_many(team_ids)
+        except TeamNotFound as e:
+            return jsonify(create_api_response(result=False, error_code="TEAM_NOT_FOUND", message=f"Team not found: {e}")), 404
+        return jsonify(create_api_response(message="Teams deleted successfully", data={'results': results, 'total': len(results)}))
     except Exception as e:
-        return jsonify(create_api_response(result=False, error_code="DELETE_TEAM_ERROR", message=str(e))), 500
+        return jsonify(create_api_response(result=False, error_code="BATCH_DELETE_TEAMS_ERROR", message=str(e))), 500
 
 @app.errorhandler(404)
 def not_found(error):
@@ -0,0 +1,78 @@
+"""
+ASGI 入口：以 a2wsgi 把 Flask 應用包成 ASGI，路由在執行緒池中執行，事件迴圈負責連線與 keep-alive
+
+    SERVER_MODE=asgi python serve.py
+    uvicorn asgi:application --port 8080
+
+GET /api/teams/changes（SSE）直接在事件迴圈上處理，不經過執行緒池：
+閒置的訂閱者只是一個等待中的 coroutine，數千個連線也不會佔滿執行緒。
+"""
+import asyncio
+import os
+from urllib.parse import parse_qs
+
+from a2wsgi import WSGIMiddleware
+
+from app import SSE_HEARTBEAT, app, change_feed, create_api_response
+from feed import KEEP_ALIVE, parse_last_event_id, reset_event
+from serialization import encode
+
+CHANGES_PATH = '/api/teams/changes'
+
+wsgi_application = WSGIMiddleware(app, workers=int(os.environ.get('THREADS', 8)))
+
+
+def last_event_id(scope):
+    for name, value in scope['headers']:
+        if name == b'last-event-id':
+            return value.decode('latin-1')
+    values = parse_qs(scope['query_string'].decode('latin-1')).get('lastEventId')
+    return values[0] if values else None
+
+
+async def team_changes(scope, receive, send):
+    try:
+        after = parse_last_event_id(last_event_id(scope))
+    except ValueError:
+        body = encode(create_api_response(result=False, error_code="INVALID_LAST_EVENT_ID",
+                                          message="Last-Event-ID must be a non-negative integer"))
+        await send({'type': 'http.response.start', 'status': 400,
+                    'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode()),
+                                (b'access-control-allow-origin', b'*')]})
+        await send({'type': 'http.response.body', 'body': body})
+        return
+
+    await send({'type': 'http.response.start', 'status': 200,
+                'headers': [(b'content-type', b'text/event-stream; charset=utf-8'), (b'cache-control', b'no-cache'),
+                            (b'x-accel-buffering', b'no'), (b'access-control-allow-origin', b'*')]})
+    disconnected = asyncio.ensure_future(wait_disconnect(receive))
+    try:
+        after = change_feed.last_id if after is None else after
+        frames, last_id, reset = change_feed.read(after)
+        while not disconnected.done():
+            if reset:
+                body = reset_event(last_id)
+            elif frames:
+                body = b''.join(frames)
+            else:
+                body = KEEP_ALIVE
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+            after = last_id
+            frames, last_id, reset = await change_feed.wait_async(after, SSE_HEARTBEAT)
+    except OSError:
+        # 客戶端已斷線
+        pass
+    finally:
+        disconnected.cancel()
+
+
+async def wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == CHANGES_PATH and scope['method'] == 'GET':
+        await team_changes(scope, receive, send)
+    else:
+        await wsgi_application(scope, receive, send)
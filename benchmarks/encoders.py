@@ -0,0 +1,77 @@
+"""
+大型 GET /api/teams 回應的編碼時間：標準函式庫 JSON、orjson 與 MessagePack 的比較
+
+    python -m benchmarks.encoders --teams 1000 --repeat 50
+    python -m benchmarks.encoders --teams 10000
+
+payload 與 get_teams() 的回應結構相同（統一回應格式 + teams / total / nextCursor）。
+to_dict 列為每次從 dict 編碼（jsonify 的路徑），fragments 列為沿用團隊快取 JSON 片段的路徑（json_response）。
+未安裝 orjson 或 msgpack 時略過對應的項目。
+"""
+import argparse
+import statistics
+import time
+
+from flask.json.provider import DefaultJSONProvider
+
+from app import app, create_api_response
+from benchmarks.serialization import build_store
+from serialization import JSONProvider, MSGPACK_MIMETYPE, json_response, msgpack, orjson
+
+
+def payload(teams, raw):
+    data = {
+        'teams': [team.to_raw_json() if raw else team.to_dict() for team in teams],
+        'total': len(teams),
+        'nextCursor': None,
+    }
+    return create_api_response(message="Teams retrieved successfully", data=data)
+
+
+def measure(encode, repeat):
+    """回傳 (中位數秒數, 編碼後 bytes)"""
+    body = encode()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        encode()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--teams', type=int, default=1000, help='回應中的團隊數')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    teams = [team for batch in build_store(args.teams).iter_batches() for team in batch]
+    as_dicts = payload(teams, raw=False)
+    as_fragments = payload(teams, raw=True)
+    for team in teams:
+        team.to_json()
+
+    stdlib, fast = DefaultJSONProvider(app), JSONProvider(app)
+    cases = [('stdlib jsonify (to_dict)', 'application/json', lambda: stdlib.response(as_dicts).get_data())]
+    if orjson is not None:
+        cases.append(('orjson jsonify (to_dict)', 'application/json', lambda: fast.response(as_dicts).get_data()))
+    cases.append(('json_response (fragments)', 'application/json', lambda: json_response(as_fragments).get_data()))
+    if msgpack is not None:
+        cases += [
+            ('msgpack (to_dict)', MSGPACK_MIMETYPE, lambda: fast.response(as_dicts).get_data()),
+            ('msgpack (fragments)', MSGPACK_MIMETYPE, lambda: json_response(as_fragments).get_data()),
+        ]
+
+    print(f"{args.teams} teams, median of {args.repeat}, orjson {'on' if orjson else 'off'}, "
+          f"msgpack {'on' if msgpack else 'off'}")
+    print(f"{'encoder':<28} {'ms':>9} {'KiB':>9} {'vs stdlib':>10}")
+    baseline = None
+    for label, accept, encode in cases:
+        with app.test_request_context(headers={'Accept': accept}):
+            seconds, size = measure(encode, args.repeat)
+        baseline = baseline or seconds
+        print(f"{label:<28} {seconds * 1000:9.3f} {size / 1024:9.1f} {baseline / seconds:9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
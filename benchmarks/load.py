@@ -0,0 +1,163 @@
+"""
+各種服務模式的負載測試：分別啟動伺服器、填入團隊後以多個連線持續發送請求，比較每秒請求數與延遲百分位
+
+    python -m benchmarks.load --modes dev,wsgi,asgi --seconds 10 --connections 32
+    python -m benchmarks.load --modes wsgi --threads 16 --json results.json
+
+模式：dev 為 python app.py（Flask 開發伺服器）、wsgi 為 serve.py（gunicorn gthread）、
+asgi 為 SERVER_MODE=asgi 的 serve.py（uvicorn worker）。缺少依賴套件的模式會略過。
+負載由數個客戶端行程產生（每個連線一個執行緒、使用 keep-alive）；要量測絕對上限時，
+客戶端與伺服器最好放在不同機器上。
+"""
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+from seeders import seed
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = {
+    'dev': ([sys.executable, 'app.py'], {}, ()),
+    'wsgi': ([sys.executable, 'serve.py'], {'SERVER_MODE': 'wsgi'}, ('gunicorn',)),
+    'asgi': ([sys.executable, 'serve.py'], {'SERVER_MODE': 'asgi'}, ('gunicorn', 'uvicorn', 'a2wsgi')),
+}
+
+# 請求組合：(權重, 路徑產生函式)
+MIX = (
+    (50, lambda rng, ids: f'/api/teams/{rng.choice(ids)}'),
+    (30, lambda rng, ids: '/api/teams?limit=20'),
+    (20, lambda rng, ids: '/health'),
+)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, port, threads):
+    command, extra_env, _ = MODES[mode]
+    env = {**os.environ, **extra_env, 'PORT': str(port), 'THREADS': str(threads), 'STORAGE_BACKEND': 'memory'}
+    env.pop('DATA_DIR', None)
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f'http://127.0.0.1:{port}/health', timeout=1).ok:
+                return process
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+def run_connection(base_url, ids, deadline, seed_value, latencies, errors):
+    rng = random.Random(seed_value)
+    weights, paths = zip(*MIX)
+    session = requests.Session()
+    while time.monotonic() < deadline:
+        path = rng.choices(paths, weights)[0](rng, ids)
+        start = time.perf_counter()
+        try:
+            ok = session.get(base_url + path).status_code < 500
+        except requests.RequestException:
+            ok = False
+        latencies.append(time.perf_counter() - start)
+        if not ok:
+            errors.append(path)
+
+
+def client_process(args):
+    """在一個客戶端行程中以多個執行緒各開一條 keep-alive 連線"""
+    base_url, ids, connections, seconds, seed_value = args
+    deadline = time.monotonic() + seconds
+    latencies, errors = [], []
+    threads = [threading.Thread(target=run_connection, args=(base_url, ids, deadline, seed_value + i, latencies, errors))
+               for i in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, len(errors)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def measure(mode, args):
+    port = free_port()
+    process = start_server(mode, port, args.threads)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        ids = seed(base_url, args.teams)
+        per_client = max(args.connections // args.client_processes, 1)
+        jobs = [(base_url, ids, per_client, args.seconds, i * 1000) for i in range(args.client_processes)]
+        # 先熱身再正式量測
+        with multiprocessing.Pool(args.client_processes) as pool:
+            pool.map(client_process, [(*job[:3], 1, job[4]) for job in jobs])
+            started = time.perf_counter()
+            results = pool.map(client_process, jobs)
+            elapsed = time.perf_counter() - started
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=30)
+
+    latencies = sorted(latency for values, _ in results for latency in values)
+    return {
+        'mode': mode,
+        'requests': len(latencies),
+        'errors': sum(error_count for _, error_count in results),
+        'rps': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': (latencies[-1] if latencies else 0) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', default='dev,wsgi,asgi')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--connections', type=int, default=32)
+    parser.add_argument('--client-processes', type=int, default=max(multiprocessing.cpu_count() // 2, 1))
+    parser.add_argument('--threads', type=int, default=8, help='每個 worker 的執行緒數')
+    parser.add_argument('--teams', type=int, default=10_000)
+    parser.add_argument('--json', help='另外把結果寫成 JSON 檔')
+    args = parser.parse_args()
+
+    results = []
+    for mode in args.modes.split(','):
+        missing = [module for module in MODES[mode][2] if importlib.util.find_spec(module) is None]
+        if missing:
+            print(f"⚠️  略過 {mode}：缺少 {', '.join(missing)}")
+            continue
+        results.append(measure(mode, args))
+
+    print(f"{args.connections} connections, {args.seconds:.0f} s, {args.teams} teams")
+    print(f"{'mode':<6} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for result in results:
+        print(f"{result['mode']:<6} {result['requests']:9d} {result['errors']:7d} {result['rps']:9.0f} "
+              f"{result['p50_ms']:8.2f} {result['p99_ms']:8.2f} {result['max_ms']:8.2f}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
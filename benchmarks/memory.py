@@ -0,0 +1,110 @@
+"""
+每個團隊的記憶體用量：舊版 Team（__dict__、字串 uuid 與 ISO 時間、list 成員）、
+成員名稱 intern 之前的精簡版（tuple 成員）與目前的 Team（名稱編號陣列）的比較
+
+    python -m benchmarks.memory --teams 200000
+
+成員名稱與 seeders 相同（姓 × 名的組合），量測時才從每個團隊的 JSON 文字解析，
+每個名稱都是各自獨立的字串物件，與從請求解析出來時相同；目前的 Team 的數字包含共用名稱表本身的成本。
+"""
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+
+from benchmarks.serialization import FIRST_NAMES, LAST_NAMES
+from interning import member_names
+from models import Team
+from storage import MemoryTeamStore
+
+
+class LegacyTeam:
+    """精簡化之前的 Team 表示方式，僅供比較"""
+
+    def __init__(self, name, members):
+        self.id = str(uuid.uuid4())
+        self.name = name
+        self.members = members
+        self.createdAt = datetime.utcnow().isoformat()
+        self.updatedAt = datetime.utcnow().isoformat()
+
+
+class TupleTeam:
+    """成員名稱 intern 之前的精簡 Team：每個團隊的 tuple 各自持有解析出來的名稱字串，僅供比較"""
+
+    __slots__ = ('uid', 'name', '_members', 'created', 'updated', 'version', '_json')
+
+    def __init__(self, name, members):
+        self.uid = uuid.uuid4().bytes
+        self.name = name
+        self._members = tuple(members)
+        self.created = self.updated = time.time_ns() // 1000
+        self.version = 1
+        self._json = None
+
+
+def sample_data(count, seed=42):
+    rng = random.Random(seed)
+    # 名稱字串在量測前就建立好；成員以請求中的 JSON 文字保存，量測時才解析，與實際建立團隊時相同
+    members = [json.dumps([rng.choice(FIRST_NAMES) + rng.choice(LAST_NAMES) for _ in range(rng.randint(2, 12))],
+                          ensure_ascii=False) for _ in range(count)]
+    names = [f"團隊 {i:06d}" for i in range(count)]
+    return names, members
+
+
+def bytes_per_team(build, count):
+    names, members = sample_data(count)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build(names, members)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return (after - before) / count
+
+
+def build_legacy(names, members):
+    return [LegacyTeam(name, json.loads(team_members)) for name, team_members in zip(names, members)]
+
+
+def build_tuples(names, members):
+    return [TupleTeam(name, json.loads(team_members)) for name, team_members in zip(names, members)]
+
+
+def build_compact(names, members):
+    return [Team(name, json.loads(team_members)) for name, team_members in zip(names, members)]
+
+
+def build_store(names, members):
+    store = MemoryTeamStore()
+    for name, team_members in zip(names, members):
+        store.add(Team(name, json.loads(team_members)))
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--teams', type=int, default=200_000)
+    args = parser.parse_args()
+
+    print(f"{args.teams} teams")
+    print(f"{'legacy Team objects':<28} {bytes_per_team(build_legacy, args.teams):8.1f} bytes/team")
+    print(f"{'compact Team, member tuples':<28} {bytes_per_team(build_tuples, args.teams):8.1f} bytes/team")
+    print(f"{'compact Team, interned ids':<28} {bytes_per_team(build_compact, args.teams):8.1f} bytes/team")
+    print(f"{'MemoryTeamStore (+indexes)':<28} {bytes_per_team(build_store, args.teams):8.1f} bytes/team")
+
+    names, members = sample_data(args.teams)
+    kept = build_compact(names, members)
+    report = member_names.report()
+    print(f"member names: {report['references']} references to {report['names']} distinct names, "
+          f"name table {report['tableBytes'] / 1024:.1f} KiB")
+    del kept
+
+
+if __name__ == '__main__':
+    main()
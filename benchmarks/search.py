@@ -0,0 +1,86 @@
+"""
+團隊搜尋（GET /api/teams/search）的查詢延遲與 n-gram 索引的記憶體用量
+
+    python -m benchmarks.search --teams 1000000
+    python -m benchmarks.search --teams 100000 --repeat 200
+
+團隊名稱由城市、領域、職能與單位隨機組合再加上編號（例如「台北前端開發團隊 0042」），成員與 seeders 相同。
+index 欄位為以 tracemalloc 量測名稱 n-gram 索引的大小，build 為建立整個記憶體儲存（含所有索引）的秒數；
+各查詢列出 p50 / p99 延遲（毫秒）、結果數與是否只檢查了部分候選（truncated）。
+"""
+import argparse
+import gc
+import random
+import statistics
+import time
+import tracemalloc
+
+from indexes import NGramIndex, normalize_name
+from models import Team
+from seeders import FIRST_NAMES, LAST_NAMES
+from storage import MemoryTeamStore
+
+CITIES = ['台北', '新竹', '台中', '台南', '高雄', '東京', '新加坡', '']
+DOMAINS = ['前端', '後端', '行動', '數據', '雲端', '資安', '平台', '遊戲', 'AI ', 'DevOps ']
+ROLES = ['開發', '設計', '測試', '維運', '研究', '產品', '架構']
+UNITS = ['團隊', '小組', '部門', '中心']
+
+QUERIES = ['開發', '前端開發', '台北前端開發團隊', '前段開發', '台址前端開發團隊', 'devops', '張三', '小明', '資安研究小組 0042']
+
+
+def sample_teams(count, seed=42):
+    rng = random.Random(seed)
+    return [
+        Team(f"{rng.choice(CITIES)}{rng.choice(DOMAINS)}{rng.choice(ROLES)}{rng.choice(UNITS)} {i % 10000:04d}",
+             [rng.choice(FIRST_NAMES) + rng.choice(LAST_NAMES) for _ in range(rng.randint(2, 12))])
+        for i in range(count)
+    ]
+
+
+def index_bytes(teams):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    index = NGramIndex(lambda team: (normalize_name(team.name),))
+    index.add_many(teams)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, len(index)
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--teams', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    teams = sample_teams(args.teams)
+    size, distinct = index_bytes(teams)
+
+    started = time.perf_counter()
+    store = MemoryTeamStore()
+    store.add_many(teams)
+    build = time.perf_counter() - started
+
+    print(f"{args.teams} teams, {distinct} distinct names, index {size / 1024 / 1024:.1f} MiB "
+          f"({size / args.teams:.1f} bytes/team), build {build:.1f} s, median of {args.repeat}")
+    print(f"{'query':<20} {'p50 ms':>8} {'p99 ms':>8} {'hits':>5} {'truncated':>10}  top match")
+    for query in QUERIES:
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            hits, truncated = store.search(query, args.limit)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        top = f"{hits[0].matched} ({hits[0].score:.2f})" if hits else '-'
+        print(f"{query:<20} {statistics.median(timings) * 1000:8.2f} {percentile(timings, 0.99) * 1000:8.2f} "
+              f"{len(hits):5d} {'yes' if truncated else 'no':>10}  {top}")
+
+
+if __name__ == '__main__':
+    main()
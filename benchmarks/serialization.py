@@ -0,0 +1,69 @@
+"""
+列表回應編碼吞吐量：每次 to_dict() + jsonify 與快取 JSON 片段的比較
+
+    python -m benchmarks.serialization --teams 100000 --page-size 1000
+"""
+import argparse
+import random
+import time
+
+from flask import jsonify
+
+from app import app, create_api_response
+from models import Team
+from seeders import FIRST_NAMES, LAST_NAMES
+from serialization import json_response
+from storage import MemoryTeamStore
+
+
+def build_store(count, seed=42):
+    rng = random.Random(seed)
+    store = MemoryTeamStore()
+    for i in range(count):
+        members = [rng.choice(FIRST_NAMES) + rng.choice(LAST_NAMES) for _ in range(rng.randint(2, 12))]
+        store.add(Team(f"團隊 {i:06d}", members))
+    return store
+
+
+def encode_with_jsonify(teams, total):
+    data = {'teams': [team.to_dict() for team in teams], 'total': total}
+    return jsonify(create_api_response(message="Teams retrieved successfully", data=data)).get_data()
+
+
+def encode_with_cache(teams, total):
+    data = {'teams': [team.to_raw_json() for team in teams], 'total': total}
+    return json_response(create_api_response(message="Teams retrieved successfully", data=data)).get_data()
+
+
+def measure(store, page_size, encoder):
+    total = store.count()
+    encoded_bytes = 0
+    start = time.perf_counter()
+    for teams in store.iter_batches(page_size):
+        encoded_bytes += len(encoder(teams, total))
+    elapsed = time.perf_counter() - start
+    return encoded_bytes, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--teams', type=int, default=100_000)
+    parser.add_argument('--page-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    store = build_store(args.teams)
+    with app.app_context():
+        results = [
+            ('to_dict + jsonify', measure(store, args.page_size, encode_with_jsonify)),
+            ('cached, first pass', measure(store, args.page_size, encode_with_cache)),
+            ('cached, warm', measure(store, args.page_size, encode_with_cache)),
+        ]
+
+    print(f"{args.teams} teams, page size {args.page_size}")
+    for label, (encoded_bytes, elapsed) in results:
+        print(f"{label:<20} {encoded_bytes / 1e6:8.1f} MB  {elapsed:6.2f} s  "
+              f"{encoded_bytes / elapsed / 1e6:8.1f} MB/s  {args.teams / elapsed:10.0f} teams/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""
+分片模式的本機驗證：啟動數個分片行程與 router，經由 router 建立團隊、分頁列出，再於寫入持續進行時新增一個分片
+
+    python -m benchmarks.sharding --shards 3 --teams 20000
+    python -m benchmarks.sharding --shards 4 --teams 100000 --connections 32
+
+依序列出：各分片的團隊數、經由 router 建立與分頁列出的耗時、新增分片時搬移的團隊數
+（預期約 1/(N+1)）、搬移耗時與期間因 SHARD_REBALANCING 被拒絕的寫入數，
+最後確認每個團隊都只出現一次、依 id 讀取都能找到。
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+from benchmarks.load import ROOT, free_port
+from router import spawn_shard
+from seeders import FIRST_NAMES, LAST_NAMES
+
+
+def start_router(port, shards):
+    env = {**os.environ, 'SERVER_MODE': 'router', 'PORT': str(port),
+           'SHARDS': ','.join(f'{name}={url}' for name, url in shards)}
+    process = subprocess.Popen([sys.executable, 'serve.py'], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f'http://127.0.0.1:{port}/health', timeout=1).ok:
+                return process
+        except requests.ConnectionError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("router did not start")
+
+
+def shard_counts(base_url):
+    shards = requests.get(f'{base_url}/admin/shards').json()['data']['shards']
+    return {shard['name']: shard['teams'] for shard in shards}
+
+
+def create_teams(base_url, count, connections):
+    local = threading.local()
+
+    def create(i):
+        session = getattr(local, 'session', None) or setattr(local, 'session', requests.Session()) or local.session
+        rng = random.Random(i)
+        body = {'name': f'分片團隊 {i:06d}',
+                'members': [rng.choice(FIRST_NAMES) + rng.choice(LAST_NAMES) for _ in range(rng.randint(2, 8))]}
+        response = session.post(f'{base_url}/api/teams', json=body)
+        response.raise_for_status()
+        return response.json()['data']['team']['id']
+
+    with ThreadPoolExecutor(connections) as pool:
+        return list(pool.map(create, range(count)))
+
+
+def list_ids(base_url, page_size=1000):
+    """以游標分頁列出所有團隊 id，同時確認順序遞增"""
+    ids, cursor, previous = [], None, None
+    session = requests.Session()
+    while True:
+        params = {'limit': page_size, 'fields': 'id,createdAt'}
+        if cursor:
+            params['cursor'] = cursor
+        data = session.get(f'{base_url}/api/teams', params=params).json()['data']
+        for team in data['teams']:
+            key = (team['createdAt'], team['id'])
+            assert previous is None or key > previous, f"out of order: {previous} >= {key}"
+            previous = key
+            ids.append(team['id'])
+        cursor = data['nextCursor']
+        if not cursor:
+            return ids
+
+
+def keep_writing(base_url, ids, stop, outcomes):
+    """搬移期間持續更新隨機的團隊，統計成功與因搬移被拒絕的次數"""
+    session = requests.Session()
+    rng = random.Random()
+    while not stop.is_set():
+        team_id = rng.choice(ids)
+        member = f'搬移測試 {rng.getrandbits(64):x}'
+        response = session.patch(f'{base_url}/api/teams/{team_id}/members', json={'add': [member]})
+        if response.status_code == 200:
+            outcomes['ok'] += 1
+        elif response.json().get('errorCode') == 'SHARD_REBALANCING':
+            outcomes['rebalancing'] += 1
+        else:
+            outcomes['other'] += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shards', type=int, default=3)
+    parser.add_argument('--teams', type=int, default=20000)
+    parser.add_argument('--connections', type=int, default=16)
+    args = parser.parse_args()
+
+    processes = []
+    try:
+        shards = []
+        for i in range(args.shards + 1):
+            process, url = spawn_shard(free_port())
+            processes.append(process)
+            shards.append((f'shard-{i + 1}', url))
+        new_name, new_url = shards.pop()
+        port = free_port()
+        processes.append(start_router(port, shards))
+        base_url = f'http://127.0.0.1:{port}'
+
+        started = time.perf_counter()
+        created = create_teams(base_url, args.teams, args.connections)
+        elapsed = time.perf_counter() - started
+        print(f"created {len(created)} teams through the router in {elapsed:.1f} s ({len(created) / elapsed:.0f}/s)")
+        print(f"distribution: {shard_counts(base_url)}")
+
+        started = time.perf_counter()
+        listed = list_ids(base_url)
+        print(f"listed {len(listed)} teams in {time.perf_counter() - started:.1f} s")
+        assert sorted(listed) == sorted(created), "listing does not match the created teams"
+
+        stop, outcomes = threading.Event(), {'ok': 0, 'rebalancing': 0, 'other': 0}
+        writers = [threading.Thread(target=keep_writing, args=(base_url, created, stop, outcomes)) for _ in range(4)]
+        for writer in writers:
+            writer.start()
+        response = requests.post(f'{base_url}/admin/shards', json={'name': new_name, 'url': new_url})
+        stop.set()
+        for writer in writers:
+            writer.join()
+        summary = response.json()['data']
+        moved = sum(summary['moved'].values())
+        print(f"added {new_name}: moved {moved} teams ({moved / len(created):.1%}, "
+              f"expected ~{1 / (args.shards + 1):.1%}) in {summary['seconds']} s, per source {summary['moved']}")
+        print(f"writes during rebalancing: {outcomes}")
+        print(f"distribution: {shard_counts(base_url)}")
+
+        listed = list_ids(base_url)
+        assert len(listed) == len(set(listed)) == len(created), f"{len(listed)} listed, {len(set(listed))} distinct"
+        assert set(listed) == set(created), "teams lost during rebalancing"
+        session = requests.Session()
+        missing = [team_id for team_id in random.Random(1).sample(created, min(1000, len(created)))
+                   if session.get(f'{base_url}/api/teams/{team_id}').status_code != 200]
+        assert not missing, f"{len(missing)} teams not found by id"
+        print("all teams listed exactly once and readable by id")
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=30)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+冷啟動基準測試：各種 SWAGGER_MODE 下從 import 到第一個請求完成的時間，以及 worker 的常駐記憶體（RSS）
+
+    python -m benchmarks.startup --repeat 5
+    python -m benchmarks.startup --live --workers 1
+
+每次量測都在新的行程中進行。import 欄位為 import app 到 test client 完成第一個 /health 的秒數，
+rss 為此時的 RSS、flasgger 為此時是否已載入 flasgger；docs 欄位為接著第一次請求 /apispec_1.json 的秒數，rss+docs 為之後的 RSS。
+--live 另外以 serve.py（gunicorn）啟動服務，量測從啟動行程到 /health 可回應的秒數與每個 worker 的 RSS。
+precompiled 為 lazy 搭配 python docs.py 預先產生的規格檔（SWAGGER_SPEC）。
+"""
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+from benchmarks.load import ROOT, free_port
+
+PROBE = '''
+import json, sys, time
+def rss():
+    with open('/proc/self/status') as file:
+        return next(int(line.split()[1]) for line in file if line.startswith('VmRSS:'))
+started = time.perf_counter()
+from app import app
+client = app.test_client()
+client.get('/health')
+first = time.perf_counter() - started
+after_first = rss()
+loaded = 'flasgger' in sys.modules
+started = time.perf_counter()
+assert client.get('/apispec_1.json').status_code in (200, 404)
+docs = time.perf_counter() - started
+print(json.dumps({'import': first, 'rss': after_first, 'docs': docs, 'rss_docs': rss(), 'flasgger': loaded}))
+'''
+
+
+def mode_env(mode, spec_path):
+    if mode == 'precompiled':
+        return {'SWAGGER_MODE': 'lazy', 'SWAGGER_SPEC': spec_path}
+    return {'SWAGGER_MODE': mode}
+
+
+def base_env():
+    env = {**os.environ, 'STORAGE_BACKEND': 'memory', 'PYTHONDONTWRITEBYTECODE': '1'}
+    for name in ('DATA_DIR', 'SWAGGER_SPEC'):
+        env.pop(name, None)
+    return env
+
+
+def probe(env):
+    result = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def worker_rss(pid):
+    """gunicorn master 的子行程（worker）各自的 RSS（KiB）"""
+    children = subprocess.run(['pgrep', '-P', str(pid)], capture_output=True, text=True).stdout.split()
+    sizes = []
+    for child in children:
+        with open(f'/proc/{child}/status') as file:
+            sizes.append(next(int(line.split()[1]) for line in file if line.startswith('VmRSS:')))
+    return sizes
+
+
+def live(env, workers):
+    port = free_port()
+    env = {**env, 'PORT': str(port), 'WEB_CONCURRENCY': str(workers)}
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, 'serve.py'], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                if requests.get(f'http://127.0.0.1:{port}/health', timeout=1).ok:
+                    break
+            except requests.ConnectionError:
+                if time.perf_counter() - started > 30:
+                    raise RuntimeError("server did not start")
+                time.sleep(0.01)
+        ready = time.perf_counter() - started
+        return ready, worker_rss(process.pid)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', default='eager,lazy,precompiled,off')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--live', action='store_true', help='另外量測 gunicorn 啟動時間與 worker RSS')
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        spec_path = os.path.join(tmp, 'apispec.json')
+        subprocess.run([sys.executable, 'docs.py', '--output', spec_path], cwd=ROOT, env=base_env(),
+                       check=True, stdout=subprocess.DEVNULL)
+
+        print(f"median of {args.repeat}")
+        print(f"{'mode':<12} {'import s':>9} {'rss MiB':>8} {'docs s':>8} {'rss+docs':>9} {'flasgger':>9}"
+              + (f" {'ready s':>8} {'worker MiB':>11}" if args.live else ''))
+        for mode in args.modes.split(','):
+            env = {**base_env(), **mode_env(mode, spec_path)}
+            runs = [probe(env) for _ in range(args.repeat)]
+            line = (f"{mode:<12} {statistics.median(run['import'] for run in runs):9.3f} "
+                    f"{statistics.median(run['rss'] for run in runs) / 1024:8.1f} "
+                    f"{statistics.median(run['docs'] for run in runs):8.3f} "
+                    f"{statistics.median(run['rss_docs'] for run in runs) / 1024:9.1f} "
+                    f"{'loaded' if runs[0]['flasgger'] else '-':>9}")
+            if args.live:
+                results = [live(env, args.workers) for _ in range(args.repeat)]
+                line += (f" {statistics.median(ready for ready, _ in results):8.3f} "
+                         f"{statistics.median(size for _, sizes in results for size in sizes) / 1024:11.1f}")
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
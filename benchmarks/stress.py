@@ -0,0 +1,261 @@
+"""
+並行壓力測試：多個執行緒透過 Flask test client 同時建立、更新、刪除與列出團隊，結束後檢查一致性
+
+    python -m benchmarks.stress --threads 16 --seconds 10
+    STORAGE_BACKEND=sqlite SQLITE_PATH=/tmp/stress.db python -m benchmarks.stress
+
+檢查項目：沒有任何 5xx、每一頁的排序與不重複、成功建立數 - 成功刪除數 = 最終團隊數、
+每個團隊的版本 = 1 + 成功更新次數、分頁走訪全部團隊不重複不遺漏，記憶體儲存另外比對所有索引。
+"""
+import argparse
+from collections import Counter
+import random
+import sys
+import threading
+import time
+
+from app import app, store
+from benchmarks.serialization import FIRST_NAMES, LAST_NAMES
+from indexes import normalize_name, size_bucket
+from storage import MemoryTeamStore
+
+
+class Pool:
+    """目前應該存在的團隊 id，供各執行緒隨機挑選"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = []
+
+    def add(self, *team_ids):
+        with self._lock:
+            self._ids.extend(team_ids)
+
+    def pick(self, rng, count=1):
+        with self._lock:
+            if len(self._ids) < count:
+                return []
+            return rng.sample(self._ids, count)
+
+    def discard(self, *team_ids):
+        with self._lock:
+            for team_id in team_ids:
+                try:
+                    self._ids.remove(team_id)
+                except ValueError:
+                    pass
+
+
+class Worker(threading.Thread):
+    OPERATIONS = (
+        ('create', 25), ('batch_create', 5), ('update', 15), ('conditional_update', 10), ('patch_members', 10),
+        ('delete', 8), ('batch_delete', 2), ('get', 10), ('list', 15),
+    )
+
+    def __init__(self, seed, pool, deadline):
+        super().__init__(daemon=True)
+        self.rng = random.Random(seed)
+        self.pool = pool
+        self.deadline = deadline
+        self.client = app.test_client()
+        self.ops = Counter()
+        self.created = 0
+        self.deleted = 0
+        self.updates = Counter()
+        self.failures = []
+
+    def members(self):
+        rng = self.rng
+        return [rng.choice(FIRST_NAMES) + rng.choice(LAST_NAMES) for _ in range(rng.randint(1, 6))]
+
+    def fail(self, operation, response):
+        self.failures.append(f"{operation}: {response.status_code} {response.get_data(as_text=True)[:200]}")
+
+    def run(self):
+        names, weights = zip(*self.OPERATIONS)
+        while time.monotonic() < self.deadline:
+            operation = self.rng.choices(names, weights)[0]
+            getattr(self, operation)()
+            self.ops[operation] += 1
+
+    def create(self):
+        response = self.client.post('/api/teams', json={'name': f"壓測 {self.rng.random():.8f}", 'members': self.members()})
+        if response.status_code != 201:
+            return self.fail('create', response)
+        self.created += 1
+        self.pool.add(response.get_json()['data']['team']['id'])
+
+    def batch_create(self):
+        teams = [{'name': f"批次 {self.rng.random():.8f}", 'members': self.members()} for _ in range(self.rng.randint(2, 20))]
+        response = self.client.post('/api/teams:batch', json={'teams': teams})
+        if response.status_code != 201:
+            return self.fail('batch_create', response)
+        results = response.get_json()['data']['results']
+        self.created += len(results)
+        self.pool.add(*(item['team']['id'] for item in results))
+
+    def update(self):
+        for team_id in self.pool.pick(self.rng):
+            response = self.client.put(f'/api/teams/{team_id}', json={'members': self.members()})
+            if response.status_code == 200:
+                self.updates[team_id] += 1
+            elif response.status_code != 404:
+                self.fail('update', response)
+
+    def conditional_update(self):
+        for team_id in self.pool.pick(self.rng):
+            response = self.client.get(f'/api/teams/{team_id}')
+            if response.status_code == 404:
+                return
+            if response.status_code != 200:
+                return self.fail('conditional_update', response)
+            response = self.client.put(f'/api/teams/{team_id}', json={'name': f"條件 {self.rng.random():.8f}"},
+                                       headers={'If-Match': response.headers['ETag']})
+            if response.status_code == 200:
+                self.updates[team_id] += 1
+            elif response.status_code not in (404, 412):
+                self.fail('conditional_update', response)
+
+    def patch_members(self):
+        for team_id in self.pool.pick(self.rng):
+            member = self.rng.choice(FIRST_NAMES) + self.rng.choice(LAST_NAMES)
+            response = self.client.patch(f'/api/teams/{team_id}/members', json={'add': [member]})
+            if response.status_code == 200:
+                self.updates[team_id] += 1
+            elif response.get_json()['errorCode'] not in ('TEAM_NOT_FOUND', 'MEMBER_ALREADY_EXISTS'):
+                self.fail('patch_members', response)
+
+    def delete(self):
+        for team_id in self.pool.pick(self.rng):
+            response = self.client.delete(f'/api/teams/{team_id}')
+            if response.status_code == 200:
+                self.deleted += 1
+                self.pool.discard(team_id)
+            elif response.status_code != 404:
+                self.fail('delete', response)
+
+    def batch_delete(self):
+        team_ids = self.pool.pick(self.rng, self.rng.randint(2, 5))
+        if not team_ids:
+            return
+        response = self.client.delete('/api/teams:batch', json={'ids': team_ids})
+        if response.status_code == 200:
+            self.deleted += len(team_ids)
+            self.pool.discard(*team_ids)
+        elif response.get_json()['errorCode'] not in ('BATCH_VALIDATION_FAILED', 'TEAM_NOT_FOUND'):
+            # 其中有團隊剛被其他執行緒刪除時整批不生效，屬於預期的競爭結果
+            self.fail('batch_delete', response)
+
+    def get(self):
+        for team_id in self.pool.pick(self.rng):
+            response = self.client.get(f'/api/teams/{team_id}')
+            if response.status_code not in (200, 404):
+                self.fail('get', response)
+
+    def list(self):
+        sort = self.rng.choice(('createdAt', 'updatedAt', 'name'))
+        order = self.rng.choice(('asc', 'desc'))
+        response = self.client.get(f'/api/teams?sort={sort}&order={order}&limit=50')
+        if response.status_code != 200:
+            return self.fail('list', response)
+        data = response.get_json()['data']
+        keys = [(team[sort], team['id']) for team in data['teams']]
+        if keys != sorted(keys, reverse=order == 'desc') or len(set(keys)) != len(keys):
+            self.failures.append(f"list: page out of order for sort={sort} order={order}")
+        if data['total'] < len(keys):
+            self.failures.append(f"list: total {data['total']} smaller than page size {len(keys)}")
+
+
+def walk_all(client):
+    """以游標走訪全部團隊"""
+    teams, cursor = [], None
+    while True:
+        url = '/api/teams?limit=1000' + (f'&cursor={cursor}' if cursor else '')
+        data = client.get(url).get_json()['data']
+        teams.extend(data['teams'])
+        cursor = data['nextCursor']
+        if not cursor:
+            return teams, data['total']
+
+
+def check_memory_indexes(memory_store):
+    """比對記憶體儲存的每個索引與由團隊重建的結果"""
+    problems = []
+    teams = list(memory_store._teams.values())
+    for field, index in memory_store._sort_indexes.items():
+        if list(index.scan()) != sorted(index.key(team) for team in teams):
+            problems.append(f"sort index {field} does not match the stored teams")
+    expected_names, expected_members = {}, {}
+    for team in teams:
+        expected_names.setdefault(normalize_name(team.name), set()).add(team.uid)
+        for member in team.members:
+            expected_members.setdefault(member, set()).add(team.uid)
+    if memory_store._name_index._postings != expected_names:
+        problems.append("name index does not match the stored teams")
+    if memory_store._member_index._postings != expected_members:
+        problems.append("member index does not match the stored teams")
+    stats = memory_store.stats()
+    sizes = [len(set(team.member_ids)) for team in teams]
+    if (stats.teams, stats.members, stats.distinct_members) != (len(teams), sum(sizes), len(expected_members)):
+        problems.append("team statistics do not match the stored teams")
+    if [count for _, _, count in stats.team_sizes] != [sum(size_bucket(size) == bucket for size in sizes)
+                                                        for bucket in range(len(stats.team_sizes))]:
+        problems.append("team size histogram does not match the stored teams")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    store.clear()
+    pool = Pool()
+    deadline = time.monotonic() + args.seconds
+    workers = [Worker(args.seed + i, pool, deadline) for i in range(args.threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    ops, updates, failures = Counter(), Counter(), []
+    created = deleted = 0
+    for worker in workers:
+        ops.update(worker.ops)
+        updates.update(worker.updates)
+        failures.extend(worker.failures)
+        created += worker.created
+        deleted += worker.deleted
+
+    client = app.test_client()
+    teams, total = walk_all(client)
+    expected = created - deleted
+    if store.count() != expected or total != expected or len(teams) != expected:
+        failures.append(f"count mismatch: expected {expected}, store {store.count()}, total {total}, walked {len(teams)}")
+    if len({team['id'] for team in teams}) != len(teams):
+        failures.append("duplicate teams while walking all pages")
+    for team in teams:
+        version = store.get(team['id']).version
+        if version != 1 + updates[team['id']]:
+            failures.append(f"team {team['id']} has version {version}, expected {1 + updates[team['id']]}")
+    if isinstance(store, MemoryTeamStore):
+        failures.extend(check_memory_indexes(store))
+
+    print(f"{args.threads} threads, {elapsed:.1f} s, {sum(ops.values()) / elapsed:.0f} ops/s")
+    for operation, count in sorted(ops.items()):
+        print(f"  {operation:<20} {count:8d}")
+    print(f"created {created}, deleted {deleted}, remaining {store.count()}")
+    if failures:
+        print(f"❌ {len(failures)} 個問題")
+        for failure in failures[:20]:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("✅ 一致性檢查通過")
+
+
+if __name__ == '__main__':
+    main()
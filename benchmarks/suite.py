@@ -0,0 +1,294 @@
+"""
+所有團隊路由的基準測試：先填入 N 筆團隊，再依序量測 health、list、get、create、update、delete，輸出 JSON 報告
+
+    python -m benchmarks.suite --teams 10000 --requests 2000 --output report.json
+    python -m benchmarks.suite --target live --concurrency 8 --output report.json
+    python -m benchmarks.suite --target live --url http://localhost:8080
+    python -m benchmarks.suite --compare old.json new.json
+
+target 為 client 時以 Flask test client 在同一行程內呼叫路由，並另外以 tracemalloc 量測每個請求的記憶體配置；
+target 為 live 時對本機伺服器發送 HTTP 請求（未指定 --url 時以 --mode 自動啟動一個），只量測吞吐量與延遲。
+create 建立的團隊會在 delete 時刪除，因此每個路由量測時的團隊數量都維持在 N 附近。
+"""
+import argparse
+from datetime import datetime, timezone
+import gc
+import json
+import os
+import platform
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+import requests
+
+from benchmarks.load import free_port, start_server
+from seeders import FIRST_NAMES, LAST_NAMES, generate_teams
+
+
+class ClientTarget:
+    """以 Flask test client 在同一行程內呼叫路由"""
+
+    name = 'client'
+    measures_allocations = True
+
+    def __init__(self):
+        from app import app, store
+        store.clear()
+        self.app = app
+
+    def session(self):
+        return self.app.test_client()
+
+    @staticmethod
+    def call(session, method, path, body=None, parse=False):
+        response = session.open(path, method=method, json=body)
+        return response.status_code, response.get_json() if parse else None
+
+    def close(self):
+        pass
+
+
+class LiveTarget:
+    """對執行中的伺服器發送 HTTP 請求，每個執行緒一個 keep-alive 連線"""
+
+    name = 'live'
+    measures_allocations = False
+
+    def __init__(self, url=None, mode='wsgi', threads=8):
+        self.process = None
+        if url is None:
+            port = free_port()
+            self.process = start_server(mode, port, threads)
+            url = f'http://127.0.0.1:{port}'
+        self.url = url.rstrip('/')
+
+    def session(self):
+        return requests.Session()
+
+    def call(self, session, method, path, body=None, parse=False):
+        response = session.request(method, self.url + path, json=body)
+        return response.status_code, response.json() if parse else None
+
+    def close(self):
+        if self.process is not None:
+            self.process.send_signal(signal.SIGTERM)
+            self.process.wait(timeout=30)
+
+
+def random_members(rng):
+    return [rng.choice(FIRST_NAMES) + rng.choice(LAST_NAMES) for _ in range(rng.randint(2, 12))]
+
+
+# 每個路由一個函式：(target, session, rng, state) → HTTP 狀態碼
+def health(target, session, rng, state):
+    return target.call(session, 'GET', '/health')[0]
+
+
+def list_teams(target, session, rng, state):
+    return target.call(session, 'GET', '/api/teams?limit=100')[0]
+
+
+def get_team(target, session, rng, state):
+    return target.call(session, 'GET', f"/api/teams/{rng.choice(state['seeded'])}")[0]
+
+
+def create_team(target, session, rng, state):
+    status, body = target.call(session, 'POST', '/api/teams',
+                               {'name': f"基準 {rng.random():.8f}", 'members': random_members(rng)}, parse=True)
+    if status == 201:
+        state['created'].append(body['data']['team']['id'])
+    return status
+
+
+def update_team(target, session, rng, state):
+    return target.call(session, 'PUT', f"/api/teams/{rng.choice(state['seeded'])}", {'members': random_members(rng)})[0]
+
+
+def delete_team(target, session, rng, state):
+    return target.call(session, 'DELETE', f"/api/teams/{state['created'].pop()}")[0]
+
+
+ROUTES = (
+    ('health', health),
+    ('list', list_teams),
+    ('get', get_team),
+    ('create', create_team),
+    ('update', update_team),
+    ('delete', delete_team),
+)
+
+
+def seed(target, count, batch_size=1000):
+    session = target.session()
+    ids = []
+    for start in range(0, count, batch_size):
+        teams = generate_teams(min(batch_size, count - start), start=start)
+        status, body = target.call(session, 'POST', '/api/teams:batch', {'teams': teams}, parse=True)
+        if status != 201:
+            raise RuntimeError(f"Seeding failed with status {status}")
+        ids.extend(item['team']['id'] for item in body['data']['results'])
+    return ids
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def run_route(target, route, state, count, concurrency):
+    """以 concurrency 個執行緒共送出 count 個請求，回傳吞吐量與延遲百分位"""
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+
+    def worker(slot, requests_count):
+        session = target.session()
+        rng = random.Random(slot)
+        for _ in range(requests_count):
+            started = time.perf_counter()
+            status = route(target, session, rng, state)
+            latencies[slot].append(time.perf_counter() - started)
+            if status >= 400:
+                errors[slot] += 1
+
+    shares = [count // concurrency + (slot < count % concurrency) for slot in range(concurrency)]
+    threads = [threading.Thread(target=worker, args=(slot, share)) for slot, share in enumerate(shares)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    values = sorted(latency for slot in latencies for latency in slot)
+    return {
+        'requests': len(values),
+        'errors': sum(errors),
+        'seconds': round(elapsed, 4),
+        'throughput_rps': round(len(values) / elapsed, 1),
+        'latency_ms': {
+            'mean': round(sum(values) / len(values) * 1000, 4),
+            'p50': round(percentile(values, 0.50) * 1000, 4),
+            'p90': round(percentile(values, 0.90) * 1000, 4),
+            'p99': round(percentile(values, 0.99) * 1000, 4),
+            'max': round(values[-1] * 1000, 4),
+        },
+    }
+
+
+def measure_allocations(target, route, state, count):
+    """
+    以 tracemalloc 量測每個請求的記憶體配置（與計時分開進行，避免追蹤成本影響延遲）
+
+    peak_kib 為單一請求期間的平均峰值配置量，blocks 為每個請求平均新增且未釋放的記憶體區塊數。
+    """
+    session = target.session()
+    rng = random.Random(count)
+    gc.collect()
+    tracemalloc.start()
+    peak_total = 0
+    blocks_before = sys.getallocatedblocks()
+    for _ in range(count):
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        route(target, session, rng, state)
+        peak_total += tracemalloc.get_traced_memory()[1] - baseline
+    blocks_after = sys.getallocatedblocks()
+    tracemalloc.stop()
+    return {
+        'peak_kib_per_request': round(peak_total / count / 1024, 2),
+        'blocks_per_request': round((blocks_after - blocks_before) / count, 2),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_suite(target, args):
+    state = {'seeded': seed(target, args.teams), 'created': []}
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'target': target.name,
+            'storage_backend': os.environ.get('STORAGE_BACKEND', 'memory'),
+            'teams': args.teams,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+        },
+        'routes': {},
+    }
+    for name, route in ROUTES:
+        # 先熱身，讓快取與連線進入穩定狀態；create 與 delete 的熱身次數相同，建立的團隊會剛好刪完
+        run_route(target, route, state, args.warmup, 1)
+        result = run_route(target, route, state, args.requests, args.concurrency)
+        result['allocations'] = None
+        if target.measures_allocations and args.alloc_requests:
+            result['allocations'] = measure_allocations(target, route, state, args.alloc_requests)
+        report['routes'][name] = result
+        print(f"{name:<8} {result['throughput_rps']:10.0f} req/s  p50 {result['latency_ms']['p50']:8.3f} ms  "
+              f"p99 {result['latency_ms']['p99']:8.3f} ms  errors {result['errors']}", file=sys.stderr)
+    return report
+
+
+def compare(old_path, new_path):
+    """比較兩份報告，列出每個路由的吞吐量與 p99 變化"""
+    with open(old_path, encoding='utf-8') as file:
+        old = json.load(file)
+    with open(new_path, encoding='utf-8') as file:
+        new = json.load(file)
+    print(f"{old['meta']['commit']} → {new['meta']['commit']}")
+    print(f"{'route':<8} {'req/s':>10} {'change':>8} {'p99 ms':>10} {'change':>8}")
+    for name, result in new['routes'].items():
+        before = old['routes'].get(name)
+        if before is None:
+            continue
+        rps, p99 = result['throughput_rps'], result['latency_ms']['p99']
+        rps_change = (rps / before['throughput_rps'] - 1) * 100
+        p99_change = (p99 / before['latency_ms']['p99'] - 1) * 100
+        print(f"{name:<8} {rps:10.0f} {rps_change:+7.1f}% {p99:10.3f} {p99_change:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', choices=('client', 'live'), default='client')
+    parser.add_argument('--url', help='live 模式使用的伺服器位址，未指定時自動啟動')
+    parser.add_argument('--mode', choices=('dev', 'wsgi', 'asgi'), default='wsgi', help='自動啟動伺服器時的服務模式')
+    parser.add_argument('--teams', type=int, default=10_000)
+    parser.add_argument('--requests', type=int, default=2000, help='每個路由的請求數')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--warmup', type=int, default=100)
+    parser.add_argument('--alloc-requests', type=int, default=200, help='client 模式量測記憶體配置的請求數，0 表示略過')
+    parser.add_argument('--output', help='報告寫入的檔案，未指定時輸出到 stdout')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='比較兩份報告')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    target = ClientTarget() if args.target == 'client' else LiveTarget(args.url, args.mode)
+    try:
+        report = run_suite(target, args)
+    finally:
+        target.close()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+依 Accept-Encoding 壓縮回應：一律支援 gzip，安裝 brotli 或 zstandard 套件時另外支援 br 與 zstd
+"""
+from collections import OrderedDict
+import gzip
+import threading
+
+ENCODERS = {'gzip': lambda data, level: gzip.compress(data, level, mtime=0)}
+DEFAULT_LEVELS = {'gzip': 6}
+
+try:
+    import brotli
+    ENCODERS['br'] = lambda data, level: brotli.compress(data, quality=level)
+    DEFAULT_LEVELS['br'] = 5
+except ImportError:
+    pass
+
+try:
+    import zstandard
+    ENCODERS['zstd'] = lambda data, level: zstandard.ZstdCompressor(level=level).compress(data)
+    DEFAULT_LEVELS['zstd'] = 3
+except ImportError:
+    pass
+
+# 客戶端的 q 值相同時，依此順序優先選擇壓縮率較好的編碼
+PREFERENCE = ('br', 'zstd', 'gzip')
+
+COMPRESSIBLE_MIMETYPES = frozenset({
+    'application/json', 'application/msgpack', 'application/x-ndjson', 'application/javascript',
+    'text/plain', 'text/html', 'text/css',
+})
+
+
+class Compressor:
+    def __init__(self, min_size=1024, levels=None):
+        self.min_size = min_size
+        self.levels = {**DEFAULT_LEVELS, **(levels or {})}
+        self.encodings = [encoding for encoding in PREFERENCE if encoding in ENCODERS]
+
+    def negotiate(self, accept_encodings):
+        """依 request.accept_encodings 選出編碼，客戶端不接受任何支援的編碼時為 None"""
+        return accept_encodings.best_match(self.encodings)
+
+    def compress(self, data, encoding):
+        return ENCODERS[encoding](data, self.levels[encoding])
+
+    def is_compressible(self, response):
+        """一般（非串流）、成功且尚未編碼的文字類回應"""
+        return (200 <= response.status_code < 300 and response.status_code != 204
+                and not response.is_streamed and not response.direct_passthrough
+                and 'Content-Encoding' not in response.headers
+                and response.mimetype in COMPRESSIBLE_MIMETYPES)
+
+    @staticmethod
+    def tagged(etag, encoding):
+        """壓縮後的內容與原本的 bytes 不同，強 ETag 需附加編碼以區分"""
+        return f"{etag}+{encoding}"
+
+    def encoded(self, response, encoding):
+        """標示回應內容已經以 encoding 壓縮；已設定 ETag 時一併換成該編碼的 ETag"""
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(self.tagged(etag, encoding), weak)
+        return response
+
+    def apply(self, response, encoding):
+        response.set_data(self.compress(response.get_data(), encoding))
+        return self.encoded(response, encoding)
+
+    def compress_response(self, response, accept_encodings):
+        """after_request 使用：回應夠大且客戶端接受時壓縮，否則原樣回傳"""
+        if not self.is_compressible(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        if (response.content_length or 0) < self.min_size:
+            return response
+        encoding = self.negotiate(accept_encodings)
+        return self.apply(response, encoding) if encoding else response
+
+
+def _is_older(version, current):
+    epoch, _, counter = version.rpartition('.')
+    current_epoch, _, current_counter = current.rpartition('.')
+    return epoch == current_epoch and int(counter) < int(current_counter)
+
+
+class CompressedCache:
+    """
+    以儲存版本為鍵的壓縮結果快取（LRU）
+
+    版本改變時整個清空，因此只會回傳目前版本的內容；資料未變動時輪詢的客戶端可直接拿到壓縮好的 bytes。
+    版本為 store.version() 的「<epoch>.<序號>」字串：同一 epoch 內較舊版本的結果（查詢期間資料已被更新）不會寫入。
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._version = None
+        self._entries = OrderedDict()
+
+    def get(self, version, key):
+        with self._lock:
+            if version != self._version:
+                return None
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, version, key, data):
+        with self._lock:
+            if self._version is not None and _is_older(version, self._version):
+                return
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            self._entries[key] = data
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
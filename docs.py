@@ -0,0 +1,109 @@
+"""
+API 文件（/apidocs 與 /apispec_1.json）
+
+SWAGGER_MODE 為 lazy（預設）時啟動只註冊文件路由，第一次有人開啟文件時才載入 flasgger 並解析路由的 YAML docstring；
+SWAGGER_SPEC 指向預先產生的規格檔時 /apispec_1.json 直接回傳該檔。eager 為啟動時就建立 Swagger(app)，off 不提供文件。
+
+    python docs.py --output apispec.json     # 預先產生規格檔（例如建置映像時）
+"""
+import argparse
+import importlib.util
+import os
+import threading
+
+from flask import Blueprint, redirect, render_template, url_for
+
+SWAGGER_MODES = ('lazy', 'eager', 'off')
+
+
+def create_swagger(app):
+    """建立只用來產生規格與渲染頁面的 Swagger 物件，不註冊任何路由"""
+    from flasgger import Swagger
+    swagger = Swagger()
+    swagger.app = app
+    swagger.load_config(app)
+    return swagger
+
+
+def build_spec(app):
+    with app.test_request_context():
+        return create_swagger(app).get_apispecs()
+
+
+class LazyDocs:
+    """
+    與 flasgger 相同網址與 endpoint 名稱的文件路由，只在被請求時才載入 flasgger
+
+    Swagger UI 的樣板與靜態檔直接指向 flasgger 套件目錄（以 find_spec 取得路徑，不會 import 套件），
+    規格第一次產生後快取在記憶體中。
+    """
+
+    def __init__(self, app, spec_path=None):
+        self.app = app
+        self.spec_path = spec_path
+        self._swagger = None
+        self._spec = None
+        self._lock = threading.Lock()
+
+        ui = os.path.join(importlib.util.find_spec('flasgger').submodule_search_locations[0],
+                          f"ui{app.config.get('SWAGGER', {}).get('uiversion', 3)}")
+        blueprint = Blueprint('flasgger', __name__,
+                              template_folder=os.path.join(ui, 'templates'),
+                              static_folder=os.path.join(ui, 'static'),
+                              static_url_path='/flasgger_static')
+        blueprint.add_url_rule('/apidocs/', 'apidocs', self.apidocs)
+        blueprint.add_url_rule('/apidocs/index.html', 'apidocs_index', lambda: redirect(url_for('flasgger.apidocs')))
+        blueprint.add_url_rule('/oauth2-redirect.html', 'oauth_redirect',
+                               lambda: render_template('flasgger/oauth2-redirect.html'))
+        blueprint.add_url_rule('/apispec_1.json', 'apispec_1', self.apispec)
+        app.register_blueprint(blueprint)
+
+    def swagger(self):
+        with self._lock:
+            if self._swagger is None:
+                self._swagger = create_swagger(self.app)
+            return self._swagger
+
+    def spec(self):
+        """規格的 JSON bytes：有預先產生的規格檔時直接讀取，否則第一次請求時產生"""
+        if self._spec is None:
+            if self.spec_path and os.path.exists(self.spec_path):
+                with open(self.spec_path, 'rb') as file:
+                    self._spec = file.read()
+            else:
+                self._spec = self.app.json.dumps(self.swagger().get_apispecs()).encode('utf-8')
+        return self._spec
+
+    def apispec(self):
+        return self.app.response_class(self.spec(), mimetype='application/json')
+
+    def apidocs(self):
+        from flasgger.base import APIDocsView
+        return APIDocsView(view_args={'config': self.swagger().config}).get()
+
+
+def init_docs(app, mode='lazy', spec_path=None):
+    if mode not in SWAGGER_MODES:
+        raise ValueError(f"SWAGGER_MODE must be one of {', '.join(SWAGGER_MODES)}")
+    if mode == 'eager':
+        from flasgger import Swagger
+        return Swagger(app)
+    if mode == 'lazy':
+        return LazyDocs(app, spec_path)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default='apispec.json')
+    args = parser.parse_args()
+
+    from app import app
+    spec = app.json.dumps(build_spec(app))
+    with open(args.output, 'w', encoding='utf-8') as file:
+        file.write(spec)
+    print(f"✅ 產生 {args.output}（{len(spec.encode('utf-8')) / 1024:.0f} KiB）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+團隊變動事件（Server-Sent Events）：最近的新增、更新、刪除保存在固定大小的環形緩衝區，訂閱者以 Last-Event-ID 續傳
+
+每個事件在發布時就編碼成完整的 SSE 區塊（id / event / data），之後寫給每個訂閱者都是同一份 bytes。
+序號從 1 開始連續遞增，事件 n 存放在 n % capacity 的位置，讀取某序號之後的事件不需要搜尋。
+"""
+import asyncio
+import threading
+
+from serialization import encode
+
+EVENTS = ('created', 'updated', 'deleted')
+
+
+def format_event(seq, event, data):
+    return b'id: %d\nevent: %s\ndata: %s\n\n' % (seq, event.encode(), data)
+
+
+def reset_event(last_id):
+    """續傳的序號已不在緩衝區內（或服務重啟過）時送出，客戶端應重新取得完整列表"""
+    return b'id: %d\nevent: reset\ndata: %s\n\n' % (last_id, encode({'lastEventId': last_id}))
+
+
+KEEP_ALIVE = b': keep-alive\n\n'
+
+
+class ChangeFeed:
+    """
+    執行緒安全的變動事件緩衝區
+
+    執行緒訂閱者在 Condition 上等待；asyncio 訂閱者則共用每個事件迴圈一個 asyncio.Event，
+    發布時只喚醒一次事件迴圈。閒置的訂閱者不佔用 CPU，只有保持連線所需的少量記憶體。
+    """
+
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        self._frames = [None] * capacity
+        self._last_id = 0
+        self._condition = threading.Condition()
+        self._loop_events = {}
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def publish(self, event, data):
+        """發布一個事件，data 為已編碼的 JSON bytes，回傳事件序號"""
+        with self._condition:
+            self._last_id += 1
+            seq = self._last_id
+            self._frames[seq % self.capacity] = format_event(seq, event, data)
+            self._condition.notify_all()
+            loops = list(self._loop_events)
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._wake, loop)
+            except RuntimeError:
+                # 事件迴圈已關閉
+                with self._condition:
+                    self._loop_events.pop(loop, None)
+        return seq
+
+    def read(self, after):
+        """
+        回傳 (frames, last_id, reset)：序號 after 之後的所有事件區塊與目前最新序號
+
+        after 之後的事件已被覆蓋、或 after 比目前序號還大（服務重啟過）時 reset 為 True，frames 為空
+        """
+        with self._condition:
+            last_id = self._last_id
+            if after > last_id or after < last_id - self.capacity:
+                return [], last_id, True
+            return [self._frames[seq % self.capacity] for seq in range(after + 1, last_id + 1)], last_id, False
+
+    def wait(self, after, timeout):
+        """執行緒訂閱者：等到 after 之後有新事件或逾時，再以 read() 取出"""
+        with self._condition:
+            if after == self._last_id:
+                self._condition.wait(timeout)
+        return self.read(after)
+
+    async def wait_async(self, after, timeout):
+        """asyncio 訂閱者：同 wait()，但只在事件迴圈上等待，不佔用執行緒"""
+        loop = asyncio.get_running_loop()
+        with self._condition:
+            pending = after == self._last_id
+            event = self._loop_events.get(loop)
+            if event is None:
+                event = self._loop_events[loop] = asyncio.Event()
+        if pending:
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.read(after)
+
+    def _wake(self, loop):
+        # 在事件迴圈的執行緒內執行：換上新的 Event 後喚醒等待舊 Event 的所有訂閱者
+        with self._condition:
+            event = self._loop_events.get(loop)
+            self._loop_events[loop] = asyncio.Event()
+        if event is not None:
+            event.set()
+
+
+def parse_last_event_id(value):
+    """解析 Last-Event-ID，未提供時為 None，格式不符時拋出 ValueError"""
+    if value is None or value == '':
+        return None
+    seq = int(value)
+    if seq < 0:
+        raise ValueError(value)
+    return seq
+
+
+def stream(feed, after, heartbeat):
+    """WSGI 用的事件產生器：after 為 None 時從目前最新的事件之後開始"""
+    after = feed.last_id if after is None else after
+    frames, last_id, reset = feed.read(after)
+    while True:
+        if reset:
+            yield reset_event(last_id)
+        elif frames:
+            yield b''.join(frames)
+        else:
+            yield KEEP_ALIVE
+        after = last_id
+        frames, last_id, reset = feed.wait(after, heartbeat)
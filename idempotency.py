@@ -0,0 +1,107 @@
+"""
+Idempotency-Key：同一個鍵的重試直接重播第一次成功的回應，不會重複建立團隊
+
+鍵對應到請求本文的雜湊與儲存的回應，容量與保存時間都有上限；同一個鍵同時有多個請求時，
+只有第一個實際執行，其餘等待它完成後重播結果。
+"""
+from collections import OrderedDict, namedtuple
+import hashlib
+import threading
+import time
+
+StoredResponse = namedtuple('StoredResponse', 'status body headers')
+
+
+class IdempotencyKeyReused(Exception):
+    """同一個鍵搭配了不同的請求本文"""
+
+
+class IdempotencyKeyInFlight(Exception):
+    """同一個鍵的請求仍在處理中，等待逾時"""
+
+
+def fingerprint(body):
+    return hashlib.sha256(body).digest()
+
+
+class _Entry:
+    __slots__ = ('fingerprint', 'stamp', 'result', 'done')
+
+    def __init__(self, fingerprint, stamp):
+        self.fingerprint = fingerprint
+        self.stamp = stamp
+        self.result = None
+        self.done = threading.Event()
+
+
+class IdempotencyCache:
+    """
+    鍵 → (請求本文雜湊, 回應) 的 LRU 快取，超過 max_entries 或保存超過 ttl 秒的項目會被移除
+
+    執行中的鍵也佔一個項目：之後的請求等待它完成（最多 wait 秒）；執行失敗或結果不可快取時移除項目，
+    等待中的請求改由其中一個重新執行。
+    """
+
+    def __init__(self, max_entries=10000, ttl=86400.0, wait=10.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.wait = wait
+        self.clock = clock
+        # 依完成（或開始執行）的時間排序，最舊的在最前面
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def run(self, key, body_hash, execute, cacheable):
+        """回傳 (結果, 是否為重播)；execute() 只在沒有可重播的結果時執行，cacheable(結果) 為真時才保存"""
+        while True:
+            with self._lock:
+                self._evict(self.clock())
+                entry = self._entries.get(key)
+                owner = entry is None
+                if owner:
+                    entry = self._entries[key] = _Entry(body_hash, self.clock())
+                    if len(self._entries) > self.max_entries:
+                        # 執行中的項目被擠出時，等待中的請求仍持有它，只是之後的重試不再能重播
+                        self._entries.popitem(last=False)
+            if entry.fingerprint != body_hash:
+                raise IdempotencyKeyReused(key)
+            if owner:
+                return self._execute(key, entry, execute, cacheable), False
+            if not entry.done.wait(self.wait):
+                raise IdempotencyKeyInFlight(key)
+            if entry.result is not None:
+                return entry.result, True
+
+    def _execute(self, key, entry, execute, cacheable):
+        try:
+            result = execute()
+        except BaseException:
+            self._discard(key, entry)
+            raise
+        if not cacheable(result):
+            self._discard(key, entry)
+            return result
+        with self._lock:
+            entry.result = result
+            entry.stamp = self.clock()
+            if self._entries.get(key) is entry:
+                self._entries.move_to_end(key)
+        entry.done.set()
+        return result
+
+    def _discard(self, key, entry):
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+        entry.done.set()
+
+    def _evict(self, now):
+        entries = self._entries
+        while entries:
+            entry = next(iter(entries.values()))
+            if now - entry.stamp < self.ttl:
+                break
+            entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,390 @@
+from array import array
+import bisect
+import heapq
+from itertools import islice
+import unicodedata
+
+from sortedcontainers import SortedList
+
+
+class SortedIndex:
+    """以 (排序值, team id) 為鍵的有序索引，分頁時只需 O(log N + 頁大小)"""
+
+    def __init__(self, key_func):
+        self.key = key_func
+        self._keys = SortedList()
+
+    def add(self, team):
+        self._keys.add(self.key(team))
+
+    def add_many(self, teams):
+        """大量載入時一次排序，比逐筆插入快得多"""
+        self._keys.update(self.key(team) for team in teams)
+
+    def remove(self, team):
+        self._keys.discard(self.key(team))
+
+    def replace(self, old, new):
+        """團隊更新時使用，排序值沒變（例如 createdAt）就不必移動"""
+        old_key, new_key = self.key(old), self.key(new)
+        if old_key != new_key:
+            self._keys.discard(old_key)
+            self._keys.add(new_key)
+
+    def clear(self):
+        self._keys.clear()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def count(self, lower=None, upper=None):
+        """計算 [lower, upper) 區間內的鍵數量"""
+        start = 0 if lower is None else self._keys.bisect_left(lower)
+        stop = len(self._keys) if upper is None else self._keys.bisect_left(upper)
+        return max(stop - start, 0)
+
+    def scan(self, lower=None, upper=None, after=None, reverse=False):
+        """依序走訪 [lower, upper) 區間內的鍵，after 為上一頁最後一個鍵（不含）"""
+        minimum, maximum = lower, upper
+        inclusive = (True, False)
+        if after is not None:
+            if reverse:
+                if maximum is None or after < maximum:
+                    maximum = after
+            elif minimum is None or after >= minimum:
+                minimum = after
+                inclusive = (False, False)
+        return self._keys.irange(minimum, maximum, inclusive=inclusive, reverse=reverse)
+
+
+def prefix_bounds(prefix):
+    """回傳字首查詢的 [lower, upper) 鍵範圍，可直接用於 SortedIndex"""
+    last = ord(prefix[-1])
+    if last == 0x10FFFF:
+        return (prefix,), None
+    return (prefix,), (prefix[:-1] + chr(last + 1),)
+
+
+class InvertedIndex:
+    """鍵 → team id 集合的反向索引，查詢為 O(1)"""
+
+    def __init__(self, keys_func):
+        self._keys_func = keys_func
+        self._postings = {}
+
+    def add(self, team):
+        for key in self._keys_func(team):
+            self._postings.setdefault(key, set()).add(team.uid)
+
+    def add_many(self, teams):
+        keys_func, postings = self._keys_func, self._postings
+        for team in teams:
+            uid = team.uid
+            for key in keys_func(team):
+                ids = postings.get(key)
+                if ids is None:
+                    postings[key] = {uid}
+                else:
+                    ids.add(uid)
+
+    def remove(self, team):
+        for key in self._keys_func(team):
+            ids = self._postings.get(key)
+            if ids is not None:
+                ids.discard(team.uid)
+                if not ids:
+                    del self._postings[key]
+
+    def replace(self, old, new):
+        """只調整新舊團隊之間有差異的鍵，例如只新增一位成員時只動一個 posting"""
+        old_keys, new_keys = set(self._keys_func(old)), set(self._keys_func(new))
+        for key in old_keys - new_keys:
+            ids = self._postings.get(key)
+            if ids is not None:
+                ids.discard(old.uid)
+                if not ids:
+                    del self._postings[key]
+        for key in new_keys - old_keys:
+            self._postings.setdefault(key, set()).add(new.uid)
+
+    def clear(self):
+        self._postings.clear()
+
+    def get(self, key):
+        return self._postings.get(key, frozenset())
+
+
+def substring_score(query, text):
+    """text 包含 query 時的分數（0.5–1，越短、從開頭符合者越高），不包含時回傳 None"""
+    position = text.find(query)
+    if position < 0:
+        return None
+    return 0.5 + 0.4 * len(query) / len(text) + (0.1 if position == 0 else 0)
+
+
+def typo_budget(length):
+    """查詢長度對應的容許錯字數：三個字以下不容錯"""
+    return 0 if length < 4 else 1 if length < 8 else 2
+
+
+def _keep_best(heap, item, limit):
+    if len(heap) < limit:
+        heapq.heappush(heap, item)
+    elif item > heap[0]:
+        heapq.heapreplace(heap, item)
+
+
+class NGramIndex:
+    """
+    不重複字串的字元 n-gram 反向索引，支援子字串與容錯搜尋
+
+    keys_func(team) 回傳團隊的字串（例如正規化後的名稱或各個成員），text_func(key) 為建立 gram 的文字。
+    每個字串以 refcount 記錄被多少團隊使用，只在第一次出現時寫入 posting。posting 為單字與雙字 gram →
+    {文字長度: array('I') 字串編號}，每筆只佔 4 bytes，新增只是附加；依長度分組讓搜尋可以先檢查分數較高的短字串。
+    字串不再被使用時只標記為刪除，刪除的數量超過仍在使用的數量時才重新編號並重建，攤銷後每次刪除仍是 O(1)。
+    """
+
+    SCAN_LIMIT = 3000
+
+    def __init__(self, keys_func, text_func=None):
+        self._keys_func = keys_func
+        self._text_func = text_func or (lambda key: key)
+        self.clear()
+
+    def clear(self):
+        self._ids = {}
+        self._keys = []
+        self._texts = []
+        self._refs = []
+        self._postings = {}
+        self._dead = 0
+
+    @staticmethod
+    def grams(text):
+        return {*text, *(text[i:i + 2] for i in range(len(text) - 1))}
+
+    def _add_key(self, key, refs=1):
+        term_id = self._ids.get(key)
+        if term_id is not None:
+            self._refs[term_id] += refs
+            return
+        term_id = self._ids[key] = len(self._keys)
+        text = self._text_func(key)
+        self._keys.append(key)
+        self._texts.append(text)
+        self._refs.append(refs)
+        postings, length = self._postings, len(text)
+        for gram in self.grams(text):
+            buckets = postings.get(gram)
+            if buckets is None:
+                buckets = postings[gram] = {}
+            posting = buckets.get(length)
+            if posting is None:
+                posting = buckets[length] = array('I')
+            posting.append(term_id)
+
+    def _remove_key(self, key):
+        term_id = self._ids.get(key)
+        if term_id is None:
+            return
+        self._refs[term_id] -= 1
+        if self._refs[term_id]:
+            return
+        del self._ids[key]
+        self._keys[term_id] = self._texts[term_id] = None
+        self._dead += 1
+        if self._dead > max(len(self._ids), 1024):
+            self._compact()
+
+    def _compact(self):
+        live = [(key, refs) for key, refs in zip(self._keys, self._refs) if key is not None]
+        self.clear()
+        for key, refs in live:
+            self._add_key(key, refs)
+
+    def add(self, team):
+        for key in self._keys_func(team):
+            self._add_key(key)
+
+    def add_many(self, teams):
+        for team in teams:
+            self.add(team)
+
+    def remove(self, team):
+        for key in self._keys_func(team):
+            self._remove_key(key)
+
+    def replace(self, old, new):
+        """只調整新舊團隊之間有差異的字串"""
+        old_keys, new_keys = set(self._keys_func(old)), set(self._keys_func(new))
+        for key in old_keys - new_keys:
+            self._remove_key(key)
+        for key in new_keys - old_keys:
+            self._add_key(key)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def search(self, text, limit, scan_limit=SCAN_LIMIT):
+        """
+        回傳 (matches, truncated)：matches 為分數由高到低的 (分數, key)，最多 limit 筆
+
+        包含 text 的字串分數為 0.5–1（見 substring_score），依長度由短到長檢查，
+        剩下的長度已不可能擠進前 limit 名時提早結束。
+        符合的字串不足 limit 筆且查詢夠長時再容許錯字（見 typo_budget）：每個錯字最多破壞兩個雙字 gram，
+        共有足夠 gram 的字串依共有的單字與雙字比例得到低於 0.5 的分數。
+        兩個階段各自最多逐一檢查 scan_limit 個字串，查詢太籠統而未檢查完時 truncated 為 True。
+        """
+        if not text:
+            return [], False
+        length = len(text)
+        grams = [text] if length <= 2 else list({text[i:i + 2] for i in range(length - 1)})
+        postings = sorted((self._postings.get(gram, {}) for gram in grams),
+                          key=lambda buckets: sum(map(len, buckets.values())))
+        texts, best, truncated = self._texts, [], False
+
+        # 包含 text 的字串出現在每個 gram 的 posting 中：同一長度的 posting 先在 C 層取交集，只逐一確認交集內的字串
+        budget = scan_limit
+        for bucket_length in sorted(size for size in postings[0] if size >= length):
+            if len(best) == limit and best[0][0] >= 0.6 + 0.4 * length / bucket_length:
+                break
+            arrays = sorted((buckets.get(bucket_length, ()) for buckets in postings), key=len)
+            matched = arrays[0]
+            for posting in arrays[1:]:
+                # 交集的成本與 posting 長度成正比；posting 遠大於候選數時直接逐一確認較快
+                if not matched or len(posting) > 16 * len(matched):
+                    break
+                matched = set(matched).intersection(posting)
+            for term_id in islice(matched, budget):
+                candidate = texts[term_id]
+                if candidate is not None:
+                    score = substring_score(text, candidate)
+                    if score is not None:
+                        _keep_best(best, (score, term_id), limit)
+            if len(matched) > budget:
+                truncated = True
+                break
+            budget -= len(matched)
+
+        typos = typo_budget(length)
+        if len(best) < limit and typos:
+            required = max(len(grams) - 2 * typos, 1)
+            candidates = postings[:len(grams) - required + 1]
+            # 排名另外計入共有的單字，錯一個字的字串比只共有一小段的字串分數高
+            units = grams + list(set(text))
+            seen, budget = set(), scan_limit
+            # 從長度最接近查詢的字串開始
+            lengths = sorted({size for buckets in candidates for size in buckets if size > required},
+                             key=lambda size: abs(size - length))
+            for bucket_length in lengths:
+                closeness = 0.05 * min(length, bucket_length) / max(length, bucket_length)
+                for buckets in candidates:
+                    posting = buckets.get(bucket_length, ())
+                    for term_id in islice(posting, budget):
+                        candidate = texts[term_id]
+                        if term_id in seen or candidate is None or text in candidate:
+                            continue
+                        seen.add(term_id)
+                        if sum(gram in candidate for gram in grams) >= required:
+                            shared = sum(unit in candidate for unit in units)
+                            _keep_best(best, (0.45 * shared / len(units) + closeness, term_id), limit)
+                    if len(posting) > budget:
+                        truncated = True
+                    budget -= min(len(posting), budget)
+                    if not budget:
+                        break
+                if not budget:
+                    break
+
+        keys = self._keys
+        return [(score, keys[term_id]) for score, term_id in sorted(best, reverse=True)], truncated
+
+
+# 團隊人數直方圖各區間的上限（含），最後一個區間為超過 100 人
+SIZE_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def size_bucket(size):
+    return bisect.bisect_left(SIZE_BUCKETS, size)
+
+
+def size_histogram(counts):
+    """各區間的團隊數 → [(最少人數, 最多人數, 團隊數)]，最後一個區間的最多人數為 None"""
+    lower = (0, *(bound + 1 for bound in SIZE_BUCKETS))
+    return list(zip(lower, (*SIZE_BUCKETS, None), counts))
+
+
+class TeamStats:
+    """
+    團隊數、成員數與人數直方圖，隨新增、更新、刪除逐筆調整，讀取為 O(1)
+
+    成員以共用名稱表的編號計數：_refs[編號] 為包含該成員的團隊數，由 0 變 1 與由 1 變 0 時調整不重複成員數。
+    儲存中的團隊持有這些編號，計數大於 0 的編號不會被名稱表回收，因此不會對應到別的名稱。
+    同一團隊中重複的成員只算一次。
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.teams = 0
+        self.members = 0
+        self.distinct_members = 0
+        self._buckets = [0] * (len(SIZE_BUCKETS) + 1)
+        self._refs = array('I')
+
+    def _retain(self, member_ids):
+        refs = self._refs
+        for member_id in member_ids:
+            if member_id >= len(refs):
+                refs.extend(bytes(4 * (member_id + 1 - len(refs))))
+            if not refs[member_id]:
+                self.distinct_members += 1
+            refs[member_id] += 1
+
+    def _release(self, member_ids):
+        refs = self._refs
+        for member_id in member_ids:
+            refs[member_id] -= 1
+            if not refs[member_id]:
+                self.distinct_members -= 1
+
+    def add(self, team):
+        member_ids = set(team.member_ids)
+        self.teams += 1
+        self.members += len(member_ids)
+        self._buckets[size_bucket(len(member_ids))] += 1
+        self._retain(member_ids)
+
+    def add_many(self, teams):
+        for team in teams:
+            self.add(team)
+
+    def remove(self, team):
+        member_ids = set(team.member_ids)
+        self.teams -= 1
+        self.members -= len(member_ids)
+        self._buckets[size_bucket(len(member_ids))] -= 1
+        self._release(member_ids)
+
+    def replace(self, old, new):
+        # 只改名稱時新舊團隊共用同一組編號，不需調整
+        if old.member_ids is new.member_ids:
+            return
+        old_ids, new_ids = set(old.member_ids), set(new.member_ids)
+        self.members += len(new_ids) - len(old_ids)
+        self._buckets[size_bucket(len(old_ids))] -= 1
+        self._buckets[size_bucket(len(new_ids))] += 1
+        self._retain(new_ids - old_ids)
+        self._release(old_ids - new_ids)
+
+    def histogram(self):
+        return size_histogram(self._buckets)
+
+    def __len__(self):
+        return self.teams
+
+
+def normalize_name(name):
+    """名稱正規化：統一全形/半形、不分大小寫、合併空白"""
+    return ' '.join(unicodedata.normalize('NFKC', name).casefold().split())
@@ -0,0 +1,103 @@
+"""
+成員名稱的 intern 表：相同的名稱只保存一份字串，團隊以 array('I') 保存 4 bytes 的名稱編號
+
+同一位成員常出現在許多團隊中，而每個請求解析出的名稱都是各自獨立的字串物件（一個中文名字約 80 bytes）。
+每個編號以參照計數記錄被多少團隊物件使用，歸零時移除名稱，編號留待之後的新名稱重複使用。
+"""
+from array import array
+import sys
+import threading
+
+
+class InternTable:
+    """
+    名稱 ↔ 編號的對照表
+
+    intern() 與 retain() 增加參照計數；release() 可能在物件回收時於任何執行緒、任何時間點被呼叫
+    （包含本表持有鎖的期間），因此只把編號放入待處理清單，取得鎖時才實際扣除。
+    持有編號的團隊仍存在時該編號不會被回收，names() 不需加鎖。
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._names = []
+        self._refs = array('I')
+        self._free = []
+        self._released = []
+        self._lock = threading.Lock()
+
+    def intern(self, names):
+        """回傳名稱的編號陣列，每個編號的參照計數加一"""
+        ids = []
+        with self._lock:
+            self._drain()
+            lookup, refs = self._ids.get, self._refs
+            for name in names:
+                name_id = lookup(name)
+                if name_id is None:
+                    name_id = self._new_id(name)
+                else:
+                    refs[name_id] += 1
+                ids.append(name_id)
+        # 一次建立剛好大小的陣列，不保留 append 預留的空間
+        return array('I', ids)
+
+    def _new_id(self, name):
+        if self._free:
+            name_id = self._free.pop()
+            self._names[name_id] = name
+            self._refs[name_id] = 1
+        else:
+            name_id = len(self._names)
+            self._names.append(name)
+            self._refs.append(1)
+        self._ids[name] = name_id
+        return name_id
+
+    def retain(self, ids):
+        """另一個團隊物件共用同一組編號（例如 copy-on-write 時成員不變）"""
+        with self._lock:
+            refs = self._refs
+            for name_id in ids:
+                refs[name_id] += 1
+        return ids
+
+    def release(self, ids):
+        if not ids:
+            return
+        self._released.append(ids)
+        # 鎖空閒時順便處理，避免只刪除不新增時待處理清單持續累積；取不到鎖（包含本執行緒正持有）時留給下一次
+        if self._lock.acquire(blocking=False):
+            try:
+                self._drain()
+            finally:
+                self._lock.release()
+
+    def _drain(self):
+        released, refs, names = self._released, self._refs, self._names
+        while released:
+            for name_id in released.pop():
+                refs[name_id] -= 1
+                if not refs[name_id]:
+                    del self._ids[names[name_id]]
+                    names[name_id] = None
+                    self._free.append(name_id)
+
+    def names(self, ids):
+        return tuple(map(self._names.__getitem__, ids))
+
+    def __len__(self):
+        return len(self._ids)
+
+    def report(self):
+        """不重複的名稱數、參照總數（即未 intern 時需要的字串數）與對照表本身的記憶體用量估計（bytes）"""
+        with self._lock:
+            self._drain()
+            names = [name for name in self._names if name is not None]
+            table_bytes = (sys.getsizeof(self._ids) + sys.getsizeof(self._names) + sys.getsizeof(self._refs)
+                           + sys.getsizeof(self._free) + sum(map(sys.getsizeof, names)))
+            return {'names': len(names), 'references': sum(self._refs), 'tableBytes': table_bytes}
+
+
+# 所有團隊共用的成員名稱表
+member_names = InternTable()
@@ -0,0 +1,144 @@
+"""
+准入控制：每個客戶端、每個路由的 token bucket 限流，以及依進行中請求數的負載卸除（load shedding）
+
+限流規則的格式為「速率/單位[:突發量]」，例如 10/s、600/m:50；突發量省略時等於每秒速率（至少 1）。
+"""
+from collections import OrderedDict, namedtuple
+import math
+import threading
+import time
+
+Rate = namedtuple('Rate', 'per_second burst')
+
+UNITS = {'s': 1, 'm': 60, 'h': 3600}
+
+
+def parse_rate(text):
+    """解析 10/s、600/m:50 這類規則，格式不符時拋出 ValueError"""
+    spec, _, burst = text.strip().partition(':')
+    count, _, unit = spec.partition('/')
+    if unit not in UNITS:
+        raise ValueError(f"Invalid rate limit: {text}")
+    per_second = float(count) / UNITS[unit]
+    burst = float(burst) if burst else max(per_second, 1.0)
+    if per_second <= 0 or burst < 1:
+        raise ValueError(f"Invalid rate limit: {text}")
+    return Rate(per_second, burst)
+
+
+def parse_routes(text):
+    """
+    解析各路由的規則，以逗號分隔，例如 "POST /api/teams=5/s:20, /api/teams/<team_id>=50/s"
+
+    路由為 Flask 的路由規則，可加上方法；未指定方法時套用到該路由的所有方法
+    """
+    rules = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        route, _, rate = item.rpartition('=')
+        if not route:
+            raise ValueError(f"Invalid route rate limit: {item}")
+        rules[route.strip()] = parse_rate(rate)
+    return rules
+
+
+class _Shard:
+    __slots__ = ('lock', 'buckets')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # 鍵 → [tokens, 最後更新時間, 補滿所需秒數]，依最後使用時間排序（LRU）
+        self.buckets = OrderedDict()
+
+
+class RateLimiter:
+    """
+    以 (客戶端, 路由) 為鍵的 token bucket
+
+    bucket 分散在多個分片中，各自加鎖，不同客戶端的請求很少互相等待。閒置到足以補滿的 bucket
+    與新的 bucket 沒有差別，因此每次請求順便從 LRU 的最舊端移除這些 bucket，記憶體只與最近活躍的客戶端數成正比。
+    """
+
+    SHARDS = 16
+
+    def __init__(self, default=None, routes=None, clock=time.monotonic):
+        self.default = default
+        self.routes = routes or {}
+        self.clock = clock
+        self._shards = [_Shard() for _ in range(self.SHARDS)]
+        self._sweep = 0
+
+    @property
+    def enabled(self):
+        return self.default is not None or bool(self.routes)
+
+    def rate_for(self, method, route):
+        return self.routes.get(f'{method} {route}') or self.routes.get(route) or self.default
+
+    def acquire(self, client, method, route):
+        """取用一個 token：允許時回傳 0，否則回傳需要等待的秒數"""
+        rate = self.rate_for(method, route)
+        if rate is None:
+            return 0
+        key = (client, method, route)
+        shard = self._shards[hash(key) % self.SHARDS]
+        now = self.clock()
+        with shard.lock:
+            bucket = shard.buckets.get(key)
+            if bucket is None:
+                bucket = shard.buckets[key] = [rate.burst, now, rate.burst / rate.per_second]
+            else:
+                shard.buckets.move_to_end(key)
+                bucket[0] = min(rate.burst, bucket[0] + (now - bucket[1]) * rate.per_second)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                wait = 0
+            else:
+                wait = (1 - bucket[0]) / rate.per_second
+            self._evict(shard, now)
+        # 再順便清理輪到的另一個分片，沒有流量落到的分片也不會留下閒置的 bucket；該分片忙碌時略過
+        self._sweep = (self._sweep + 1) % self.SHARDS
+        other = self._shards[self._sweep]
+        if other is not shard and other.lock.acquire(blocking=False):
+            try:
+                self._evict(other, now)
+            finally:
+                other.lock.release()
+        return wait
+
+    @staticmethod
+    def _evict(shard, now):
+        buckets = shard.buckets
+        while buckets:
+            key, (_, updated, full_after) = next(iter(buckets.items()))
+            if now - updated < full_after:
+                break
+            del buckets[key]
+
+    def __len__(self):
+        return sum(len(shard.buckets) for shard in self._shards)
+
+
+class ConcurrencyLimiter:
+    """進行中的請求超過 limit 時拒絕新的請求（limit 為 0 表示不限制）"""
+
+    def __init__(self, limit=0):
+        self.limit = limit
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            if self.limit and self.in_flight >= self.limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+def retry_after(seconds):
+    """Retry-After 標頭的整數秒數（至少 1）"""
+    return str(max(math.ceil(seconds), 1))
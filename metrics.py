@@ -0,0 +1,134 @@
+"""
+請求計時與計數，以 Prometheus 文字格式輸出
+
+每個執行緒寫入自己的分片（shard），記錄時不需要加鎖也不會互相覆蓋；輸出時才把所有分片加總。
+執行緒結束時分片的數值併入共用的累計分片後移除，每個連線一個執行緒的伺服器也不會讓分片無限增加。
+直方圖的 bucket 陣列在某個 endpoint 第一次出現時配置一次，之後每次記錄只是兩次整數加法。
+"""
+from bisect import bisect_left
+import threading
+import weakref
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _Shard:
+    __slots__ = ('latency', 'sizes', 'requests', 'errors')
+
+    def __init__(self):
+        self.latency = {}
+        self.sizes = {}
+        self.requests = {}
+        self.errors = {}
+
+
+class _Owner:
+    """放在 threading.local 中，執行緒結束時隨之回收，觸發分片的退役"""
+
+    __slots__ = ('__weakref__',)
+
+
+def _fold(target, source):
+    """把 source 的計數（直方圖為 list、計數為 int）加到 target"""
+    for key, value in source:
+        current = target.get(key)
+        if isinstance(value, list):
+            target[key] = list(value) if current is None else [a + b for a, b in zip(current, value)]
+        else:
+            target[key] = (current or 0) + value
+
+
+def _observe(histograms, key, bounds, value):
+    """histograms[key] 為 [各 bucket 次數..., +Inf 次數, 總和]"""
+    counts = histograms.get(key)
+    if counts is None:
+        counts = histograms[key] = [0] * (len(bounds) + 1) + [0]
+    counts[bisect_left(bounds, value)] += 1
+    counts[-1] += value
+
+
+def _labels(names, values, **extra):
+    pairs = [*zip(names, values), *extra.items()]
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Metrics:
+    def __init__(self, latency_buckets=LATENCY_BUCKETS, size_buckets=SIZE_BUCKETS):
+        self.latency_buckets = latency_buckets
+        self.size_buckets = size_buckets
+        self._local = threading.local()
+        self._shards = []
+        # 已結束的執行緒的分片併入這裡
+        self._retired = _Shard()
+        self._shards_lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            # 每個執行緒只在第一次記錄時登記一次分片，執行緒結束、thread-local 被清除時退役
+            shard = self._local.shard = _Shard()
+            self._local.owner = owner = _Owner()
+            with self._shards_lock:
+                self._shards.append(shard)
+            weakref.finalize(owner, self._retire, shard)
+        return shard
+
+    def _retire(self, shard):
+        with self._shards_lock:
+            self._shards.remove(shard)
+            for field in _Shard.__slots__:
+                _fold(getattr(self._retired, field), getattr(shard, field).items())
+
+    def observe(self, endpoint, method, status, seconds, size=None, error_code=None):
+        """記錄一個請求：延遲（秒）、回應大小（bytes，串流回應為 None）與錯誤代碼"""
+        shard = self._shard()
+        _observe(shard.latency, (endpoint, method), self.latency_buckets, seconds)
+        if size is not None:
+            _observe(shard.sizes, (endpoint, method), self.size_buckets, size)
+        key = (endpoint, method, status)
+        shard.requests[key] = shard.requests.get(key, 0) + 1
+        if error_code:
+            shard.errors[error_code] = shard.errors.get(error_code, 0) + 1
+
+    def _merge(self, field):
+        merged = {}
+        with self._shards_lock:
+            shards = list(self._shards)
+            _fold(merged, getattr(self._retired, field).items())
+        for shard in shards:
+            # list() 在 C 層一次複製，不會與寫入中的執行緒衝突
+            _fold(merged, list(getattr(shard, field).items()))
+        return merged
+
+    def _histogram_lines(self, name, help_text, field, bounds):
+        lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for key, counts in sorted(self._merge(field).items()):
+            cumulative = 0
+            for bound, count in zip((*bounds, '+Inf'), counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(("endpoint", "method"), key, le=bound)} {cumulative}')
+            lines.append(f'{name}_sum{_labels(("endpoint", "method"), key)} {counts[-1]}')
+            lines.append(f'{name}_count{_labels(("endpoint", "method"), key)} {cumulative}')
+        return lines
+
+    def render(self, gauges=()):
+        """輸出 Prometheus 文字格式，gauges 為 (名稱, 說明, 值) 列表"""
+        lines = self._histogram_lines('teams_api_request_duration_seconds', 'Request latency by endpoint',
+                                      'latency', self.latency_buckets)
+        lines += self._histogram_lines('teams_api_response_size_bytes', 'Response body size by endpoint',
+                                       'sizes', self.size_buckets)
+        lines += ['# HELP teams_api_requests_total Requests by endpoint, method and status',
+                  '# TYPE teams_api_requests_total counter']
+        for key, count in sorted(self._merge('requests').items()):
+            lines.append(f'teams_api_requests_total{_labels(("endpoint", "method", "status"), key)} {count}')
+        lines += ['# HELP teams_api_errors_total Error responses by errorCode',
+                  '# TYPE teams_api_errors_total counter']
+        for error_code, count in sorted(self._merge('errors').items()):
+            lines.append(f'teams_api_errors_total{_labels(("error_code",), (error_code,))} {count}')
+        for name, help_text, value in gauges:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {value}']
+        return '\n'.join(lines) + '\n'
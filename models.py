@@ -0,0 +1,227 @@
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from interning import member_names
+from serialization import RawJSON, encode, loads, pack_value
+import time
+import uuid
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def now_micros():
+    return time.time_ns() // 1000
+
+
+def format_micros(micros):
+    """epoch 微秒 → 與 datetime.utcnow().isoformat() 相同格式的字串"""
+    return (EPOCH + timedelta(microseconds=micros)).isoformat()
+
+
+def parse_micros(value):
+    """ISO 8601 字串 → epoch 微秒（有時區時先轉成 UTC）"""
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+class MemberConflict(Exception):
+    """成員操作衝突：新增已存在的成員（MEMBER_ALREADY_EXISTS）或移除不存在的成員（MEMBER_NOT_FOUND）"""
+
+    def __init__(self, error_code, member):
+        super().__init__(member)
+        self.error_code = error_code
+        self.member = member
+
+
+class Team:
+    """
+    團隊資料採精簡表示以降低大量團隊時的記憶體用量
+
+    uid 為 16 bytes 的 UUID、時間為 epoch 微秒整數、成員為共用名稱表（interning.member_names）中的編號陣列，
+    id / createdAt / updatedAt / members 等對外欄位只在需要時才轉換。
+    建立後不再修改，更新時以 revised() 產生新物件，可安全地在執行緒間共享。
+    """
+
+    __slots__ = ('uid', 'name', '_member_ids', 'created', 'updated', 'version', '_json', '_msgpack')
+
+    def __init__(self, name, members, team_id=None):
+        self._member_ids = member_names.intern(members)
+        # team_id 只在分片模式下由 router 指定（router 同樣以 uuid4 產生），一般情況在此產生
+        self.uid = uuid.UUID(team_id).bytes if team_id else uuid.uuid4().bytes
+        self.name = name
+        self.created = self.updated = now_micros()
+        self.version = 1
+        self._json = None
+        self._msgpack = None
+
+    def __del__(self):
+        # 物件回收時歸還成員名稱的參照，名稱不再被任何團隊使用時從名稱表移除
+        try:
+            member_ids = self._member_ids
+        except AttributeError:
+            return
+        member_names.release(member_ids)
+
+    @classmethod
+    def restore(cls, id, name, members, createdAt, updatedAt, version=1, encoded=None):
+        """由既有資料（例如資料庫的一列）重建團隊，保留原本的 id 與時間"""
+        team = cls.from_compact(uuid.UUID(id).bytes, name, members,
+                                parse_micros(createdAt), parse_micros(updatedAt), version)
+        team._json = encoded
+        team._msgpack = None
+        return team
+
+    @classmethod
+    def from_compact(cls, uid, name, members, created, updated, version):
+        """由精簡表示的欄位（例如快照與 WAL）直接重建團隊"""
+        return cls._build(uid, name, member_names.intern(members), created, updated, version)
+
+    @classmethod
+    def _build(cls, uid, name, member_ids, created, updated, version):
+        team = cls.__new__(cls)
+        team._member_ids = member_ids
+        team.uid = uid
+        team.name = name
+        team.created = created
+        team.updated = updated
+        team.version = version
+        team._json = None
+        team._msgpack = None
+        return team
+
+    @property
+    def id(self):
+        return str(uuid.UUID(bytes=self.uid))
+
+    @property
+    def members(self):
+        return member_names.names(self._member_ids)
+
+    @property
+    def member_ids(self):
+        """成員在共用名稱表中的編號（與 members 順序相同）"""
+        return self._member_ids
+
+    @property
+    def createdAt(self):
+        return format_micros(self.created)
+
+    @property
+    def updatedAt(self):
+        return format_micros(self.updated)
+
+    def revised(self, name=None, members=None):
+        """
+        回傳更新名稱或成員後的新團隊（None 表示不變），updatedAt 刷新、版本遞增
+
+        原物件不會被修改（copy-on-write），其他執行緒手上的團隊永遠是一致的快照；成員不變時共用同一組編號。
+        """
+        member_ids = member_names.retain(self._member_ids) if members is None else member_names.intern(members)
+        return Team._build(self.uid, self.name if name is None else name, member_ids,
+                           self.created, now_micros(), self.version + 1)
+
+    def patched_members(self, add=(), remove=()):
+        """
+        先移除再新增成員，回傳新的成員 tuple：未變動的成員原樣保留（包含既有的重複），新成員去重後接在最後
+
+        移除會刪掉該成員的所有出現位置；成員存在檢查以 set 做到 O(1)，複製成員建立新 tuple 仍是 O(團隊人數)。
+        新增已存在或移除不存在的成員時拋出 MemberConflict（add、remove 內的重複由呼叫端先檢查）
+        """
+        present = set(self.members)
+        for member in remove:
+            if member not in present:
+                raise MemberConflict('MEMBER_NOT_FOUND', member)
+        removed = set(remove)
+        members = [member for member in self.members if member not in removed] if removed else list(self.members)
+        present -= removed
+        for member in dict.fromkeys(add):
+            if member in present:
+                raise MemberConflict('MEMBER_ALREADY_EXISTS', member)
+            members.append(member)
+        return tuple(members)
+
+    @property
+    def etag(self):
+        return f"{self.id}.{self.version}"
+
+    @property
+    def last_modified(self):
+        return datetime.fromtimestamp(self.updated / 1_000_000, timezone.utc)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'members': list(self.members),
+            'createdAt': self.createdAt,
+            'updatedAt': self.updatedAt
+        }
+
+    def to_json(self):
+        """回傳快取的 JSON 編碼結果，團隊未變動前重複使用同一份 bytes"""
+        if self._json is None:
+            self._json = encode(self.to_dict())
+        return self._json
+
+    def to_msgpack(self):
+        """回傳快取的 MessagePack 編碼結果；由快取的 JSON 轉換，比重新呼叫 to_dict() 格式化時間快"""
+        if self._msgpack is None:
+            self._msgpack = pack_value(loads(self.to_json()))
+        return self._msgpack
+
+    def to_raw_json(self):
+        return RawJSON(self.to_json(), self.to_msgpack)
+
+
+TEAM_FIELDS = ('id', 'name', 'members', 'createdAt', 'updatedAt')
+
+# 各欄位的 JSON 編碼；id 與時間只含 ASCII 字元，直接加上引號即可
+FIELD_ENCODERS = {
+    'id': lambda team: b'"' + team.id.encode('ascii') + b'"',
+    'name': lambda team: encode(team.name),
+    'members': lambda team: encode(team.members),
+    'createdAt': lambda team: b'"' + team.createdAt.encode('ascii') + b'"',
+    'updatedAt': lambda team: b'"' + team.updatedAt.encode('ascii') + b'"',
+}
+
+
+def parse_fields(fields=''):
+    """
+    ?fields= 的原始字串 → 依 TEAM_FIELDS 順序排列的欄位 tuple，順序、空白或重複不同的字串得到相同結果
+
+    未指定或包含全部欄位時為空 tuple（完整團隊）；有未知欄位時拋出 ValueError
+    """
+    names = {name.strip() for name in fields.split(',')} - {''}
+    unknown = names - set(TEAM_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}. Allowed: {', '.join(TEAM_FIELDS)}")
+    if len(names) == len(TEAM_FIELDS):
+        return ()
+    return tuple(name for name in TEAM_FIELDS if name in names)
+
+
+# 以正規化後的欄位為鍵，最多 2^5 種組合，不會被客戶端變換順序或空白擠出快取
+@lru_cache(maxsize=None)
+def team_serializer(fields=()):
+    """
+    依 parse_fields() 的結果編譯只輸出指定欄位的序列化函式（team → RawJSON），相同欄位直接重用
+
+    空 tuple 時使用團隊快取的完整 JSON
+    """
+    if not fields:
+        return Team.to_raw_json
+
+    # 鍵名與分隔符號預先編碼好，每個團隊只需呼叫欄位的編碼函式再串接
+    parts = tuple((f'{"{" if i == 0 else ","}"{name}":'.encode('ascii'), FIELD_ENCODERS[name])
+                  for i, name in enumerate(fields))
+
+    def serialize(team):
+        chunks = []
+        for prefix, field_encoder in parts:
+            chunks.append(prefix)
+            chunks.append(field_encoder(team))
+        chunks.append(b'}')
+        return RawJSON(b''.join(chunks), lambda: pack_value({name: getattr(team, name) for name in fields}))
+
+    return serialize
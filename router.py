@@ -0,0 +1,526 @@
+"""
+分片模式的 router：依團隊 id 以一致性雜湊（sharding.py）把請求轉送到負責的分片，列表、搜尋與匯出同時查詢所有分片再合併
+
+    SHARDS=a=http://127.0.0.1:8081,b=http://127.0.0.1:8082 python router.py
+    python router.py --spawn 3        # 先在本機啟動 3 個分片行程（PORT+1 起的連接埠），再啟動 router
+
+分片就是一般的服務行程，需設定 TEAM_ID_HEADER=X-Team-Id（新團隊的 id 由 router 以 uuid4 產生後指定）與 AUTO_SEED=0。
+POST /admin/shards 可在運作中新增分片，只搬移改由新分片負責的團隊（約 1/(N+1)），搬移期間只有這些團隊暫停寫入。
+router 在記憶體中保存分片環與搬移狀態，只能以單一行程執行（以 THREADS 增加並行數）。
+"""
+import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import heapq
+from itertools import islice
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+from flask import Flask, Response, jsonify, request
+from flask_cors import CORS
+import requests
+
+from idempotency import IdempotencyCache, IdempotencyKeyInFlight, IdempotencyKeyReused, fingerprint
+from serialization import JSONProvider, create_api_response, encode_cursor, loads
+from sharding import HashRing, NoShardsConfigured, parse_shards
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+TEAM_ID_HEADER = 'X-Team-Id'
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_SEARCH_LIMIT = 20
+SORT_FIELDS = ('createdAt', 'updatedAt', 'name')
+MIGRATION_BATCH_SIZE = 1000
+DELETE_BATCH_SIZE = 5000
+
+FORWARD_REQUEST_HEADERS = ('Content-Type', 'Accept', 'If-Match', 'If-None-Match', 'If-Modified-Since', 'Idempotency-Key')
+FORWARD_RESPONSE_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Vary', 'Retry-After', 'Idempotent-Replayed')
+
+
+class ShardUnavailable(Exception):
+    """分片無法連線、逾時或回應錯誤"""
+
+
+class Rebalancing(Exception):
+    """團隊正在搬移到新分片，暫時不接受寫入"""
+
+
+class Shard:
+    """一個分片的網址與連線池"""
+
+    def __init__(self, name, url, timeout=10.0):
+        self.name = name
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=64)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method, path, **kwargs):
+        try:
+            return self.session.request(method, self.url + path, timeout=self.timeout, **kwargs)
+        except requests.RequestException as e:
+            raise ShardUnavailable(self.name) from e
+
+    def checked(self, method, path, **kwargs):
+        """發送請求，回應不是 2xx 時拋出 ShardUnavailable"""
+        response = self.request(method, path, **kwargs)
+        if not response.ok:
+            raise ShardUnavailable(f"{self.name} responded {response.status_code} to {method} {path}")
+        return response
+
+
+class Router:
+    """
+    分片環與搬移狀態
+
+    單一團隊的寫入在 writing() 內進行並計數；新增分片時先標記搬移中、等標記前就在進行的寫入全部完成，
+    之後改由新分片負責的團隊在搬移完成前拒絕寫入，其餘團隊照常讀寫。複製完成才替換環，再刪除來源分片上的舊資料；
+    替換前讀取仍由舊分片回應，列表與匯出只採用每個分片上歸屬於該分片的團隊，不會出現重複。
+    """
+
+    def __init__(self, shards, timeout=10.0):
+        self.timeout = timeout
+        self.shards = {name: Shard(name, url, timeout) for name, url in shards.items()}
+        self.ring = HashRing(self.shards)
+        self._migration = None
+        # 依開始時的世代計算進行中的寫入：搬移只需等待開始前就在進行的寫入，不會被之後持續進來的寫入拖住
+        self._epoch = 0
+        self._writes = Counter()
+        self._gate = threading.Condition()
+        self._admin_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=32)
+
+    def owner(self, team_id):
+        return self.shards[self.ring.node_for(team_id)]
+
+    def _moving(self, team_id):
+        old, new = self._migration
+        return old.node_for(team_id) != new.node_for(team_id)
+
+    @contextmanager
+    def writing(self, team_id=None):
+        """
+        寫入單一團隊期間持有，回傳 (負責的分片, team_id)；未指定 team_id 時以 uuid4 產生新團隊的 id
+
+        搬移中的團隊拋出 Rebalancing；新團隊的 id 會避開搬移中的範圍，不需要再搬移
+        """
+        with self._gate:
+            if team_id is None:
+                team_id = str(uuid.uuid4())
+                while self._migration is not None and self._moving(team_id):
+                    team_id = str(uuid.uuid4())
+            elif self._migration is not None and self._moving(team_id):
+                raise Rebalancing(team_id)
+            epoch = self._epoch
+            self._writes[epoch] += 1
+            shard = self.owner(team_id)
+        try:
+            yield shard, team_id
+        finally:
+            with self._gate:
+                self._writes[epoch] -= 1
+                if epoch != self._epoch:
+                    self._gate.notify_all()
+
+    def fan_out(self, path, params):
+        """同時對所有分片發送 GET，回傳 (環, [(分片, 回應)])；環為發送當下的快照，用來判斷團隊的歸屬"""
+        ring = self.ring
+        shards = [self.shards[name] for name in ring.nodes]
+        futures = [self._pool.submit(shard.request, 'GET', path, params=params, headers={'Accept': 'application/json'})
+                   for shard in shards]
+        return ring, [(shard, future.result()) for shard, future in zip(shards, futures)]
+
+    def add_shard(self, name, url):
+        """新增分片並搬移改由它負責的團隊，回傳搬移摘要；搬移失敗時環不變，已複製到新分片的資料會被刪除"""
+        with self._admin_lock:
+            if name in self.shards:
+                raise ValueError(f"Shard already exists: {name}")
+            target = Shard(name, url, self.timeout)
+            target.checked('GET', '/health')
+            started = time.perf_counter()
+            old, new = self.ring, self.ring.with_node(name)
+            with self._gate:
+                self._migration = (old, new)
+                self._epoch += 1
+                while self._writes[self._epoch - 1]:
+                    self._gate.wait()
+                del self._writes[self._epoch - 1]
+
+            moved = {}
+            try:
+                for source in old.nodes:
+                    moved[source] = self._copy(self.shards[source], target, new, moved)
+                self.shards[name] = target
+                self.ring = new
+            except BaseException:
+                self._delete(target, [team_id for team_ids in moved.values() for team_id in team_ids])
+                raise
+            finally:
+                with self._gate:
+                    self._migration = None
+
+            for source, team_ids in moved.items():
+                self._delete(self.shards[source], team_ids)
+            return {
+                'shard': name,
+                'moved': {source: len(team_ids) for source, team_ids in moved.items()},
+                'seconds': round(time.perf_counter() - started, 3),
+            }
+
+    def _copy(self, source, target, ring, moved):
+        """以匯出串流讀取 source 的所有團隊，把改由 target 負責的團隊分批匯入 target（保留 id 與時間）"""
+        team_ids = moved.setdefault(source.name, [])
+        lines = []
+        response = source.checked('GET', '/api/teams/export', stream=True)
+        with response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                team_id = loads(line)['id']
+                if ring.node_for(team_id) != target.name:
+                    continue
+                lines.append(line)
+                if len(lines) >= MIGRATION_BATCH_SIZE:
+                    self._import(target, lines, team_ids)
+        if lines:
+            self._import(target, lines, team_ids)
+        return team_ids
+
+    @staticmethod
+    def _import(target, lines, team_ids):
+        response = target.checked('POST', '/api/teams/import', data=b'\n'.join(lines),
+                                  headers={'Content-Type': 'application/x-ndjson'})
+        result = response.json()['data']
+        if result['failed']:
+            raise ShardUnavailable(f"{target.name} rejected {result['failed']} teams: {result['errors'][:3]}")
+        team_ids.extend(loads(line)['id'] for line in lines)
+        lines.clear()
+
+    @staticmethod
+    def _delete(shard, team_ids):
+        for start in range(0, len(team_ids), DELETE_BATCH_SIZE):
+            shard.checked('DELETE', '/api/teams:batch', json={'ids': team_ids[start:start + DELETE_BATCH_SIZE]})
+
+
+app = Flask(__name__)
+app.json = JSONProvider(app)
+
+CORS(app,
+     origins='*',
+     methods=['GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'],
+     allow_headers=['Content-Type', 'Authorization', 'If-Match', 'If-None-Match', 'If-Modified-Since', 'Idempotency-Key'],
+     expose_headers=['ETag', 'Last-Modified', 'Idempotent-Replayed'])
+
+router = Router(parse_shards(os.environ.get('SHARDS', '')), timeout=float(os.environ.get('SHARD_TIMEOUT', 10)))
+# 帶 Idempotency-Key 的新增請求：第一次由 router 以 uuid4 產生團隊 id，成功建立後與請求本文的雜湊一起保存，
+# 重試沿用同一個 id，一定送到同一個分片，由該分片重播第一次的回應
+idempotent_ids = IdempotencyCache(int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', 10000)),
+                                  float(os.environ.get('IDEMPOTENCY_TTL', 86400)),
+                                  float(os.environ.get('IDEMPOTENCY_WAIT', 10)))
+
+
+def error_response(status, error_code, message):
+    return jsonify(create_api_response(result=False, error_code=error_code, message=message)), status
+
+
+@app.errorhandler(ShardUnavailable)
+def shard_unavailable(error):
+    return error_response(503, "SHARD_UNAVAILABLE", f"Shard unavailable: {error}")
+
+
+@app.errorhandler(NoShardsConfigured)
+def no_shards(error):
+    return error_response(503, "SHARD_UNAVAILABLE", "No shards are configured")
+
+
+@app.errorhandler(Rebalancing)
+def rebalancing(error):
+    response, status = error_response(503, "SHARD_REBALANCING", "Team is being moved to a new shard, retry shortly")
+    response.headers['Retry-After'] = '1'
+    return response, status
+
+
+def proxy(shard, method, path, extra_headers=None):
+    """把目前的請求原樣轉送到分片，回傳分片的回應"""
+    headers = {name: request.headers[name] for name in FORWARD_REQUEST_HEADERS if name in request.headers}
+    headers['X-Forwarded-For'] = request.remote_addr or ''
+    headers.update(extra_headers or {})
+    response = shard.request(method, path, params=request.args, data=request.get_data(), headers=headers)
+    return relay(response)
+
+
+def relay(response):
+    headers = {name: response.headers[name] for name in FORWARD_RESPONSE_HEADERS if name in response.headers}
+    return Response(response.content, status=response.status_code, headers=headers)
+
+
+def owned(ring, shard, items, team_id=lambda item: item['id']):
+    """只保留歸屬於該分片的項目；搬移期間分片上可能暫時有已複製到新分片的團隊"""
+    return [item for item in items if ring.node_for(team_id(item)) == shard.name]
+
+
+def merge_pages(path, params):
+    """對所有分片發送相同的查詢；任一分片回應錯誤時回傳 (None, 該錯誤回應)，否則回傳 (環, [(分片, data)])"""
+    ring, results = router.fan_out(path, params)
+    pages = []
+    for shard, response in results:
+        if response.status_code != 200:
+            return None, relay(response)
+        pages.append((shard, loads(response.content)['data']))
+    return ring, pages
+
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    _, results = router.fan_out('/health', None)
+    shards = {shard.name: {'url': shard.url, 'healthy': response.ok} for shard, response in results}
+    healthy = all(shard['healthy'] for shard in shards.values())
+    return jsonify(create_api_response(result=healthy, error_code="" if healthy else "SHARD_UNAVAILABLE",
+                                       message="Service is healthy" if healthy else "Some shards are unavailable",
+                                       data={'shards': shards})), 200 if healthy else 503
+
+
+@app.route('/api/teams', methods=['GET'])
+def get_teams():
+    """
+    所有分片以相同的條件與游標各取一頁，依排序鍵（欄位值, id）合併後取前 limit 筆
+
+    游標為「最後一筆的欄位值與 id」，與分片本身的游標格式相同，因此同一個游標可以直接傳給每個分片
+    """
+    try:
+        params = request.args.to_dict()
+        sort = params.get('sort', 'createdAt')
+        requested = {name.strip() for name in params.get('fields', '').split(',')} - {''}
+        if requested and sort in SORT_FIELDS:
+            # 合併需要排序欄位與 id，回應前再移除未要求的欄位
+            params['fields'] = ','.join(requested | {'id', sort})
+
+        ring, pages = merge_pages('/api/teams', params)
+        if ring is None:
+            return pages
+        teams = [owned(ring, shard, data['teams']) for shard, data in pages]
+        limit = int(params.get('limit', DEFAULT_PAGE_SIZE))
+        merged = list(islice(heapq.merge(*teams, key=lambda team: (team[sort], team['id']),
+                                         reverse=params.get('order') == 'desc'), limit))
+        has_more = any(data['nextCursor'] for _, data in pages) or sum(map(len, teams)) > len(merged)
+        next_cursor = encode_cursor(sort, [merged[-1][sort], merged[-1]['id']]) if merged and has_more else None
+        if requested:
+            merged = [{name: value for name, value in team.items() if name in requested} for team in merged]
+        data = {
+            'teams': merged,
+            'total': sum(data['total'] for _, data in pages),
+            'nextCursor': next_cursor
+        }
+        return jsonify(create_api_response(message="Teams retrieved successfully", data=data))
+    except ShardUnavailable:
+        raise
+    except Exception as e:
+        return error_response(500, "GET_TEAMS_ERROR", str(e))
+
+
+@app.route('/api/teams/search', methods=['GET'])
+def search_teams():
+    try:
+        ring, pages = merge_pages('/api/teams/search', request.args)
+        if ring is None:
+            return pages
+        results = [result for shard, data in pages
+                   for result in owned(ring, shard, data['results'], lambda result: result['team']['id'])]
+        limit = int(request.args.get('limit', DEFAULT_SEARCH_LIMIT))
+        results = heapq.nlargest(limit, results, key=lambda result: result['score'])
+        data = {
+            'results': results,
+            'total': len(results),
+            'truncated': any(data['truncated'] for _, data in pages)
+        }
+        return jsonify(create_api_response(message="Teams searched successfully", data=data))
+    except ShardUnavailable:
+        raise
+    except Exception as e:
+        return error_response(500, "SEARCH_TEAMS_ERROR", str(e))
+
+
+@app.route('/api/teams/stats', methods=['GET'])
+def get_team_stats():
+    """各分片的統計相加；同一位成員可能出現在多個分片，不重複成員數無法相加，回應 null"""
+    try:
+        ring, pages = merge_pages('/api/teams/stats', None)
+        if ring is None:
+            return pages
+        teams = sum(data['teams'] for _, data in pages)
+        members = sum(data['members'] for _, data in pages)
+        team_sizes = [{**bucket, 'teams': sum(data['teamSizes'][i]['teams'] for _, data in pages)}
+                      for i, bucket in enumerate(pages[0][1]['teamSizes'])] if pages else []
+        data = {
+            'teams': teams,
+            'members': members,
+            'distinctMembers': None,
+            'averageTeamSize': round(members / teams, 2) if teams else 0,
+            'teamSizes': team_sizes
+        }
+        return jsonify(create_api_response(message="Team statistics retrieved successfully", data=data))
+    except ShardUnavailable:
+        raise
+    except Exception as e:
+        return error_response(500, "GET_TEAM_STATS_ERROR", str(e))
+
+
+@app.route('/api/teams/export', methods=['GET'])
+def export_teams():
+    ring = router.ring
+    shards = [router.shards[name] for name in ring.nodes]
+
+    def generate():
+        # 依序串接每個分片的匯出串流，只輸出歸屬於該分片的團隊
+        for shard in shards:
+            with shard.checked('GET', '/api/teams/export', stream=True) as response:
+                for line in response.iter_lines():
+                    if line and ring.node_for(loads(line)['id']) == shard.name:
+                        yield line + b'\n'
+
+    return Response(generate(), mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': 'attachment; filename="teams.ndjson"'})
+
+
+@app.route('/api/teams/import', methods=['POST'])
+@app.route('/api/teams/changes', methods=['GET'])
+@app.route('/api/teams:batch', methods=['POST', 'PUT', 'DELETE'])
+def not_supported():
+    return error_response(501, "NOT_SUPPORTED_IN_SHARDED_MODE", "This endpoint is not available through the shard router")
+
+
+@app.route('/api/teams', methods=['POST'])
+def create_team():
+    key = request.headers.get('Idempotency-Key')
+    if not key:
+        return insert_team(None)[1]
+
+    # 只保存成功建立（201）的 id；失敗的請求可以用同一個鍵修正本文後重送
+    first = {}
+
+    def execute():
+        team_id, first['response'] = insert_team(None)
+        return team_id
+
+    try:
+        team_id, replayed = idempotent_ids.run(key, fingerprint(request.get_data()), execute,
+                                               lambda _: first['response'].status_code == 201)
+    except IdempotencyKeyReused:
+        return error_response(422, "IDEMPOTENCY_KEY_REUSED", "Idempotency-Key was already used with a different request body")
+    except IdempotencyKeyInFlight:
+        response, status = error_response(409, "IDEMPOTENCY_KEY_IN_USE", "A request with this Idempotency-Key is still in progress")
+        response.headers['Retry-After'] = '1'
+        return response, status
+    if not replayed:
+        return first['response']
+    return insert_team(team_id)[1]
+
+
+def insert_team(team_id):
+    """新增團隊轉送到負責的分片，回傳 (team_id, 回應)；team_id 為 None 時產生新的 id"""
+    with router.writing(team_id) as (shard, team_id):
+        return team_id, proxy(shard, 'POST', '/api/teams', {TEAM_ID_HEADER: team_id})
+
+
+@app.route('/api/teams/<team_id>', methods=['GET'])
+def get_team(team_id):
+    return proxy(router.owner(team_id), 'GET', f'/api/teams/{team_id}')
+
+
+@app.route('/api/teams/<team_id>', methods=['PUT', 'DELETE'])
+def write_team(team_id):
+    with router.writing(team_id) as (shard, _):
+        return proxy(shard, request.method, f'/api/teams/{team_id}')
+
+
+@app.route('/api/teams/<team_id>/members', methods=['PATCH'])
+def patch_team_members(team_id):
+    with router.writing(team_id) as (shard, _):
+        return proxy(shard, 'PATCH', f'/api/teams/{team_id}/members')
+
+
+@app.route('/admin/shards', methods=['GET'])
+def list_shards():
+    _, results = router.fan_out('/api/teams', {'limit': 1, 'fields': 'id'})
+    shards = [{'name': shard.name, 'url': shard.url,
+               'teams': loads(response.content)['data']['total'] if response.ok else None}
+              for shard, response in results]
+    return jsonify(create_api_response(message="Shards retrieved successfully", data={'shards': shards}))
+
+
+@app.route('/admin/shards', methods=['POST'])
+def add_shard():
+    data = request.get_json(silent=True)
+    url = data.get('url') if isinstance(data, dict) else None
+    if not isinstance(url, str) or not url.startswith(('http://', 'https://')):
+        return error_response(400, "INVALID_SHARD", "url must be an http(s) URL")
+    url = url.rstrip('/')
+    name = data.get('name') or url
+    if name in router.shards:
+        return error_response(409, "SHARD_ALREADY_EXISTS", f"Shard already exists: {name}")
+    try:
+        summary = router.add_shard(name, url)
+    except ShardUnavailable:
+        raise
+    except Exception as e:
+        return error_response(500, "ADD_SHARD_ERROR", str(e))
+    return jsonify(create_api_response(message="Shard added and rebalanced", data=summary))
+
+
+def spawn_shard(port, env=None):
+    """在本機啟動一個分片行程（記憶體儲存、不填入範例資料），回傳 (行程, 網址)"""
+    env = {**os.environ, 'SERVER_MODE': 'wsgi', 'STORAGE_BACKEND': 'memory', 'SWAGGER_MODE': 'off',
+           'TEAM_ID_HEADER': TEAM_ID_HEADER, 'AUTO_SEED': '0', **(env or {}), 'PORT': str(port)}
+    for name in ('DATA_DIR', 'SHARDS', 'RATE_LIMIT', 'RATE_LIMIT_ROUTES'):
+        env.pop(name, None)
+    process = subprocess.Popen([sys.executable, 'serve.py'], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f'{url}/health', timeout=1).ok:
+                return process, url
+        except requests.ConnectionError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError(f"shard on port {port} did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--spawn', type=int, default=0, help='先在本機啟動 N 個分片行程')
+    args = parser.parse_args()
+
+    port = int(os.environ.get('PORT', 8080))
+    processes = []
+    try:
+        if args.spawn:
+            shards = []
+            for i in range(args.spawn):
+                process, url = spawn_shard(port + 1 + i)
+                processes.append(process)
+                shards.append(f'shard-{i + 1}={url}')
+                print(f"✅ 分片 shard-{i + 1} 啟動於 {url}")
+            os.environ['SHARDS'] = ','.join(shards)
+        if not os.environ.get('SHARDS'):
+            raise SystemExit("❌ 請以 SHARDS 設定分片，或以 --spawn N 在本機啟動分片")
+
+        from serve import Server, build_options
+        Server(*build_options({**os.environ, 'SERVER_MODE': 'router'})).run()
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=30)
+
+
+if __name__ == '__main__':
+    main()
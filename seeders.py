@@ -0,0 +1,60 @@
+"""
+產生範例團隊資料，並透過批次 API 填入執行中的服務
+
+    python seeders.py                                     # 填入 1000 筆到 http://localhost:8080
+    python seeders.py --count 100000 --url http://localhost:8080
+"""
+import argparse
+import random
+
+# 服務啟動且沒有資料時由 auto_seed_data() 建立的範例團隊
+SAMPLE_TEAMS = [
+    {"name": "前端開發團隊", "members": ["張三", "李四", "王五"]},
+    {"name": "後端開發團隊", "members": ["趙六", "錢七", "孫八"]},
+    {"name": "UI/UX 設計團隊", "members": ["周九", "吳十"]},
+    {"name": "DevOps 團隊", "members": ["鄭十一", "王十二", "馮十三"]},
+    {"name": "產品管理團隊", "members": ["陳十四", "褚十五"]}
+]
+
+FIRST_NAMES = '張李王趙錢孫周吳鄭馮陳褚衛蔣沈韓楊朱秦尤許何呂施'
+LAST_NAMES = ['三', '四', '五', '六', '七', '八', '九', '十', '小明', '小華', '小美', '小強']
+
+
+def generate_teams(count, seed=42, start=0):
+    """產生 count 筆 {'name', 'members'}，相同的 seed 會得到相同的資料"""
+    rng = random.Random(seed + start)
+    return [
+        {'name': f"團隊 {i:06d}",
+         'members': [rng.choice(FIRST_NAMES) + rng.choice(LAST_NAMES) for _ in range(rng.randint(2, 12))]}
+        for i in range(start, start + count)
+    ]
+
+
+def seed(url, count, batch_size=1000, session=None):
+    """以 POST /api/teams:batch 分批建立團隊，回傳新團隊的 id"""
+    # app 只用到 SAMPLE_TEAMS，requests 延到實際填入時才載入，不增加服務的啟動時間
+    import requests
+    session = session or requests.Session()
+    ids = []
+    for start in range(0, count, batch_size):
+        teams = generate_teams(min(batch_size, count - start), start=start)
+        response = session.post(f"{url.rstrip('/')}/api/teams:batch", json={'teams': teams})
+        response.raise_for_status()
+        ids.extend(item['team']['id'] for item in response.json()['data']['results'])
+    return ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:8080')
+    parser.add_argument('--count', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"🌱 填入 {args.count} 筆團隊到 {args.url}")
+    ids = seed(args.url, args.count, args.batch_size)
+    print(f"✅ 建立 {len(ids)} 筆資料")
+
+
+if __name__ == '__main__':
+    main()
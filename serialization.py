@@ -0,0 +1,205 @@
+"""
+回應編碼：JSON 在安裝 orjson 時使用 orjson，否則使用標準函式庫；安裝 msgpack 時另外依 Accept 提供 application/msgpack
+
+    pip install orjson msgpack   # 選用
+"""
+from flask import current_app, g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+import base64
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+# 客戶端的 q 值相同（例如 */*）時以 JSON 優先
+MIMETYPES = (JSON_MIMETYPE, MSGPACK_MIMETYPE) if msgpack is not None else (JSON_MIMETYPE,)
+
+
+class RawJSON:
+    """
+    已編碼好的 JSON 片段，輸出時原樣拼接，不再重新序列化
+
+    packed 為回傳同一份內容 MessagePack 編碼的函式（例如團隊快取的 bytes），MessagePack 回應直接拼接，不必解碼 JSON
+    """
+
+    __slots__ = ('encoded', 'packed')
+
+    def __init__(self, encoded, packed=None):
+        self.encoded = encoded
+        self.packed = packed
+
+
+def create_api_response(result=True, error_code="", message="", data=None):
+    if error_code and has_request_context():
+        # 供 /metrics 依 errorCode 統計錯誤
+        g.error_code = error_code
+    return {
+        'result': result,
+        'errorCode': error_code,
+        'message': message,
+        'data': data
+    }
+
+
+def encode_cursor(sort, key):
+    raw = _stdlib_encode([sort, *key])
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(cursor, sort):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, *key = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort:
+        raise ValueError("Cursor does not match the requested sort")
+    return key
+
+
+def _stdlib_encode(obj):
+    text = json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+    try:
+        return text.encode('utf-8')
+    except UnicodeEncodeError:
+        # 單獨的 surrogate 無法以 UTF-8 輸出，改以 \uXXXX 跳脫（與 jsonify 預設的輸出相同）
+        return json.dumps(obj, separators=(',', ':')).encode('ascii')
+
+
+if orjson is not None:
+    def encode(obj):
+        try:
+            return orjson.dumps(obj)
+        except orjson.JSONEncodeError:
+            # 超過 64 位元的整數等 orjson 不支援的值，交給標準函式庫處理
+            return _stdlib_encode(obj)
+
+    loads = orjson.loads
+else:
+    encode = _stdlib_encode
+    loads = json.loads
+
+
+if orjson is not None and hasattr(orjson, 'Fragment'):
+    # orjson 3.9 起可直接嵌入已編碼的片段，整個結構一次在 C 層編碼完成
+    def _fragment(obj):
+        if isinstance(obj, RawJSON):
+            return orjson.Fragment(obj.encoded)
+        raise TypeError
+
+    def dumps(obj):
+        """將含有 RawJSON 片段的回應結構編碼為 bytes"""
+        return orjson.dumps(obj, default=_fragment)
+else:
+    def dumps(obj):
+        """將含有 RawJSON 片段的回應結構編碼為 bytes"""
+        if isinstance(obj, RawJSON):
+            return obj.encoded
+        if isinstance(obj, dict):
+            return b'{' + b','.join(encode(str(key)) + b':' + dumps(value) for key, value in obj.items()) + b'}'
+        if isinstance(obj, (list, tuple)):
+            return b'[' + b','.join(dumps(item) for item in obj) + b']'
+        return encode(obj)
+
+
+def pack_value(value):
+    return msgpack.packb(value)
+
+
+def pack(obj):
+    """以 MessagePack 編碼含有 RawJSON 片段的回應結構：外層逐一打包，片段直接拼接各自的 MessagePack bytes"""
+    chunks = []
+    _pack_into(obj, msgpack.Packer(), chunks)
+    return b''.join(chunks)
+
+
+def _pack_into(obj, packer, chunks):
+    if isinstance(obj, RawJSON):
+        chunks.append(obj.packed() if obj.packed is not None else packer.pack(loads(obj.encoded)))
+    elif isinstance(obj, dict):
+        chunks.append(packer.pack_map_header(len(obj)))
+        for key, value in obj.items():
+            chunks.append(packer.pack(key))
+            _pack_into(value, packer, chunks)
+    elif isinstance(obj, (list, tuple)):
+        chunks.append(packer.pack_array_header(len(obj)))
+        for item in obj:
+            _pack_into(item, packer, chunks)
+    else:
+        chunks.append(packer.pack(obj))
+
+
+def negotiate():
+    """依請求的 Accept 選擇回應格式，沒有 Accept 或不接受任何支援的格式時使用 JSON"""
+    if len(MIMETYPES) == 1 or not has_request_context():
+        return JSON_MIMETYPE
+    return request.accept_mimetypes.best_match(MIMETYPES, default=JSON_MIMETYPE)
+
+
+def negotiated_response(body, mimetype, status=200):
+    response = current_app.response_class(body, status=status, mimetype=mimetype)
+    if len(MIMETYPES) > 1:
+        response.vary.add('Accept')
+    return response
+
+
+def render(payload, mimetype):
+    return pack(payload) if mimetype == MSGPACK_MIMETYPE else dumps(payload)
+
+
+def json_response(payload, status=200):
+    """含有 RawJSON 片段的回應，依 Accept 編碼為 JSON 或 MessagePack"""
+    mimetype = negotiate()
+    return negotiated_response(render(payload, mimetype), mimetype, status)
+
+
+class JSONProvider(DefaultJSONProvider):
+    """
+    Flask 的 JSON provider：jsonify 與 request.get_json() 在安裝 orjson 時改用 orjson，
+    jsonify 的回應同樣依 Accept 協商 MessagePack
+
+    輸出格式與預設 provider 相同（鍵排序、結尾換行、debug 時縮排），只是非 ASCII 字元直接以 UTF-8 輸出。
+    """
+
+    def _orjson_options(self, indent=False):
+        options = orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._orjson_options()).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            # orjson 拒絕標準函式庫接受的輸入（例如單獨的 surrogate \ud800），交給標準函式庫解析，由路由的驗證回應 400
+            return super().loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        mimetype = negotiate()
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        if mimetype == MSGPACK_MIMETYPE:
+            body = msgpack.packb(obj, default=self.default)
+        elif orjson is not None:
+            body = orjson.dumps(obj, default=self.default, option=self._orjson_options(indent)) + b'\n'
+        else:
+            body = super().dumps(obj, **({'indent': 2} if indent else {'separators': (',', ':')})) + '\n'
+        return negotiated_response(body, mimetype)
@@ -0,0 +1,106 @@
+"""
+正式環境的服務入口：以 gunicorn 啟動 worker 行程與執行緒，取代 app.run() 的開發伺服器
+
+    python serve.py                                  # WSGI，gthread worker
+    SERVER_MODE=asgi python serve.py                 # ASGI，uvicorn worker（需安裝 uvicorn 與 a2wsgi）
+    SERVER_MODE=router SHARDS=... python serve.py    # 分片 router（router.py），固定單一 worker 行程
+    STORAGE_BACKEND=sqlite WEB_CONCURRENCY=4 python serve.py
+
+對主行程送出 SIGHUP 會平滑重啟：先啟動新的 worker，舊的 worker 處理完進行中的請求後才結束。
+"""
+import multiprocessing
+import os
+
+from gunicorn.app.base import BaseApplication
+
+APPLICATIONS = {
+    'wsgi': 'app:app',
+    'asgi': 'asgi:application',
+    'router': 'router:app',
+}
+
+
+def post_worker_init(worker):
+    from app import STORAGE_BACKEND, auto_seed_data
+    # 記憶體儲存每個 worker 各自一份；共用的 SQLite 只由第一個 worker 填入範例資料
+    if STORAGE_BACKEND == 'memory' or worker.age == 1:
+        auto_seed_data()
+
+
+def worker_exit(server, worker):
+    # 關閉儲存：WAL 做最後一次 fsync 並釋放資料目錄的檔案鎖，讓新的 worker 可以接手
+    from app import store
+    close = getattr(store, 'close', None)
+    if close is not None:
+        close()
+
+
+def build_options(environ=os.environ):
+    mode = environ.get('SERVER_MODE', 'wsgi')
+    if mode not in APPLICATIONS:
+        raise SystemExit(f"❌ SERVER_MODE 必須是 {' 或 '.join(APPLICATIONS)}")
+
+    if mode == 'router':
+        return APPLICATIONS[mode], router_options(environ)
+
+    backend = environ.get('STORAGE_BACKEND', 'memory')
+    default_workers = 1 if backend == 'memory' else multiprocessing.cpu_count() * 2 + 1
+    workers = int(environ.get('WEB_CONCURRENCY', default_workers))
+    if backend == 'memory' and workers > 1:
+        raise SystemExit("❌ 記憶體儲存無法在多個 worker 行程間共享，請以 THREADS 增加並行數或改用 STORAGE_BACKEND=sqlite")
+
+    options = {
+        'bind': f"0.0.0.0:{environ.get('PORT', 8080)}",
+        'workers': workers,
+        'threads': int(environ.get('THREADS', 8)),
+        'worker_class': 'gthread' if mode == 'wsgi' else 'uvicorn.workers.UvicornWorker',
+        'keepalive': int(environ.get('KEEPALIVE', 5)),
+        'timeout': int(environ.get('TIMEOUT', 30)),
+        'graceful_timeout': int(environ.get('GRACEFUL_TIMEOUT', 30)),
+        'max_requests': int(environ.get('MAX_REQUESTS', 0)),
+        'max_requests_jitter': int(environ.get('MAX_REQUESTS_JITTER', 0)),
+        'accesslog': environ.get('ACCESS_LOG') or None,
+        'pidfile': environ.get('PIDFILE') or None,
+        'post_worker_init': post_worker_init,
+        'worker_exit': worker_exit,
+    }
+    return APPLICATIONS[mode], options
+
+
+def router_options(environ):
+    # 分片環與搬移狀態保存在 router 行程的記憶體中，只能有一個 worker；router 沒有儲存，不需要 worker 的 hook
+    if int(environ.get('WEB_CONCURRENCY', 1)) != 1:
+        raise SystemExit("❌ router 只能以單一 worker 行程執行，請以 THREADS 增加並行數")
+    return {
+        'bind': f"0.0.0.0:{environ.get('PORT', 8080)}",
+        'workers': 1,
+        'threads': int(environ.get('THREADS', 32)),
+        'worker_class': 'gthread',
+        'keepalive': int(environ.get('KEEPALIVE', 5)),
+        'timeout': int(environ.get('TIMEOUT', 30)),
+        'graceful_timeout': int(environ.get('GRACEFUL_TIMEOUT', 30)),
+        'accesslog': environ.get('ACCESS_LOG') or None,
+        'pidfile': environ.get('PIDFILE') or None,
+    }
+
+
+class Server(BaseApplication):
+    """以程式設定啟動 gunicorn，不需要額外的設定檔"""
+
+    def __init__(self, application, options):
+        self.application = application
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # 在 worker 行程內才匯入應用程式，每個 worker 各自建立儲存與背景執行緒
+        from gunicorn.util import import_app
+        return import_app(self.application)
+
+
+if __name__ == '__main__':
+    Server(*build_options()).run()
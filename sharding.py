@@ -0,0 +1,71 @@
+"""
+一致性雜湊（consistent hashing）：把團隊 id 對應到分片
+
+每個分片在環上放 VNODES 個虛擬節點，團隊 id 的雜湊值落在順時針方向遇到的第一個虛擬節點所屬的分片。
+新增一個分片時只有約 1/(N+1) 的團隊改由新分片負責，而且只會從既有分片搬到新分片，其餘團隊的位置不變。
+分片以名稱放上環，更換分片的網址不影響團隊的歸屬。
+"""
+import bisect
+import hashlib
+import uuid
+
+VNODES = 160
+
+
+def parse_shards(text):
+    """解析 SHARDS：以逗號分隔，每項為「名稱=網址」或只有網址（名稱即網址），回傳 {名稱: 網址}"""
+    shards = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        name, separator, url = item.partition('=')
+        if not separator:
+            name = url = item
+        name, url = name.strip(), url.strip().rstrip('/')
+        if not url.startswith(('http://', 'https://')) or name in shards:
+            raise ValueError(f"Invalid shard: {item}")
+        shards[name] = url
+    return shards
+
+
+def _position(key):
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'big')
+
+
+def team_key(team_id):
+    """團隊 id 的雜湊鍵：UUID 以 16 bytes 表示（不受大小寫與格式影響），其他字串以 UTF-8 表示"""
+    try:
+        return uuid.UUID(team_id).bytes
+    except ValueError:
+        return team_id.encode('utf-8')
+
+
+class NoShardsConfigured(Exception):
+    """雜湊環上沒有任何分片，無法決定團隊的歸屬"""
+
+
+class HashRing:
+    """
+    不可變的雜湊環，新增分片時以 with_node() 產生新的環
+
+    router 保存目前的環，搬移時同時持有新舊兩個環比較團隊的歸屬，完成後整個替換即可，查詢不需加鎖。
+    """
+
+    def __init__(self, nodes=(), vnodes=VNODES):
+        self.vnodes = vnodes
+        self.nodes = tuple(nodes)
+        if len(set(self.nodes)) != len(self.nodes):
+            raise ValueError("Shard names must be unique")
+        self._points = sorted((_position(f'{node}#{i}'.encode('utf-8')), node)
+                              for node in self.nodes for i in range(vnodes))
+        self._positions = [position for position, _ in self._points]
+
+    def with_node(self, node):
+        return HashRing((*self.nodes, node), self.vnodes)
+
+    def node_for(self, team_id):
+        if not self._points:
+            raise NoShardsConfigured("The ring has no shards")
+        index = bisect.bisect(self._positions, _position(team_key(team_id))) % len(self._points)
+        return self._points[index][1]
+
+    def __len__(self):
+        return len(self.nodes)
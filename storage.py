@@ -0,0 +1,967 @@
+from collections import namedtuple
+from contextlib import ExitStack, contextmanager, nullcontext
+from datetime import datetime, timezone
+from itertools import islice
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from indexes import (SIZE_BUCKETS, SortedIndex, InvertedIndex, NGramIndex, TeamStats, normalize_name, prefix_bounds,
+                     size_bucket, size_histogram, substring_score)
+from models import Team, parse_micros
+import wal
+
+SORT_FIELDS = ('createdAt', 'updatedAt', 'name')
+
+# 搜尋結果：matched 為符合的團隊名稱或成員名稱，field 為 name 或 members
+SearchHit = namedtuple('SearchHit', 'score field matched team')
+# 成員名稱符合時的分數權重，同分時名稱符合排在前面
+MEMBER_WEIGHT = 0.9
+
+# 統計：members 為各團隊成員數的總和（同一團隊重複的成員算一次），team_sizes 為 [(最少人數, 最多人數, 團隊數)]
+Stats = namedtuple('Stats', 'teams members distinct_members team_sizes')
+
+
+class VersionConflict(Exception):
+    """帶有 expected_version 的更新或刪除時，團隊版本已被其他請求改變"""
+
+
+class TeamNotFound(Exception):
+    """批次操作中有團隊不存在，整批操作不會生效"""
+
+
+class TeamExists(Exception):
+    """新增的團隊 id 已存在（或在同一批中重複），整批新增不會生效"""
+
+
+class TeamStore:
+    """儲存後端介面，路由只透過這些方法存取團隊資料"""
+
+    _listeners = ()
+
+    def add_listener(self, listener):
+        """
+        註冊變動通知 listener(event, team_id, team)：event 為 created、updated 或 deleted，刪除時 team 為 None
+
+        通知在寫入仍持有鎖時同步呼叫，通知順序與實際套用的順序一致；listener 應盡快返回且不可再寫入儲存
+        """
+        self._listeners = (*self._listeners, listener)
+
+    def _notify(self, event, team_id, team=None):
+        for listener in self._listeners:
+            listener(event, team_id, team)
+
+    def get(self, team_id):
+        raise NotImplementedError
+
+    def add(self, team):
+        """新增團隊，id 已存在時拋出 TeamExists"""
+        raise NotImplementedError
+
+    def update(self, team_id, name=None, members=None, expected_version=None):
+        """
+        更新名稱或成員（None 表示不變）並刷新 updatedAt，找不到時回傳 None
+
+        指定 expected_version 時若目前版本不同會拋出 VersionConflict
+        """
+        raise NotImplementedError
+
+    def update_members(self, team_id, add=(), remove=(), expected_version=None):
+        """
+        先移除再新增成員並刷新 updatedAt，找不到時回傳 None
+
+        新增已存在或移除不存在的成員時拋出 MemberConflict，整個操作不生效；
+        指定 expected_version 時若目前版本不同會拋出 VersionConflict
+        """
+        raise NotImplementedError
+
+    def delete(self, team_id, expected_version=None):
+        """刪除團隊，回傳是否存在"""
+        raise NotImplementedError
+
+    def add_many(self, teams):
+        """一次新增多個團隊，任一 id 已存在或重複時拋出 TeamExists，整批不生效"""
+        raise NotImplementedError
+
+    def update_many(self, changes):
+        """
+        一次更新多個團隊，changes 為 (team_id, name, members) 列表，回傳更新後的團隊
+
+        任一團隊不存在時拋出 TeamNotFound，整批不生效
+        """
+        raise NotImplementedError
+
+    def delete_many(self, team_ids):
+        """一次刪除多個團隊，任一團隊不存在時拋出 TeamNotFound，整批不生效"""
+        raise NotImplementedError
+
+    def count(self):
+        raise NotImplementedError
+
+    def version(self):
+        """整個儲存的版本字串，任何新增、更新、刪除後都會改變"""
+        raise NotImplementedError
+
+    def last_modified(self):
+        """最後一次變動的時間（UTC），尚未變動過時為 None"""
+        raise NotImplementedError
+
+    def cursor_key(self, team, sort):
+        """團隊在 sort 排序下的游標鍵（可 JSON 序列化的 list），作為下一頁查詢的 after"""
+        raise NotImplementedError
+
+    def query(self, sort='createdAt', reverse=False, after=None, limit=100,
+              name_prefix='', name=None, member=None):
+        """
+        依條件取得一頁團隊，回傳 (teams, total)
+
+        after 為上一頁最後一筆的 cursor_key，格式不符時拋出 ValueError；
+        total 為符合條件（不含游標）的總數
+        """
+        raise NotImplementedError
+
+    def search(self, query, limit=20):
+        """
+        依團隊名稱與成員名稱搜尋，回傳 (hits, truncated)
+
+        hits 為依分數由高到低排序的 SearchHit，每個團隊最多一筆；
+        truncated 表示查詢太籠統，只檢查了部分候選
+        """
+        raise NotImplementedError
+
+    def stats(self):
+        """團隊數、成員總數、不重複成員數與團隊人數直方圖，回傳 Stats"""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def iter_batches(self, batch_size=1000):
+        """以 createdAt 游標逐批走訪所有團隊，記憶體用量只與批次大小有關"""
+        after = None
+        while True:
+            teams, _ = self.query(after=after, limit=batch_size)
+            if not teams:
+                return
+            yield teams
+            after = self.cursor_key(teams[-1], 'createdAt')
+
+
+class MemoryTeamStore(TeamStore):
+    """
+    單一行程內的記憶體儲存，搭配有序索引與反向索引
+
+    內部以 16 bytes 的 team.uid 為鍵，排序索引的時間欄位使用整數微秒，
+    比字串 id 與 ISO 時間更省記憶體、比較也更快。
+
+    執行緒安全：同一團隊的「讀取-檢查版本-寫入」由該 id 所屬的分段鎖（striped lock）序列化，
+    不同團隊的寫入互不等待；索引只在短暫的 _index_lock 內調整。團隊物件不可變（copy-on-write），
+    get() 不需加鎖，列表查詢只在鎖內取出一頁的團隊參照，序列化在鎖外進行。
+    """
+
+    SORT_KEYS = {
+        'createdAt': lambda team: (team.created, team.uid),
+        'updatedAt': lambda team: (team.updated, team.uid),
+        'name': lambda team: (team.name, team.uid),
+    }
+
+    LOCK_STRIPES = 64
+
+    def __init__(self):
+        self._teams = {}
+        self._sort_indexes = {field: SortedIndex(self.SORT_KEYS[field]) for field in SORT_FIELDS}
+        self._name_index = InvertedIndex(lambda team: (normalize_name(team.name),))
+        self._member_index = InvertedIndex(lambda team: set(team.members))
+        # 搜尋用的 n-gram 索引：名稱以正規化後的字串為單位，成員以原始名稱為單位、以正規化後的文字切 gram
+        self._name_grams = NGramIndex(lambda team: (normalize_name(team.name),))
+        self._member_grams = NGramIndex(lambda team: set(team.members), text_func=normalize_name)
+        # 統計與索引一樣隨每次變動調整，GET /api/teams/stats 不必走訪所有團隊
+        self._stats = TeamStats()
+        self._indexes = (*self._sort_indexes.values(), self._name_index, self._member_index,
+                         self._name_grams, self._member_grams, self._stats)
+        self._index_lock = threading.Lock()
+        self._stripes = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+        # 版本前綴在每次啟動時不同，避免重啟後版本號重複而誤回 304
+        self._epoch = os.urandom(4).hex()
+        self._version = 0
+        self._last_modified = None
+
+    @staticmethod
+    def _uid(team_id):
+        try:
+            return uuid.UUID(team_id).bytes
+        except (TypeError, ValueError, AttributeError):
+            return None
+
+    @contextmanager
+    def _locked(self, uids):
+        """依固定順序取得 uids 所屬的分段鎖，多筆操作同時進行也不會死結"""
+        stripes = sorted({int.from_bytes(uid[-2:], 'little') % self.LOCK_STRIPES for uid in uids})
+        with ExitStack() as stack:
+            for stripe in stripes:
+                stack.enter_context(self._stripes[stripe])
+            yield
+
+    def _journal(self):
+        """包住一組變動的 context manager，供持久化的子類別合併成一筆日誌記錄"""
+        return nullcontext()
+
+    def _touch(self):
+        self._version += 1
+        self._last_modified = datetime.now(timezone.utc)
+
+    def _index(self, team):
+        for index in self._indexes:
+            index.add(team)
+
+    def _unindex(self, team):
+        for index in self._indexes:
+            index.remove(team)
+
+    def get(self, team_id):
+        return self._teams.get(self._uid(team_id))
+
+    def _on_put(self, team):
+        """團隊新增或更新前呼叫（持有該團隊的分段鎖），供持久化的子類別先寫入日誌；拋出例外時記憶體不會改變"""
+
+    def _on_delete(self, uid):
+        """團隊刪除前呼叫（持有該團隊的分段鎖），供持久化的子類別先寫入日誌；拋出例外時記憶體不會改變"""
+
+    def _commit(self, apply):
+        """套用記憶體中的變動；持久化的子類別在批次中延後到整批日誌寫入後才套用"""
+        apply()
+
+    # 以下 _put / _replace / _remove 需在持有對應分段鎖時呼叫：先寫日誌，成功後才改動記憶體與索引
+
+    def _put(self, team):
+        if team.uid in self._teams:
+            raise TeamExists(team.id)
+        self._on_put(team)
+        self._commit(lambda: self._inserted(team))
+
+    def _inserted(self, team):
+        with self._index_lock:
+            self._teams[team.uid] = team
+            self._index(team)
+            self._touch()
+        if self._listeners:
+            self._notify('created', team.id, team)
+
+    def _replace(self, current, name, members, expected_version=None):
+        if expected_version is not None and current.version != expected_version:
+            raise VersionConflict(current.id)
+        team = current.revised(name=name, members=members)
+        self._on_put(team)
+        self._commit(lambda: self._replaced(current, team))
+        return team
+
+    def _replaced(self, current, team):
+        with self._index_lock:
+            for index in self._indexes:
+                index.replace(current, team)
+            self._teams[team.uid] = team
+            self._touch()
+        if self._listeners:
+            self._notify('updated', team.id, team)
+
+    def _remove(self, current, expected_version=None):
+        if expected_version is not None and current.version != expected_version:
+            raise VersionConflict(current.id)
+        self._on_delete(current.uid)
+        self._commit(lambda: self._removed(current))
+
+    def _removed(self, current):
+        with self._index_lock:
+            del self._teams[current.uid]
+            self._unindex(current)
+            self._touch()
+        if self._listeners:
+            self._notify('deleted', current.id)
+
+    def add(self, team):
+        with self._locked((team.uid,)):
+            self._put(team)
+
+    def update(self, team_id, name=None, members=None, expected_version=None):
+        uid = self._uid(team_id)
+        if uid is None:
+            return None
+        with self._locked((uid,)):
+            current = self._teams.get(uid)
+            if current is None:
+                return None
+            return self._replace(current, name, members, expected_version)
+
+    def update_members(self, team_id, add=(), remove=(), expected_version=None):
+        uid = self._uid(team_id)
+        if uid is None:
+            return None
+        with self._locked((uid,)):
+            current = self._teams.get(uid)
+            if current is None:
+                return None
+            if expected_version is not None and current.version != expected_version:
+                raise VersionConflict(team_id)
+            return self._replace(current, None, current.patched_members(add, remove))
+
+    def delete(self, team_id, expected_version=None):
+        uid = self._uid(team_id)
+        if uid is None:
+            return False
+        with self._locked((uid,)):
+            current = self._teams.get(uid)
+            if current is None:
+                return False
+            self._remove(current, expected_version)
+            return True
+
+    def add_many(self, teams):
+        uids = [team.uid for team in teams]
+        with self._locked(uids):
+            # 持鎖後先確認整批都不存在且不重複再寫入，避免只新增了一部分
+            # （持久化的子類別在批次中延後套用，_put 也看不到同一批先前的團隊）
+            seen = set()
+            for team in teams:
+                if team.uid in seen or team.uid in self._teams:
+                    raise TeamExists(team.id)
+                seen.add(team.uid)
+            with self._journal():
+                for team in teams:
+                    self._put(team)
+
+    def update_many(self, changes):
+        uids = [self._uid(team_id) for team_id, _, _ in changes]
+        with self._locked([uid for uid in uids if uid is not None]):
+            # 持有所有相關的鎖後先確認全部存在再套用，避免只更新了一部分
+            current = []
+            for (team_id, _, _), uid in zip(changes, uids):
+                team = self._teams.get(uid)
+                if team is None:
+                    raise TeamNotFound(team_id)
+                current.append(team)
+            with self._journal():
+                return [self._replace(team, name, members)
+                        for team, (_, name, members) in zip(current, changes)]
+
+    def delete_many(self, team_ids):
+        uids = [self._uid(team_id) for team_id in team_ids]
+        with self._locked([uid for uid in uids if uid is not None]):
+            current = []
+            for team_id, uid in zip(team_ids, uids):
+                team = self._teams.get(uid)
+                if team is None:
+                    raise TeamNotFound(team_id)
+                current.append(team)
+            with self._journal():
+                for team in current:
+                    self._remove(team)
+
+    def count(self):
+        return len(self._teams)
+
+    def version(self):
+        return f"{self._epoch}.{self._version}"
+
+    def last_modified(self):
+        return self._last_modified
+
+    def clear(self):
+        with ExitStack() as stack:
+            for lock in self._stripes:
+                stack.enter_context(lock)
+            self._clear()
+
+    def _clear(self):
+        with self._index_lock:
+            self._teams.clear()
+            for index in self._indexes:
+                index.clear()
+            self._touch()
+
+    def cursor_key(self, team, sort):
+        # 與 SQLite 後端相同，以對外的欄位值與 id 表示：游標與後端無關，分片模式下也能直接用於每個分片
+        return [getattr(team, sort), team.id]
+
+    @staticmethod
+    def _after_key(sort, after):
+        try:
+            value, team_id = after
+        except (TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+        if not isinstance(value, str) or not isinstance(team_id, str):
+            raise ValueError("Cursor does not match the requested sort")
+        try:
+            return (value if sort == 'name' else parse_micros(value), uuid.UUID(team_id).bytes)
+        except ValueError:
+            raise ValueError("Invalid cursor")
+
+    def query(self, sort='createdAt', reverse=False, after=None, limit=100,
+              name_prefix='', name=None, member=None):
+        if after is not None:
+            after = self._after_key(sort, after)
+
+        # 只在索引鎖內取出這一頁的團隊參照；團隊不可變，序列化可在鎖外進行
+        with self._index_lock:
+            return self._query(sort, reverse, after, limit, name_prefix, name, member)
+
+    def _query(self, sort, reverse, after, limit, name_prefix, name, member):
+        # 名稱與成員條件先從反向索引取得候選 ids；只有一個條件時直接使用索引中的集合（持有索引鎖，不必複製）
+        candidates = None
+        if name is not None or member is not None:
+            id_sets = []
+            if name is not None:
+                id_sets.append(self._name_index.get(normalize_name(name)))
+            if member is not None:
+                id_sets.append(self._member_index.get(member))
+            id_sets.sort(key=len)
+            candidates = id_sets[0] if len(id_sets) == 1 else set(id_sets[0]).intersection(*id_sets[1:])
+
+        # 有條件時依符合數 m 選擇策略：m² ≤ 頁大小 × N 時取出符合的團隊排序（m log m），
+        # 否則沿排序索引從游標走訪並略過不符合的團隊（平均約 頁大小 × N / m 筆），每頁最多約 √(頁大小 × N) 筆，
+        # 不會在索引鎖內把大量候選排序而擋住寫入
+        index = self._sort_indexes[sort]
+        teams = self._teams
+        lower, upper = prefix_bounds(name_prefix) if name_prefix else (None, None)
+        if candidates is None and (not name_prefix or sort == 'name'):
+            total = index.count(lower, upper)
+            keys = index.scan(lower, upper, after=after, reverse=reverse)
+        elif candidates is None:
+            names = self._sort_indexes['name']
+            total = names.count(lower, upper)
+            if total * total > limit * len(index):
+                keys = (key for key in index.scan(after=after, reverse=reverse)
+                        if teams[key[-1]].name.startswith(name_prefix))
+            else:
+                keys = self._sorted_page(index, (key[-1] for key in names.scan(lower, upper)), after, reverse)
+        else:
+            if name_prefix:
+                # 候選與字首範圍取較小的一邊逐一檢查
+                names = self._sort_indexes['name']
+                if names.count(lower, upper) < len(candidates):
+                    matched = [key[-1] for key in names.scan(lower, upper) if key[-1] in candidates]
+                else:
+                    matched = [uid for uid in candidates if teams[uid].name.startswith(name_prefix)]
+                total = len(matched)
+            else:
+                matched = candidates
+                total = len(candidates)
+            if total * total > limit * len(index):
+                # 依名稱排序時字首條件可直接縮小走訪的範圍
+                scan = index.scan(lower, upper, after=after, reverse=reverse) if sort == 'name' else \
+                    index.scan(after=after, reverse=reverse)
+                keys = (key for key in scan if key[-1] in candidates
+                        and (not name_prefix or teams[key[-1]].name.startswith(name_prefix)))
+            else:
+                keys = self._sorted_page(index, matched, after, reverse)
+
+        return [teams[key[-1]] for key in islice(keys, limit)], total
+
+    def _sorted_page(self, index, uids, after, reverse):
+        """符合的團隊不多時使用：依排序鍵排序後從游標之後開始"""
+        matched = sorted((index.key(self._teams[uid]) for uid in uids), reverse=reverse)
+        if after is not None:
+            matched = [key for key in matched if (key < after if reverse else key > after)]
+        return iter(matched)
+
+    def search(self, query, limit=20):
+        text = normalize_name(query)
+        with self._index_lock:
+            # 每個符合的字串至少對應一個團隊，各欄位取前 limit 個字串就足以湊滿 limit 個團隊
+            names, names_truncated = self._name_grams.search(text, limit)
+            members, members_truncated = self._member_grams.search(text, limit)
+            matches = sorted([(score, 'name', key) for score, key in names]
+                             + [(score * MEMBER_WEIGHT, 'members', key) for score, key in members],
+                             key=lambda match: match[0], reverse=True)
+            hits, seen = [], set()
+            for score, field, key in matches:
+                uids = self._name_index.get(key) if field == 'name' else self._member_index.get(key)
+                for uid in islice(uids, limit):
+                    if uid in seen:
+                        continue
+                    seen.add(uid)
+                    team = self._teams[uid]
+                    hits.append(SearchHit(score, field, team.name if field == 'name' else key, team))
+                if len(hits) >= limit:
+                    break
+        return hits[:limit], names_truncated or members_truncated
+
+    def stats(self):
+        with self._index_lock:
+            stats = self._stats
+            return Stats(stats.teams, stats.members, stats.distinct_members, stats.histogram())
+
+
+class DurableMemoryTeamStore(MemoryTeamStore):
+    """
+    記憶體儲存 + 寫入日誌（WAL）與定期快照
+
+    每次新增、更新、刪除都附加到日誌；快照會先切換日誌再寫出所有團隊，完成後刪除舊日誌。
+    啟動時載入最新快照並重播之後的日誌。資料目錄以檔案鎖保護，同一時間只能有一個行程使用；
+    lock_timeout 為等待其他行程釋放的秒數（例如平滑重啟時新 worker 等待舊 worker 結束）。
+    """
+
+    def __init__(self, data_dir, fsync_interval=0.05, snapshot_interval=300, lock_timeout=0):
+        super().__init__()
+        os.makedirs(data_dir, exist_ok=True)
+        self.data_dir = data_dir
+        self._lock_file = open(os.path.join(data_dir, 'LOCK'), 'w')
+        deadline = time.monotonic() + lock_timeout
+        while True:
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    self._lock_file.close()
+                    raise RuntimeError(f"Data directory {data_dir} is used by another process")
+                time.sleep(0.1)
+        self._snapshot_lock = threading.Lock()
+        self._closed = threading.Event()
+        # 批次中等待整批日誌寫入後才套用的記憶體變動（每個執行緒各自一份）
+        self._batch = threading.local()
+        self._log = wal.WriteAheadLog(data_dir, self._recover(), fsync_interval)
+        if snapshot_interval:
+            threading.Thread(target=self._snapshot_loop, args=(snapshot_interval,),
+                             name='snapshot', daemon=True).start()
+
+    def _recover(self):
+        """載入快照並重播日誌，回傳新日誌要使用的 generation"""
+        generation, teams = wal.read_snapshot(self.data_dir)
+        self._teams = {team.uid: team for team in teams}
+        for index in self._indexes:
+            index.add_many(teams)
+
+        next_generation = generation
+        for log_generation in wal.log_generations(self.data_dir):
+            path = wal.log_path(self.data_dir, log_generation)
+            if log_generation < generation:
+                os.remove(path)
+                continue
+            self._replay(path)
+            next_generation = log_generation + 1
+            if os.path.getsize(path) == 0:
+                os.remove(path)
+        if self._teams:
+            self._touch()
+        return next_generation
+
+    def _replay(self, path):
+        with open(path, 'rb') as file:
+            buffer = memoryview(file.read())
+        end = 0
+        for op, payload, end in wal.iter_records(buffer):
+            self._apply(op, payload)
+        if end < len(buffer):
+            # 當機時寫到一半的記錄：截斷，之後的寫入才不會接在損毀的資料後面
+            with open(path, 'r+b') as file:
+                file.truncate(end)
+
+    def _apply(self, op, payload):
+        if op == wal.OP_PUT:
+            team, _ = wal.decode_team(payload)
+            current = self._teams.get(team.uid)
+            if current is not None:
+                self._unindex(current)
+            self._teams[team.uid] = team
+            self._index(team)
+        elif op == wal.OP_DELETE:
+            team = self._teams.pop(bytes(payload), None)
+            if team is not None:
+                self._unindex(team)
+        elif op == wal.OP_CLEAR:
+            MemoryTeamStore._clear(self)
+        elif op == wal.OP_BATCH:
+            for sub_op, sub_payload in wal.iter_batch(payload):
+                self._apply(sub_op, sub_payload)
+
+    def _on_put(self, team):
+        self._log.put(team)
+
+    def _on_delete(self, uid):
+        self._log.delete(uid)
+
+    def _commit(self, apply):
+        pending = getattr(self._batch, 'pending', None)
+        if pending is None:
+            apply()
+        else:
+            pending.append(apply)
+
+    @contextmanager
+    def _journal(self):
+        # 整批記錄寫入日誌後才套用到記憶體；區塊內發生例外或寫入失敗時整批都不套用，記憶體與日誌保持一致
+        self._batch.pending = pending = []
+        try:
+            with self._log.batch():
+                yield
+        finally:
+            self._batch.pending = None
+        for apply in pending:
+            apply()
+
+    def _clear(self):
+        self._log.clear()
+        super()._clear()
+
+    def snapshot(self):
+        """
+        寫出快照並刪除已涵蓋的日誌
+
+        寫入先寫日誌再改動記憶體，兩步都在分段鎖內完成；切換日誌與取出團隊清單時持有所有分段鎖，
+        每筆變動都完整地落在切換前（已在清單中）或切換後（在新日誌中），之後寫出快照時不必暫停寫入。
+        """
+        with self._snapshot_lock:
+            with ExitStack() as stack:
+                for lock in self._stripes:
+                    stack.enter_context(lock)
+                generation = self._log.rotate()
+                teams = list(self._teams.values())
+            wal.write_snapshot(self.data_dir, generation, teams)
+            for log_generation in wal.log_generations(self.data_dir):
+                if log_generation < generation:
+                    os.remove(wal.log_path(self.data_dir, log_generation))
+
+    def _snapshot_loop(self, interval):
+        while not self._closed.wait(interval):
+            if self._log.records:
+                self.snapshot()
+
+    def close(self):
+        self._closed.set()
+        with self._snapshot_lock:
+            self._log.close()
+        self._lock_file.close()
+
+
+class SQLiteTeamStore(TeamStore):
+    """
+    SQLite 儲存：WAL 模式讓多個 worker 行程可同時讀寫同一個資料庫檔
+
+    每個執行緒持有自己的連線（連線池），SQL 皆為固定字串搭配參數，
+    由 sqlite3 的 statement cache 重複使用已編譯的 prepared statement。
+    json 欄位保存團隊編碼後的 JSON，讀取時直接沿用不必重新序列化。
+    """
+
+    COLUMNS = {'createdAt': 'created_at', 'updatedAt': 'updated_at', 'name': 'name'}
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS teams (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            name_key TEXT NOT NULL,
+            members TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 1,
+            json BLOB NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_teams_name ON teams (name, id);
+        CREATE INDEX IF NOT EXISTS idx_teams_name_key ON teams (name_key);
+        CREATE INDEX IF NOT EXISTS idx_teams_created_at ON teams (created_at, id);
+        CREATE INDEX IF NOT EXISTS idx_teams_updated_at ON teams (updated_at, id);
+        CREATE TABLE IF NOT EXISTS team_members (
+            member TEXT NOT NULL,
+            team_id TEXT NOT NULL REFERENCES teams (id) ON DELETE CASCADE,
+            PRIMARY KEY (member, team_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_team_members_team_id ON team_members (team_id);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO meta (key, value) VALUES ('team_count', 0), ('version', 0), ('last_modified', 0);
+        -- 建立資料庫時產生的隨機 epoch：刪除重建或換成其他資料庫檔後版本號即使相同，版本字串也不會重複
+        INSERT OR IGNORE INTO meta (key, value) VALUES ('epoch', abs(random()) % 4294967296);
+        CREATE TRIGGER IF NOT EXISTS trg_teams_insert AFTER INSERT ON teams BEGIN
+            UPDATE meta SET value = value + 1 WHERE key IN ('team_count', 'version');
+            UPDATE meta SET value = CAST(strftime('%s', 'now') AS INTEGER) WHERE key = 'last_modified';
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_teams_update AFTER UPDATE ON teams BEGIN
+            UPDATE meta SET value = value + 1 WHERE key = 'version';
+            UPDATE meta SET value = CAST(strftime('%s', 'now') AS INTEGER) WHERE key = 'last_modified';
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_teams_delete AFTER DELETE ON teams BEGIN
+            UPDATE meta SET value = value - 1 WHERE key = 'team_count';
+            UPDATE meta SET value = value + 1 WHERE key = 'version';
+            UPDATE meta SET value = CAST(strftime('%s', 'now') AS INTEGER) WHERE key = 'last_modified';
+        END;
+    '''
+
+    SELECT_TEAM = 'SELECT id, name, members, created_at, updated_at, version, json FROM teams'
+
+    def __init__(self, path='teams.db', timeout=5.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        conn = self._connection()
+        conn.executescript(self.SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                   check_same_thread=False, cached_statements=256)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            # 搜尋成員時以與記憶體後端相同的正規化比對（SQLite 內建的 lower() 只處理 ASCII）
+            conn.create_function('normalize_name', 1, normalize_name, deterministic=True)
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE 先取得寫入鎖，避免多個行程讀改寫時互相覆蓋
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        self._local.changes = changes = []
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        # 整個交易成功才送出變動通知；在 COMMIT 前（仍持有寫入鎖）送出，順序與寫入順序一致
+        for change in changes:
+            self._notify(*change)
+        conn.execute('COMMIT')
+
+    def _changed(self, event, team_id, team=None):
+        """記錄目前交易中的變動，交易成功時才通知 listener"""
+        if self._listeners:
+            self._local.changes.append((event, team_id, team))
+
+    @contextmanager
+    def _read_snapshot(self):
+        # 讀取交易：總數與該頁資料在 WAL 模式下看到同一個版本，不會被同時進行的寫入拆開
+        conn = self._connection()
+        conn.execute('BEGIN')
+        try:
+            yield conn
+        finally:
+            conn.execute('COMMIT')
+
+    @staticmethod
+    def _row_to_team(row):
+        team_id, name, members, created_at, updated_at, version, encoded = row
+        return Team.restore(team_id, name, json.loads(members), created_at, updated_at, version, encoded)
+
+    @staticmethod
+    def _insert_members(conn, team_id, members):
+        conn.executemany('INSERT OR IGNORE INTO team_members (member, team_id) VALUES (?, ?)',
+                         ((member, team_id) for member in set(members)))
+
+    def get(self, team_id):
+        row = self._connection().execute(self.SELECT_TEAM + ' WHERE id = ?', (team_id,)).fetchone()
+        return None if row is None else self._row_to_team(row)
+
+    def _insert(self, conn, team):
+        try:
+            conn.execute(
+                'INSERT INTO teams (id, name, name_key, members, created_at, updated_at, version, json) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (team.id, team.name, normalize_name(team.name), json.dumps(team.members, ensure_ascii=False),
+                 team.createdAt, team.updatedAt, team.version, team.to_json()))
+        except sqlite3.IntegrityError:
+            raise TeamExists(team.id)
+        self._insert_members(conn, team.id, team.members)
+        self._changed('created', team.id, team)
+
+    def _update(self, conn, team_id, name, members, expected_version=None):
+        row = conn.execute(self.SELECT_TEAM + ' WHERE id = ?', (team_id,)).fetchone()
+        if row is None:
+            return None
+        current = self._row_to_team(row)
+        if expected_version is not None and current.version != expected_version:
+            raise VersionConflict(team_id)
+        team = current.revised(name=name, members=members)
+        if members is not None:
+            conn.execute('DELETE FROM team_members WHERE team_id = ?', (team_id,))
+            self._insert_members(conn, team_id, members)
+        conn.execute(
+            'UPDATE teams SET name = ?, name_key = ?, members = ?, updated_at = ?, version = ?, json = ? WHERE id = ?',
+            (team.name, normalize_name(team.name), json.dumps(team.members, ensure_ascii=False),
+             team.updatedAt, team.version, team.to_json(), team_id))
+        self._changed('updated', team_id, team)
+        return team
+
+    def add(self, team):
+        with self._transaction() as conn:
+            self._insert(conn, team)
+
+    def update(self, team_id, name=None, members=None, expected_version=None):
+        with self._transaction() as conn:
+            return self._update(conn, team_id, name, members, expected_version)
+
+    def update_members(self, team_id, add=(), remove=(), expected_version=None):
+        with self._transaction() as conn:
+            row = conn.execute(self.SELECT_TEAM + ' WHERE id = ?', (team_id,)).fetchone()
+            if row is None:
+                return None
+            current = self._row_to_team(row)
+            if expected_version is not None and current.version != expected_version:
+                raise VersionConflict(team_id)
+            team = current.revised(members=current.patched_members(add, remove))
+            # team_members 只刪除與新增有變動的成員
+            conn.executemany('DELETE FROM team_members WHERE member = ? AND team_id = ?',
+                             ((member, team_id) for member in set(remove) - set(add)))
+            self._insert_members(conn, team_id, add)
+            conn.execute(
+                'UPDATE teams SET members = ?, updated_at = ?, version = ?, json = ? WHERE id = ?',
+                (json.dumps(team.members, ensure_ascii=False), team.updatedAt, team.version, team.to_json(), team_id))
+            self._changed('updated', team_id, team)
+            return team
+
+    def delete(self, team_id, expected_version=None):
+        with self._transaction() as conn:
+            row = conn.execute('SELECT version FROM teams WHERE id = ?', (team_id,)).fetchone()
+            if row is None:
+                return False
+            if expected_version is not None and row[0] != expected_version:
+                raise VersionConflict(team_id)
+            conn.execute('DELETE FROM teams WHERE id = ?', (team_id,))
+            self._changed('deleted', team_id)
+            return True
+
+    def add_many(self, teams):
+        with self._transaction() as conn:
+            for team in teams:
+                self._insert(conn, team)
+
+    def update_many(self, changes):
+        updated = []
+        with self._transaction() as conn:
+            for team_id, name, members in changes:
+                team = self._update(conn, team_id, name, members)
+                if team is None:
+                    raise TeamNotFound(team_id)
+                updated.append(team)
+        return updated
+
+    def delete_many(self, team_ids):
+        with self._transaction() as conn:
+            for team_id in team_ids:
+                if conn.execute('DELETE FROM teams WHERE id = ?', (team_id,)).rowcount == 0:
+                    raise TeamNotFound(team_id)
+                self._changed('deleted', team_id)
+
+    def _meta(self, key):
+        return self._connection().execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()[0]
+
+    def count(self):
+        return self._meta('team_count')
+
+    def version(self):
+        values = dict(self._connection().execute("SELECT key, value FROM meta WHERE key IN ('epoch', 'version')"))
+        return f"{values['epoch']:08x}.{values['version']}"
+
+    def last_modified(self):
+        timestamp = self._meta('last_modified')
+        return datetime.fromtimestamp(timestamp, timezone.utc) if timestamp else None
+
+    def clear(self):
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM team_members')
+            conn.execute('DELETE FROM teams')
+
+    def cursor_key(self, team, sort):
+        return [getattr(team, sort), team.id]
+
+    def query(self, sort='createdAt', reverse=False, after=None, limit=100,
+              name_prefix='', name=None, member=None):
+        column = self.COLUMNS[sort]
+        if after is not None and (len(after) != 2 or not all(isinstance(value, str) for value in after)):
+            raise ValueError("Cursor does not match the requested sort")
+        conditions, params = [], []
+        if name is not None:
+            conditions.append('name_key = ?')
+            params.append(normalize_name(name))
+        if member is not None:
+            conditions.append('id IN (SELECT team_id FROM team_members WHERE member = ?)')
+            params.append(member)
+        if name_prefix:
+            lower, upper = prefix_bounds(name_prefix)
+            conditions.append('name >= ?')
+            params.append(lower[0])
+            if upper is not None:
+                conditions.append('name < ?')
+                params.append(upper[0])
+
+        with self._read_snapshot() as conn:
+            if conditions:
+                where = ' WHERE ' + ' AND '.join(conditions)
+                total = conn.execute('SELECT COUNT(*) FROM teams' + where, params).fetchone()[0]
+            else:
+                total = self.count()
+
+            if after is not None:
+                conditions.append(f'({column}, id) {"<" if reverse else ">"} (?, ?)')
+                params.extend(after)
+            direction = 'DESC' if reverse else 'ASC'
+            sql = self.SELECT_TEAM
+            if conditions:
+                sql += ' WHERE ' + ' AND '.join(conditions)
+            sql += f' ORDER BY {column} {direction}, id {direction} LIMIT ?'
+            rows = conn.execute(sql, (*params, limit)).fetchall()
+        return [self._row_to_team(row) for row in rows], total
+
+
+    def search(self, query, limit=20):
+        # SQLite 後端只支援子字串搜尋（全表掃描），容錯搜尋需要記憶體後端的 n-gram 索引
+        text = normalize_name(query)
+        hits = {}
+
+        def found(score, field, matched, row):
+            team = self._row_to_team(row)
+            if team.id not in hits or hits[team.id].score < score:
+                hits[team.id] = SearchHit(score, field, matched, team)
+
+        with self._read_snapshot() as conn:
+            rows = conn.execute(self.SELECT_TEAM + ' WHERE instr(name_key, ?) > 0 '
+                                'ORDER BY length(name_key), id LIMIT ?', (text, limit)).fetchall()
+            for row in rows:
+                found(substring_score(text, normalize_name(row[1])), 'name', row[1], row)
+            members = conn.execute('SELECT member FROM (SELECT DISTINCT member FROM team_members) '
+                                   'WHERE instr(normalize_name(member), ?) > 0 '
+                                   'ORDER BY length(normalize_name(member)), member LIMIT ?', (text, limit)).fetchall()
+            for (member,) in members:
+                score = (substring_score(text, normalize_name(member)) or 0.5) * MEMBER_WEIGHT
+                rows = conn.execute(self.SELECT_TEAM + ' WHERE id IN (SELECT team_id FROM team_members '
+                                    'WHERE member = ?) LIMIT ?', (member, limit)).fetchall()
+                for row in rows:
+                    found(score, 'members', member, row)
+        return sorted(hits.values(), key=lambda hit: hit.score, reverse=True)[:limit], False
+
+    def stats(self):
+        # SQLite 後端以聚合查詢計算（走 team_members 的索引，但與資料量成正比），O(1) 的統計需要記憶體後端
+        with self._read_snapshot() as conn:
+            teams = conn.execute("SELECT value FROM meta WHERE key = 'team_count'").fetchone()[0]
+            members, distinct_members = conn.execute(
+                'SELECT COUNT(*), COUNT(DISTINCT member) FROM team_members').fetchone()
+            sizes = conn.execute('SELECT size, COUNT(*) FROM (SELECT COUNT(*) AS size FROM team_members '
+                                 'GROUP BY team_id) GROUP BY size').fetchall()
+        buckets = [0] * (len(SIZE_BUCKETS) + 1)
+        for size, count in sizes:
+            buckets[size_bucket(size)] += count
+        # 沒有成員的團隊不會出現在 team_members
+        buckets[0] += teams - sum(count for _, count in sizes)
+        return Stats(teams, members, distinct_members, size_histogram(buckets))
+
+
+def create_store(backend='memory', **options):
+    if backend == 'memory':
+        if options.get('data_dir'):
+            return DurableMemoryTeamStore(**options)
+        return MemoryTeamStore()
+    if backend == 'sqlite':
+        return SQLiteTeamStore(**options)
+    raise ValueError(f"Unknown storage backend: {backend}")
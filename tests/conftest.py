@@ -0,0 +1,8 @@
+import os
+import sys
+
+# 測試使用記憶體儲存且不載入 Swagger，與開發環境的設定無關
+os.environ['SWAGGER_MODE'] = 'off'
+os.environ['STORAGE_BACKEND'] = 'memory'
+os.environ.pop('DATA_DIR', None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
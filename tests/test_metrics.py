@@ -0,0 +1,21 @@
+import threading
+
+from metrics import Metrics
+
+
+def test_shards_of_finished_threads_are_folded_into_the_totals():
+    metrics = Metrics()
+
+    # 每個連線一個執行緒的伺服器：每個執行緒只記錄一次就結束
+    for i in range(300):
+        thread = threading.Thread(target=metrics.observe, args=('/api/teams', 'GET', 200 if i % 3 else 404, 0.002, 512),
+                                  kwargs={'error_code': None if i % 3 else 'TEAM_NOT_FOUND'})
+        thread.start()
+        thread.join()
+    metrics.observe('/api/teams', 'GET', 200, 0.002, 512)
+
+    assert len(metrics._shards) <= 2
+    assert metrics._merge('requests') == {('/api/teams', 'GET', 200): 201, ('/api/teams', 'GET', 404): 100}
+    assert metrics._merge('errors') == {'TEAM_NOT_FOUND': 100}
+    assert sum(metrics._merge('latency')[('/api/teams', 'GET')][:-1]) == 301
+    assert 'teams_api_requests_total{endpoint="/api/teams",method="GET",status="200"} 201' in metrics.render()
@@ -0,0 +1,224 @@
+import threading
+import time
+
+import pytest
+
+from models import Team
+from storage import MEMBER_WEIGHT, TeamExists, TeamNotFound, create_store
+
+
+def test_failed_log_write_leaves_memory_unchanged(tmp_path):
+    store = create_store('memory', data_dir=str(tmp_path), snapshot_interval=0)
+    kept = Team('保留', ['張三'])
+    store.add(kept)
+
+    # 無法以 UTF-8 寫入日誌的團隊：寫入失敗時記憶體與索引都不應改變
+    with pytest.raises(UnicodeEncodeError):
+        store.add(Team('\ud800', []))
+    with pytest.raises(UnicodeEncodeError):
+        store.add_many([Team('批次', ['李四']), Team('批次', ['\udfff'])])
+    with pytest.raises(UnicodeEncodeError):
+        store.update(kept.id, name='\ud800')
+    assert store.count() == 1
+    assert store.get(kept.id).name == '保留'
+    assert store.stats().teams == 1
+    teams, total = store.query()
+    assert [team.id for team in teams] == [kept.id] and total == 1
+    store.close()
+
+    recovered = create_store('memory', data_dir=str(tmp_path), snapshot_interval=0)
+    assert [team.name for team in recovered.query()[0]] == ['保留']
+    recovered.close()
+
+
+@pytest.mark.parametrize('sort', ['createdAt', 'updatedAt', 'name'])
+@pytest.mark.parametrize('reverse', [False, True])
+def test_member_and_prefix_pages_match_full_sort(sort, reverse):
+    store = create_store('memory')
+    teams = [Team(f'{"前端後端"[i % 3]}{i % 7}', ['全員', f'成員{i % 5}']) for i in range(400)]
+    store.add_many(teams)
+
+    # 候選很多（沿排序索引走訪）與很少（取出後排序）兩種情況都應與完整排序的結果一致
+    for name_prefix, member in [('', '全員'), ('前', '全員'), ('', '成員3'), ('後1', '成員1')]:
+        expected = sorted((team for team in teams if member in team.members and team.name.startswith(name_prefix)),
+                          key=store._sort_indexes[sort].key, reverse=reverse)
+        found, after = [], None
+        while True:
+            page, total = store.query(sort=sort, reverse=reverse, after=after, limit=7,
+                                      name_prefix=name_prefix, member=member)
+            assert total == len(expected)
+            found += page
+            if len(page) < 7:
+                break
+            after = store.cursor_key(page[-1], sort)
+        assert [team.id for team in found] == [team.id for team in expected]
+
+
+@pytest.mark.parametrize('backend', ['memory', 'durable', 'sqlite'])
+def test_adding_an_existing_id_is_rejected_atomically(backend, tmp_path):
+    if backend == 'sqlite':
+        store = create_store('sqlite', path=str(tmp_path / 'teams.db'))
+    else:
+        store = create_store('memory', data_dir=str(tmp_path) if backend == 'durable' else None, snapshot_interval=0)
+    existing = Team('既有', ['張三'])
+    store.add(existing)
+
+    with pytest.raises(TeamExists):
+        store.add(Team('重複', [], existing.id))
+    with pytest.raises(TeamExists):
+        store.add_many([Team('新的', []), Team('重複', [], existing.id)])
+    fresh = Team('新的', [])
+    with pytest.raises(TeamExists):
+        store.add_many([fresh, Team('同批重複', [], fresh.id)])
+    assert store.count() == 1
+    assert store.get(existing.id).name == '既有'
+    assert store.stats().teams == 1
+
+
+@pytest.mark.parametrize('backend', ['memory', 'durable', 'sqlite'])
+def test_batch_update_and_delete_roll_back_when_a_team_is_missing(backend, tmp_path):
+    def open_store():
+        if backend == 'sqlite':
+            return create_store('sqlite', path=str(tmp_path / 'teams.db'))
+        return create_store('memory', data_dir=str(tmp_path) if backend == 'durable' else None, snapshot_interval=0)
+
+    store = open_store()
+    teams = [Team('前端', ['張三']), Team('後端', [])]
+    store.add_many(teams)
+    version = store.version()
+    missing = Team('不存在', []).id
+
+    with pytest.raises(TeamNotFound):
+        store.update_many([(teams[0].id, '改名', ['李四']), (missing, '改名', None)])
+    with pytest.raises(TeamNotFound):
+        store.delete_many([teams[1].id, missing])
+    assert store.version() == version
+
+    # 持久化的後端重新開啟後也不能出現只套用一部分的變更
+    if backend != 'memory':
+        store.close()
+        store = open_store()
+    assert [(team.name, team.members) for team in (store.get(team.id) for team in teams)] == [('前端', ('張三',)), ('後端', ())]
+    assert store.count() == 2 and store.stats().teams == 2
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_patching_members_keeps_existing_duplicates(backend, tmp_path):
+    store = create_store('sqlite', path=str(tmp_path / 'teams.db')) if backend == 'sqlite' else create_store('memory')
+    team = Team('前端', ['張三', '李四', '張三', '王五'])
+    store.add(team)
+
+    assert store.update_members(team.id, add=['趙六']).members == ('張三', '李四', '張三', '王五', '趙六')
+    assert store.update_members(team.id, remove=['李四'], add=['錢七', '錢七']).members == ('張三', '張三', '王五', '趙六', '錢七')
+    assert store.update_members(team.id, remove=['張三']).members == ('王五', '趙六', '錢七')
+    assert store.get(team.id).members == ('王五', '趙六', '錢七')
+
+
+@pytest.mark.parametrize('query', ['john', 'ＪＯＨＮ', 'smith', 'STRASSE', 'ｓｔｒａßｅ', '開發', 'Ａ 組'])
+def test_sqlite_search_normalizes_like_memory(query, tmp_path):
+    teams = [
+        Team('Ｆｒｏｎｔｅｎｄ 開發', ['Ｊｏｈｎ Ｓｍｉｔｈ', '張三']),
+        Team('Backend', ['JOHN DOE', 'Straße']),
+        Team('a  組', ['ａｌｉｃｅ']),
+    ]
+    memory = create_store('memory')
+    sqlite = create_store('sqlite', path=str(tmp_path / 'teams.db'))
+    for store in (memory, sqlite):
+        store.add_many([Team.from_compact(team.uid, team.name, team.members, team.created, team.updated, 1)
+                        for team in teams])
+
+    # 記憶體後端另有容錯搜尋（分數低於 0.5），只比較子字串符合的結果
+    expected = {(hit.team.id, hit.field, hit.matched) for hit in memory.search(query)[0]
+                if hit.score >= (0.5 * MEMBER_WEIGHT if hit.field == 'members' else 0.5)}
+    found = {(hit.team.id, hit.field, hit.matched) for hit in sqlite.search(query)[0]}
+    assert found == expected and found
+
+
+def test_sqlite_version_changes_when_the_database_is_recreated(tmp_path):
+    path = tmp_path / 'teams.db'
+    store = create_store('sqlite', path=str(path))
+    store.add(Team('前端', ['張三']))
+    before = store.version()
+    store.close()
+    assert create_store('sqlite', path=str(path)).version() == before
+
+    for file in tmp_path.glob('teams.db*'):
+        file.unlink()
+    recreated = create_store('sqlite', path=str(path))
+    recreated.add(Team('前端', ['張三']))
+    assert recreated.version() != before
+    assert recreated.version().split('.')[1] == before.split('.')[1]
+
+
+def test_close_while_the_fsync_thread_is_running(tmp_path, monkeypatch):
+    errors = []
+    monkeypatch.setattr(threading, 'excepthook', errors.append)
+    store = create_store('memory', data_dir=str(tmp_path), fsync_interval=0.01, snapshot_interval=0)
+    log = store._log
+
+    # 讓背景 fsync 停在醒來之後、取得鎖之前，在這時關閉儲存
+    woke, resume = threading.Event(), threading.Event()
+    sync = log.sync
+
+    def paused_sync():
+        woke.set()
+        resume.wait()
+        sync()
+
+    log.sync = paused_sync
+    store.add(Team('團隊', ['張三']))
+    assert woke.wait(5)
+    closing = threading.Thread(target=store.close)
+    closing.start()
+    time.sleep(0.05)
+    resume.set()
+    closing.join(5)
+    log._flusher.join(5)
+    assert not closing.is_alive() and not log._flusher.is_alive()
+    assert errors == []
+
+
+def test_replay_drops_a_torn_tail_and_keeps_appending(tmp_path):
+    store = create_store('memory', data_dir=str(tmp_path), snapshot_interval=0)
+    kept, torn = Team('保留', ['張三']), Team('寫到一半', ['李四'])
+    store.add(kept)
+    store.add(torn)
+    store.close()
+
+    # 模擬當機時最後一筆記錄只寫了一部分
+    (path,) = tmp_path.glob('wal-*.log')
+    path.write_bytes(path.read_bytes()[:-5])
+    store = create_store('memory', data_dir=str(tmp_path), snapshot_interval=0)
+    assert [team.id for team in store.query()[0]] == [kept.id]
+    added = Team('之後新增', [])
+    store.add(added)
+    store.close()
+
+    recovered = create_store('memory', data_dir=str(tmp_path), snapshot_interval=0)
+    assert {team.id for team in recovered.query()[0]} == {kept.id, added.id}
+    assert recovered.get(torn.id) is None
+    recovered.close()
+
+
+def test_snapshot_compacts_the_log_and_restores_the_same_state(tmp_path):
+    store = create_store('memory', data_dir=str(tmp_path), snapshot_interval=0)
+    teams = [Team(f'團隊 {i}', ['張三', f'成員 {i}']) for i in range(20)]
+    store.add_many(teams)
+    store.update(teams[0].id, name='改名')
+    store.update_members(teams[1].id, add=['王五'], remove=['張三'])
+    store.delete(teams[2].id)
+    store.snapshot()
+
+    # 快照涵蓋的日誌已刪除，只剩切換後的新日誌
+    assert (tmp_path / 'snapshot.bin').exists()
+    assert len(list(tmp_path.glob('wal-*.log'))) == 1
+    store.add(Team('快照之後', []))
+    expected = [(team.id, team.name, team.members, team.version) for team in store.query(limit=100)[0]]
+    expected_stats = store.stats()
+    store.close()
+
+    recovered = create_store('memory', data_dir=str(tmp_path), snapshot_interval=0)
+    assert [(team.id, team.name, team.members, team.version) for team in recovered.query(limit=100)[0]] == expected
+    assert recovered.stats() == expected_stats
+    assert recovered.query(member='王五')[1] == 1
+    recovered.close()
@@ -0,0 +1,277 @@
+import gzip
+import json
+
+import pytest
+
+import app as app_module
+from compression import CompressedCache
+from app import app, store
+from models import parse_fields, team_serializer
+import serialization
+
+
+@pytest.fixture
+def client():
+    store.clear()
+    yield app.test_client()
+    store.clear()
+
+
+@pytest.mark.parametrize('body', [
+    b'{"name": "\\ud800", "members": []}',
+    b'{"name": "ok", "members": ["\\udfff"]}',
+])
+def test_lone_surrogates_are_rejected_and_listing_still_works(client, body):
+    response = client.post('/api/teams', data=body, content_type='application/json')
+    assert response.status_code == 400
+    assert store.count() == 0
+
+    listing = client.get('/api/teams')
+    assert listing.status_code == 200
+    assert listing.get_json()['data']['teams'] == []
+
+
+def test_stdlib_encoder_escapes_lone_surrogates():
+    assert serialization._stdlib_encode({'name': '\ud800'}) == b'{"name":"\\ud800"}'
+    assert serialization.decode_cursor(serialization.encode_cursor('name', ['\ud800', 'x']), 'name') == ['\ud800', 'x']
+
+
+def test_change_subscribers_are_capped(client, monkeypatch):
+    monkeypatch.setattr(app_module.sse_subscribers, 'limit', 1)
+    first = client.get('/api/teams/changes', buffered=False)
+    assert first.status_code == 200
+
+    # 名額用完時回 503，第一個訂閱者斷線後名額釋放
+    rejected = client.get('/api/teams/changes')
+    assert rejected.status_code == 503
+    assert rejected.get_json()['errorCode'] == 'TOO_MANY_SUBSCRIBERS'
+    assert rejected.headers['Retry-After']
+    first.close()
+    second = client.get('/api/teams/changes', buffered=False)
+    assert second.status_code == 200
+    second.close()
+
+
+@pytest.mark.parametrize('trusted, expected', [(1, '10.0.0.2'), (2, '203.0.113.7'), (4, '127.0.0.1')])
+def test_client_id_ignores_addresses_the_client_can_spoof(monkeypatch, trusted, expected):
+    monkeypatch.setattr(app_module, 'RATE_LIMIT_CLIENT_HEADER', 'X-Forwarded-For')
+    monkeypatch.setattr(app_module, 'RATE_LIMIT_TRUSTED_PROXIES', trusted)
+    # 客戶端自己填了 1.2.3.4，兩層代理各自附加看到的位址（其中一層另起一行標頭）
+    headers = [('X-Forwarded-For', '1.2.3.4, 203.0.113.7'), ('X-Forwarded-For', '10.0.0.2')]
+    with app.test_request_context(headers=headers, environ_base={'REMOTE_ADDR': '127.0.0.1'}):
+        assert app_module.client_id() == expected
+
+
+def test_patch_members_rejects_duplicates_within_the_request(client):
+    team_id = client.post('/api/teams', json={'name': '前端', 'members': ['張三']}).get_json()['data']['team']['id']
+
+    for body in ({'add': ['李四', '李四']}, {'remove': ['張三', '張三']}):
+        response = client.patch(f'/api/teams/{team_id}/members', json=body)
+        assert response.status_code == 400
+        assert response.get_json()['errorCode'] == 'VALIDATION_ERROR'
+    response = client.patch(f'/api/teams/{team_id}/members', json={'add': ['張三']})
+    assert response.status_code == 409
+    assert client.get(f'/api/teams/{team_id}').get_json()['data']['team']['members'] == ['張三']
+
+
+@pytest.mark.parametrize('fields', ['', 'id,members', 'name,updatedAt'])
+def test_msgpack_listing_matches_json(client, fields):
+    msgpack = pytest.importorskip('msgpack')
+    client.post('/api/teams', json={'name': '前端', 'members': ['張三', '李四']})
+    client.post('/api/teams', json={'name': '後端', 'members': []})
+
+    as_json = client.get('/api/teams', query_string={'fields': fields}).get_json()
+    as_msgpack = client.get('/api/teams', query_string={'fields': fields}, headers={'Accept': 'application/msgpack'})
+    assert as_msgpack.mimetype == 'application/msgpack'
+    assert msgpack.unpackb(as_msgpack.data) == as_json
+
+
+def test_field_selections_in_any_order_share_one_serializer():
+    assert parse_fields('name,id') == parse_fields(' id , name,id') == ('id', 'name')
+    assert team_serializer(parse_fields('id,name')) is team_serializer(parse_fields('name, id'))
+    assert parse_fields('') == parse_fields('updatedAt,createdAt,members,name,id') == ()
+    with pytest.raises(ValueError):
+        parse_fields('id,secret')
+
+
+REPRESENTATIONS = [
+    ({}, {}),
+    ({'fields': 'id,name'}, {}),
+    ({'fields': 'id'}, {}),
+    ({}, {'Accept': 'application/msgpack'}),
+    ({}, {'Accept-Encoding': 'gzip'}),
+    ({'fields': 'id'}, {'Accept-Encoding': 'gzip'}),
+]
+
+
+@pytest.mark.parametrize('path', ['/api/teams', '/api/teams/{id}'])
+def test_conditional_get_only_matches_the_same_representation(client, monkeypatch, path):
+    if 'application/msgpack' not in serialization.MIMETYPES:
+        pytest.skip('msgpack is not installed')
+    monkeypatch.setattr(app_module.compressor, 'min_size', 0)
+    team_id = client.post('/api/teams', json={'name': '前端', 'members': ['張三']}).get_json()['data']['team']['id']
+    path = path.format(id=team_id)
+
+    etags = []
+    for query, headers in REPRESENTATIONS:
+        response = client.get(path, query_string=query, headers=headers)
+        assert response.status_code == 200
+        etags.append(response.headers['ETag'])
+        again = client.get(path, query_string=query, headers={**headers, 'If-None-Match': response.headers['ETag']})
+        assert again.status_code == 304
+        assert again.headers['ETag'] == response.headers['ETag']
+    assert len(set(etags)) == len(etags)
+
+    # 只有同一表示，或接受 gzip 的客戶端手上的未壓縮版本才會得到 304
+    for i, (query, headers) in enumerate(REPRESENTATIONS):
+        for j, etag in enumerate(etags):
+            response = client.get(path, query_string=query, headers={**headers, 'If-None-Match': etag})
+            expected = 304 if i == j or etags[i] == etag[:-1] + '+gzip"' else 200
+            assert response.status_code == expected, (query, headers, etag)
+
+    reordered = client.get(path, query_string={'fields': 'name, id'}, headers={'If-None-Match': etags[1]})
+    assert reordered.status_code == 304
+
+
+def test_if_match_accepts_any_representation_of_the_current_version(client, monkeypatch):
+    monkeypatch.setattr(app_module.compressor, 'min_size', 0)
+    team_id = client.post('/api/teams', json={'name': '前端', 'members': ['張三']}).get_json()['data']['team']['id']
+    stale = client.get(f'/api/teams/{team_id}', query_string={'fields': 'id'}, headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    assert stale.endswith('+fields=id+gzip"')
+
+    updated = client.put(f'/api/teams/{team_id}', json={'name': '後端'}, headers={'If-Match': stale})
+    assert updated.status_code == 200
+    for method, url, kwargs in (('PUT', f'/api/teams/{team_id}', {'json': {'name': '測試'}}),
+                                ('PATCH', f'/api/teams/{team_id}/members', {'json': {'add': ['李四']}}),
+                                ('DELETE', f'/api/teams/{team_id}', {})):
+        response = client.open(url, method=method, headers={'If-Match': stale}, **kwargs)
+        assert response.status_code == 412
+        assert response.get_json()['errorCode'] == 'PRECONDITION_FAILED'
+    assert client.delete(f'/api/teams/{team_id}', headers={'If-Match': updated.headers['ETag']}).status_code == 200
+
+
+def test_responses_are_compressed_only_when_accepted_and_large_enough(client, monkeypatch):
+    client.post('/api/teams', json={'name': '前端', 'members': ['張三'] * 5})
+    monkeypatch.setattr(app_module.compressor, 'min_size', 0)
+
+    identity = client.get('/api/teams')
+    assert 'Content-Encoding' not in identity.headers
+    assert 'Accept-Encoding' in identity.headers['Vary']
+    for _ in range(2):  # 第二次由壓縮快取回應
+        compressed = client.get('/api/teams', headers={'Accept-Encoding': 'gzip'})
+        assert compressed.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in compressed.headers['Vary']
+        assert gzip.decompress(compressed.data) == identity.data
+        assert compressed.headers['ETag'] == identity.headers['ETag'][:-1] + '+gzip"'
+    refused = client.get('/api/teams', headers={'Accept-Encoding': 'gzip;q=0'})
+    assert 'Content-Encoding' not in refused.headers
+
+    monkeypatch.setattr(app_module.compressor, 'min_size', len(identity.data) + 1)
+    small = client.get(f'/api/teams/{identity.get_json()["data"]["teams"][0]["id"]}', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
+    assert 'Accept-Encoding' in small.headers['Vary']
+
+
+def test_list_cache_is_keyed_by_the_normalized_field_set(client, monkeypatch):
+    client.post('/api/teams', json={'name': '前端', 'members': ['張三']})
+    monkeypatch.setattr(app_module.compressor, 'min_size', 0)
+    queries = []
+    query = store.query
+    monkeypatch.setattr(store, 'query', lambda **kwargs: queries.append(kwargs) or query(**kwargs))
+
+    first = client.get('/api/teams', query_string={'fields': 'id,name'}, headers={'Accept-Encoding': 'gzip'})
+    reordered = client.get('/api/teams', query_string={'fields': ' name ,id', 'limit': app_module.DEFAULT_PAGE_SIZE}, headers={'Accept-Encoding': 'gzip'})
+    assert reordered.data == first.data and reordered.headers['ETag'] == first.headers['ETag']
+    assert len(queries) == 1
+
+    narrower = client.get('/api/teams', query_string={'fields': 'id'}, headers={'Accept-Encoding': 'gzip'})
+    assert len(queries) == 2
+    assert set(json.loads(gzip.decompress(narrower.data))['data']['teams'][0]) == {'id'}
+    assert narrower.headers['ETag'] != first.headers['ETag']
+
+
+def test_compressed_cache_ignores_results_from_an_older_version():
+    cache = CompressedCache()
+    cache.put('e.10', 'key', b'new')
+    cache.put('e.9', 'key', b'old')
+    assert cache.get('e.10', 'key') == b'new'
+    assert cache.get('e.9', 'key') is None
+    cache.put('f.1', 'key', b'other store')
+    assert cache.get('f.1', 'key') == b'other store'
+
+
+def test_idempotent_replay_requires_the_same_negotiated_format(client):
+    msgpack = pytest.importorskip('msgpack')
+    body = {'name': '前端', 'members': ['張三']}
+    headers = {'Idempotency-Key': 'retry-format'}
+    created = client.post('/api/teams', json=body, headers=headers)
+    assert created.status_code == 201
+
+    response = client.post('/api/teams', json=body, headers={**headers, 'Accept': 'application/msgpack'})
+    assert response.status_code == 422
+    assert msgpack.unpackb(response.data)['errorCode'] == 'IDEMPOTENCY_KEY_REUSED'
+    replayed = client.post('/api/teams', json=body, headers={**headers, 'Accept': 'application/json'})
+    assert replayed.status_code == 201 and replayed.headers['Idempotent-Replayed'] == 'true'
+    assert replayed.data == created.data
+    assert store.count() == 1
+
+
+def test_batch_create_applies_nothing_when_any_item_is_invalid(client):
+    response = client.post('/api/teams:batch', json={'teams': [{'name': '前端', 'members': []}, {'members': ['張三']}]})
+    assert response.status_code == 400
+    body = response.get_json()
+    assert body['errorCode'] == 'BATCH_VALIDATION_FAILED'
+    assert [item['index'] for item in body['data']['results']] == [1]
+    assert store.count() == 0
+
+    response = client.post('/api/teams:batch', json={'teams': [{'name': '前端', 'members': []}, {'name': '後端', 'members': ['張三']}]})
+    assert response.status_code == 201
+    assert [item['team']['name'] for item in response.get_json()['data']['results']] == ['前端', '後端']
+    assert store.count() == 2
+
+
+def test_batch_update_and_delete_apply_nothing_when_an_id_is_missing(client):
+    ids = [item['team']['id'] for item in client.post('/api/teams:batch', json={'teams': [
+        {'name': '前端', 'members': []}, {'name': '後端', 'members': []}]}).get_json()['data']['results']]
+    missing = '00000000-0000-0000-0000-000000000000'
+
+    response = client.put('/api/teams:batch', json={'teams': [{'id': ids[0], 'name': '改名'}, {'id': missing, 'name': '不存在'}]})
+    assert response.status_code == 400 and response.get_json()['errorCode'] == 'BATCH_VALIDATION_FAILED'
+    response = client.delete('/api/teams:batch', json={'ids': [ids[0], missing]})
+    assert response.status_code == 400 and response.get_json()['errorCode'] == 'BATCH_VALIDATION_FAILED'
+    assert [store.get(team_id).name for team_id in ids] == ['前端', '後端']
+
+    assert client.delete('/api/teams:batch', json={'ids': ids}).status_code == 200
+    assert store.count() == 0
+
+
+def test_batch_rolls_back_when_a_team_disappears_after_validation(client, monkeypatch):
+    ids = [item['team']['id'] for item in client.post('/api/teams:batch', json={'teams': [
+        {'name': '前端', 'members': ['張三']}, {'name': '後端', 'members': []}]}).get_json()['data']['results']]
+    # 驗證之後、套用之前，第二個團隊被其他請求刪除
+    deleted = store.get(ids[1])
+    store.delete(ids[1])
+    get = store.get
+    monkeypatch.setattr(store, 'get', lambda team_id: deleted if team_id == ids[1] else get(team_id))
+
+    response = client.put('/api/teams:batch', json={'teams': [{'id': ids[0], 'name': '改名', 'members': []}, {'id': ids[1], 'name': '改名'}]})
+    assert response.status_code == 404 and response.get_json()['errorCode'] == 'TEAM_NOT_FOUND'
+    response = client.delete('/api/teams:batch', json={'ids': ids})
+    assert response.status_code == 404 and response.get_json()['errorCode'] == 'TEAM_NOT_FOUND'
+
+    team = get(ids[0])
+    assert (team.name, team.members, team.version) == ('前端', ('張三',), 1)
+    assert store.count() == 1
+
+
+def test_import_reports_ids_that_already_exist(client):
+    team_id = client.post('/api/teams', json={'name': '前端', 'members': []}).get_json()['data']['team']['id']
+    lines = [
+        {'id': team_id, 'name': '重複', 'members': []},
+        {'name': '新團隊', 'members': ['張三']},
+    ]
+    body = '\n'.join(json.dumps(line, ensure_ascii=False) for line in lines)
+    data = client.post('/api/teams/import', data=body.encode(), content_type='application/x-ndjson').get_json()['data']
+    assert data['imported'] == 1 and data['failed'] == 1
+    assert data['errors'][0]['line'] == 1 and data['errors'][0]['errorCode'] == 'TEAM_ALREADY_EXISTS'
+    assert store.count() == 2
@@ -0,0 +1,229 @@
+from contextlib import contextmanager
+import glob
+import os
+import struct
+import threading
+import zlib
+
+from models import Team
+
+# 記錄格式：[長度 u32][crc32 u32][op u8][內容]，內容長度為「長度 - 1」
+RECORD_HEADER = struct.Struct('<IIB')
+OP_PUT = 1
+OP_DELETE = 2
+OP_CLEAR = 3
+OP_BATCH = 4
+
+# 團隊編碼：uid、建立與更新時間（微秒）、版本、成員數，接著是名稱與各成員的字元長度，
+# 最後是名稱與所有成員串接後的 UTF-8；解碼時只需 decode 一次再依長度切片
+TEAM_HEADER = struct.Struct('<16sqqII')
+LENGTH = struct.Struct('<I')
+
+SNAPSHOT_MAGIC = b'TEAMSNP1'
+SNAPSHOT_HEADER = struct.Struct('<8sQQ')
+
+
+def encode_team(team):
+    members = team.members
+    lengths = struct.pack(f'<{len(members) + 1}I', len(team.name), *map(len, members))
+    text = (team.name + ''.join(members)).encode('utf-8')
+    return b''.join((TEAM_HEADER.pack(team.uid, team.created, team.updated, team.version, len(members)),
+                     lengths, LENGTH.pack(len(text)), text))
+
+
+def decode_team(buffer, offset=0):
+    uid, created, updated, version, member_count = TEAM_HEADER.unpack_from(buffer, offset)
+    offset += TEAM_HEADER.size
+    lengths = struct.unpack_from(f'<{member_count + 1}I', buffer, offset)
+    offset += 4 * (member_count + 1)
+    (size,) = LENGTH.unpack_from(buffer, offset)
+    offset += LENGTH.size
+    text = str(buffer[offset:offset + size], 'utf-8')
+    offset += size
+    position = lengths[0]
+    members = []
+    for length in lengths[1:]:
+        members.append(text[position:position + length])
+        position += length
+    return Team.from_compact(uid, text[:lengths[0]], members, created, updated, version), offset
+
+
+def frame(op, payload):
+    body = bytes((op,)) + payload
+    return RECORD_HEADER.pack(len(body), zlib.crc32(body), op) + payload
+
+
+def iter_records(buffer):
+    """依序解出 (op, payload, 結束位置)，遇到不完整或損毀的記錄（例如當機時寫到一半）就停止"""
+    offset = 0
+    while offset + RECORD_HEADER.size <= len(buffer):
+        length, checksum, op = RECORD_HEADER.unpack_from(buffer, offset)
+        start = offset + RECORD_HEADER.size - 1
+        end = start + length
+        if length == 0 or end > len(buffer) or zlib.crc32(buffer[start:end]) != checksum:
+            return
+        yield op, buffer[start + 1:end], end
+        offset = end
+
+
+def iter_batch(payload):
+    """OP_BATCH 的內容是多筆未加 crc 的子記錄：[長度 u32][op u8][內容]"""
+    offset = 0
+    while offset < len(payload):
+        (length,) = LENGTH.unpack_from(payload, offset)
+        offset += LENGTH.size
+        yield payload[offset], payload[offset + 1:offset + length]
+        offset += length
+
+
+def log_path(directory, generation):
+    return os.path.join(directory, f'wal-{generation:08d}.log')
+
+
+def log_generations(directory):
+    names = glob.glob(os.path.join(directory, 'wal-*.log'))
+    return sorted(int(os.path.basename(name)[4:-4]) for name in names)
+
+
+def fsync_directory(directory):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class WriteAheadLog:
+    """
+    只能附加的寫入日誌，每個 generation 一個檔案
+
+    fsync_interval 為 0 時每筆記錄都 fsync；大於 0 時由背景執行緒每隔該秒數批次 fsync，
+    程序當掉不會遺失資料（已寫入 OS），斷電最多遺失一個間隔內的寫入；為 None 時交給 OS 決定。
+    """
+
+    def __init__(self, directory, generation, fsync_interval=0.05):
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.records = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._dirty = False
+        self._closed = threading.Event()
+        self._open(generation)
+        self._flusher = None
+        if fsync_interval:
+            self._flusher = threading.Thread(target=self._flush_loop, name='wal-fsync', daemon=True)
+            self._flusher.start()
+
+    def _open(self, generation):
+        self.generation = generation
+        self._file = open(log_path(self.directory, generation), 'ab', buffering=0)
+        fsync_directory(self.directory)
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.fsync_interval):
+            self.sync()
+
+    def sync(self):
+        with self._lock:
+            if self._dirty and not self._file.closed:
+                os.fsync(self._file.fileno())
+                self._dirty = False
+
+    def _append(self, op, payload):
+        batch = getattr(self._local, 'batch', None)
+        if batch is not None:
+            batch.append(LENGTH.pack(len(payload) + 1) + bytes((op,)) + payload)
+            return
+        with self._lock:
+            self._file.write(frame(op, payload))
+            self.records += 1
+            if self.fsync_interval == 0:
+                os.fsync(self._file.fileno())
+            else:
+                self._dirty = True
+
+    @contextmanager
+    def batch(self):
+        """區塊內的記錄合併成一筆 OP_BATCH 在結束時寫入，重播時整批套用或整批略過；區塊內發生例外時整批捨棄"""
+        self._local.batch = []
+        try:
+            yield
+        except BaseException:
+            self._local.batch = None
+            raise
+        records, self._local.batch = self._local.batch, None
+        if records:
+            self._append(OP_BATCH, b''.join(records))
+
+    def put(self, team):
+        self._append(OP_PUT, encode_team(team))
+
+    def delete(self, uid):
+        self._append(OP_DELETE, uid)
+
+    def clear(self):
+        self._append(OP_CLEAR, b'')
+
+    def rotate(self):
+        """切換到下一個 generation 的檔案，回傳新的 generation"""
+        with self._lock:
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._dirty = False
+            self.records = 0
+            self._open(self.generation + 1)
+            return self.generation
+
+    def close(self):
+        # 先停止背景 fsync（已經醒來的那一次也不再需要），確定它結束後才關閉檔案
+        self._closed.set()
+        with self._lock:
+            self._dirty = False
+        if self._flusher is not None and self._flusher is not threading.current_thread():
+            self._flusher.join()
+        with self._lock:
+            if not self._file.closed:
+                os.fsync(self._file.fileno())
+                self._file.close()
+
+
+def write_snapshot(directory, generation, teams):
+    """寫入快照（先寫暫存檔再原子地改名），快照涵蓋 generation 之前的所有日誌"""
+    path = os.path.join(directory, 'snapshot.bin')
+    temp_path = path + '.tmp'
+    checksum = 0
+    with open(temp_path, 'wb') as file:
+        file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, generation, len(teams)))
+        for team in teams:
+            record = encode_team(team)
+            chunk = LENGTH.pack(len(record)) + record
+            checksum = zlib.crc32(chunk, checksum)
+            file.write(chunk)
+        file.write(LENGTH.pack(checksum))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+    fsync_directory(directory)
+
+
+def read_snapshot(directory):
+    """回傳 (generation, teams)，沒有快照時為 (0, [])"""
+    path = os.path.join(directory, 'snapshot.bin')
+    if not os.path.exists(path):
+        return 0, []
+    with open(path, 'rb') as file:
+        buffer = memoryview(file.read())
+    magic, generation, count = SNAPSHOT_HEADER.unpack_from(buffer, 0)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError(f"{path} is not a team snapshot")
+    body = buffer[SNAPSHOT_HEADER.size:-LENGTH.size]
+    (checksum,) = LENGTH.unpack_from(buffer, len(buffer) - LENGTH.size)
+    if zlib.crc32(body) != checksum:
+        raise ValueError(f"{path} is corrupted")
+    teams, offset = [], 0
+    for _ in range(count):
+        offset += LENGTH.size
+        team, offset = decode_team(body, offset)
+        teams.append(team)
+    return generation, teams